@@ -1,33 +1,167 @@
-from fastapi import FastAPI,HTTPException
-from rag_pipeline import rag_query
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI,HTTPException,Request
+from rag_pipeline import rag_query_async, shutdown_pipeline, ingestion_scheduler, embedding_cache, answer_cache, embed_batcher, warmup_until_ready, readiness, reranker, stage_timings
 from pydantic import BaseModel
-from starlette.responses import StreamingResponse
-import json
+from starlette.responses import StreamingResponse, JSONResponse, PlainTextResponse
+from metrics import REGISTRY
+from sse import coalesce, sse_frame, DONE_FRAME
+from pinecone_ingestion import get_embed_model, embed_model_loaded
+from image_query import describe_image, image_query_async, image_stats, shutdown_image_query, InvalidImage, IMAGE_MAX_BYTES
+from reindex import reindex_job, activate, versions_status
+from index_versions import list_versions
 
-app = FastAPI(title="Athena Conversational AI Backend", version="1.0.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load models and clients in the background so the server answers /health right away;
+    # retried with backoff until it succeeds
+    warmup_task = asyncio.create_task(warmup_until_ready())
+    yield
+    if not warmup_task.done():
+        warmup_task.cancel()
+    shutdown_image_query()
+    await shutdown_pipeline()
+
+
+app = FastAPI(title="Athena Conversational AI Backend", version="1.0.0", lifespan=lifespan)
 class QueryRequest(BaseModel):
     query: str
 
+# Liveness: the process is up, even while models are still loading
 @app.get("/health")
 async def health_check():
     return {"status": "ok"}
 
 
+# Readiness: 503 until warmup has loaded the model and clients
+@app.get("/ready")
+async def ready_check():
+    state = readiness()
+    return JSONResponse(state, status_code=200 if state["ready"] else 503)
+
+
+# ===== Cache statistics =====
+@app.get("/cache/stats")
+async def cache_stats():
+    return {
+        "query_embeddings": embedding_cache.stats(),
+        "answers": answer_cache.stats(),
+        "image_captions": image_stats()["caption_cache"],
+    }
+
+
+# ===== Query embedding batches =====
+@app.get("/embedding/stats")
+async def embedding_stats():
+    stats = embed_batcher.stats()
+    model = get_embed_model() if embed_model_loaded() else None
+    if hasattr(model, "stats"):   # encoding through the shared model server
+        stats["model_server"] = await asyncio.to_thread(model.stats)
+    return stats
+
+
+# ===== Query path latency =====
+@app.get("/pipeline/timings")
+async def pipeline_timings():
+    return {"stages": stage_timings.stats(), "rerank": reranker.stats()}
+
+
+# ===== Prometheus scrape endpoint =====
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+# ===== Background ingestion status =====
+@app.get("/ingestion/jobs")
+async def ingestion_jobs():
+    return ingestion_scheduler.snapshot()
+
+
+@app.get("/ingestion/jobs/{job_id}")
+async def ingestion_job(job_id: str):
+    job = ingestion_scheduler.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+# ===== Index versions and re-indexing =====
+@app.get("/index/versions")
+async def index_versions():
+    return await asyncio.to_thread(versions_status)
+
+
+@app.get("/index/reindex")
+async def reindex_status():
+    return reindex_job.status()
+
+
+# Plans against the active version and builds the changed papers into a new one in the background
+@app.post("/index/reindex")
+async def start_reindex():
+    if not reindex_job.start():
+        raise HTTPException(status_code=409, detail="A re-index is already running")
+    return JSONResponse(reindex_job.status(), status_code=202)
+
+
+# Blue/green swap, also to roll back to an earlier ready version
+@app.post("/index/swap/{version}")
+async def swap_index(version: str):
+    if version not in list_versions():
+        raise HTTPException(status_code=404, detail="Index version not found")
+    try:
+        await asyncio.to_thread(activate, version)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return await asyncio.to_thread(versions_status)
+
+
 # ===== Fixed search endpoint =====
 @app.post("/search")
-async def stream_search(request: QueryRequest):
+async def stream_search(request: QueryRequest, http_request: Request):
 
     async def event_stream():
-        # yield tokens as they arrive
-        for chunk in rag_query(request.query, top_k=10, max_new_tokens=1000, threshold=0.5):
-            if chunk:
-                data = json.dumps({"delta": chunk})
-                yield f"data: {data}\n\n"
-                
-        yield "data: [DONE]\n\n"
+        # tokens are coalesced into frames; a disconnect stops the stream and closes the Groq request
+        tokens = rag_query_async(request.query, top_k=10, max_new_tokens=1000, threshold=0.5)
+        async for chunk in coalesce(tokens, is_disconnected=http_request.is_disconnected):
+            yield sse_frame({"delta": chunk})
+
+        yield DONE_FRAME
 
     return StreamingResponse(event_stream(), media_type="text/event-stream")
 
+# ===== Image search endpoint =====
+# Body is the raw image (e.g. `curl --data-binary @figure.png -H "Content-Type: image/png"`).
+# The first event carries the generated caption, then the answer streams like /search.
+@app.post("/search/image")
+async def stream_image_search(request: Request):
+    data = await request.body()
+    if not data:
+        raise HTTPException(status_code=400, detail="Empty image")
+    if len(data) > IMAGE_MAX_BYTES:
+        raise HTTPException(status_code=413, detail="Image too large")
+    try:
+        caption, clip_embedding = await describe_image(data)
+    except InvalidImage as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def event_stream():
+        yield sse_frame({"caption": caption})
+        tokens = image_query_async(caption, clip_embedding, top_k=10, max_new_tokens=1000, threshold=0.5)
+        async for chunk in coalesce(tokens, is_disconnected=request.is_disconnected):
+            yield sse_frame({"delta": chunk})
+
+        yield DONE_FRAME
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+@app.get("/image/stats")
+async def image_search_stats():
+    return image_stats()
+
 # @app.post("/search")
 # async def query_endpoint(request: QueryRequest):
 #     try:
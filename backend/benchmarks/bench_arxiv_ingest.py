@@ -0,0 +1,173 @@
+# benchmarks/bench_arxiv_ingest.py
+# Offline harness for mongodb.upload_tags: a local HTTP stand-in serves the arXiv Atom API and
+# the PDFs (with configurable latency), and mongomock replaces Atlas. Checks that every stored
+# PDF round-trips through GridFS intact and that re-running the same tags within the freshness
+# window calls nothing, then reports papers/s and outbound calls per download-worker count.
+#
+#   python benchmarks/bench_arxiv_ingest.py --tags 10 --per-tag 5 --pdf-ms 200 --workers 1 4 8
+#   python benchmarks/bench_arxiv_ingest.py --tags-per-query 1     # one arXiv call per tag
+#
+# Needs mongomock (pip install mongomock); it is not a runtime dependency of the service.
+import argparse
+import hashlib
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from xml.sax.saxutils import escape
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sample_pdfs import random_paper
+
+
+# ===== Local arXiv + PDF server =====
+class FakeArxiv:
+    def __init__(self, pdf_ms=100, api_ms=50, pages=4, pool_size=40, seed=0):
+        self.pdf_ms = pdf_ms
+        self.api_ms = api_ms
+        self.pool_size = pool_size   # distinct ids the queries draw from, so queries overlap
+        rng = random.Random(seed)
+        self.pdfs = {self.paper_id(i): random_paper(rng, n_pages=pages) for i in range(pool_size)}
+        self.requests = Counter()
+        self._lock = threading.Lock()
+        self.base_url = None
+
+    @staticmethod
+    def paper_id(i):
+        return f"2409.{i:05d}"
+
+    def ids_for(self, query, n):
+        start = int(hashlib.md5(query.encode()).hexdigest()[:8], 16) % self.pool_size
+        return [self.paper_id((start + k) % self.pool_size) for k in range(n)]
+
+    def feed(self, query, n):
+        entries = []
+        for arxiv_id in self.ids_for(query, n):
+            entries.append(f"""
+  <entry>
+    <id>http://arxiv.org/abs/{arxiv_id}v1</id>
+    <title>{escape(query)} paper {arxiv_id}</title>
+    <summary>Abstract of {arxiv_id} about {escape(query)}.</summary>
+    <link href="http://arxiv.org/abs/{arxiv_id}v1" rel="alternate" type="text/html"/>
+    <link title="pdf" href="{self.base_url}/pdf/{arxiv_id}" rel="related" type="application/pdf"/>
+  </entry>""")
+        return ('<?xml version="1.0" encoding="UTF-8"?>\n<feed xmlns="http://www.w3.org/2005/Atom">'
+                + "".join(entries) + "\n</feed>").encode()
+
+    def count(self, kind):
+        with self._lock:
+            self.requests[kind] += 1
+
+    def serve(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                if url.path == "/api/query":
+                    fake.count("api")
+                    time.sleep(fake.api_ms / 1000)
+                    params = parse_qs(url.query)
+                    body = fake.feed(params["search_query"][0], int(params["max_results"][0]))
+                    content_type = "application/atom+xml"
+                elif url.path.startswith("/pdf/") and url.path[5:] in fake.pdfs:
+                    fake.count("pdf")
+                    time.sleep(fake.pdf_ms / 1000)
+                    body = fake.pdfs[url.path[5:]]
+                    content_type = "application/pdf"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+def check_gridfs(db, fake):
+    import gridfs
+
+    fs = gridfs.GridFS(db)
+    docs = list(db["papers"].find({}))
+    for doc in docs:
+        data = fs.get(doc["file_id"]).read()
+        assert data == fake.pdfs[doc["arxiv_id"]], f"PDF mismatch for {doc['arxiv_id']}"
+    assert len({d["arxiv_id"] for d in docs}) == len(docs), "duplicate papers stored"
+    return len(docs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tags", type=int, default=10)
+    parser.add_argument("--per-tag", type=int, default=5)
+    parser.add_argument("--tags-per-query", type=int, default=10, help="ARXIV_TAGS_PER_QUERY")
+    parser.add_argument("--pdf-ms", type=float, default=150, help="server latency per PDF")
+    parser.add_argument("--api-ms", type=float, default=50, help="server latency per API call")
+    parser.add_argument("--host-interval", type=float, default=0.0, help="HOST_MIN_INTERVAL for the run")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    args = parser.parse_args()
+
+    fake = FakeArxiv(pdf_ms=args.pdf_ms, api_ms=args.api_ms)
+    server = fake.serve()
+    os.environ["ARXIV_API_URL"] = f"{fake.base_url}/api/query"
+    os.environ["HOST_MIN_INTERVAL"] = str(args.host_interval)
+    os.environ["ARXIV_API_MIN_INTERVAL"] = str(args.host_interval)
+    os.environ["ARXIV_TAGS_PER_QUERY"] = str(args.tags_per_query)
+    os.environ["INGESTION_CACHE_DIR"] = ""   # in-memory caches only
+
+    import mongomock
+    import mongomock.gridfs
+    import mongodb
+
+    mongomock.gridfs.enable_gridfs_integration()
+    tags = [f"topic {i}" for i in range(args.tags)]
+
+    for workers in args.workers:
+        mongo = mongomock.MongoClient()
+        mongodb.set_mongo_client(mongo)
+        mongodb.DOWNLOAD_WORKERS = workers
+        mongodb.arxiv_results_cache.clear()
+        fake.requests.clear()
+
+        start = time.perf_counter()
+        inserted = mongodb.upload_tags(tags, args.per_tag)
+        elapsed = time.perf_counter() - start
+        stored = check_gridfs(mongo[mongodb.DB_NAME], fake)
+        first_pass = dict(fake.requests)
+
+        # same tags again: all fetched within the freshness window, so nothing goes out
+        fake.requests.clear()
+        again = mongodb.upload_tags(tags, args.per_tag)
+        assert again == [] and not fake.requests, "re-run called arXiv or inserted papers"
+
+        # fresh metadata, papers already stored: PDFs are not downloaded again
+        mongodb.arxiv_results_cache.clear()
+        again = mongodb.upload_tags(tags, args.per_tag)
+        assert again == [] and fake.requests["pdf"] == 0, "re-run downloaded papers"
+
+        print(f"workers={workers:2d}  {elapsed:6.2f}s  inserted={len(inserted):3d}  stored={stored:3d}  "
+              f"papers/s={len(inserted) / elapsed:6.1f}  api_calls={first_pass.get('api', 0)}  "
+              f"pdf_downloads={first_pass.get('pdf', 0)}")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
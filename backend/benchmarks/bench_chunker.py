@@ -0,0 +1,109 @@
+# benchmarks/bench_chunker.py
+# Native TokenChunker vs langchain's RecursiveCharacterTextSplitter on the same extracted texts:
+# speed, chunk sizes (re-encoded with cl100k_base), overlap between neighbours, text coverage,
+# sentence-aligned endings and how many chunks come out identical.
+#
+#   python benchmarks/bench_chunker.py --papers 20 --pages 15
+#   python benchmarks/bench_chunker.py --corpus /path/to/pdfs
+#   python benchmarks/bench_chunker.py --flatten     # no line breaks, as many real PDFs extract
+import argparse
+import glob
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from preprocess_pipeline import build_splitter, extract_pdf_text, CHUNK_SIZE
+from sample_pdfs import random_paper
+
+
+def spans_of(text, chunks):
+    """Character spans of stripped chunks that are substrings of `text`, located in order."""
+    spans, pos = [], 0
+    for chunk in chunks:
+        start = text.find(chunk, pos)
+        if start < 0:
+            return None
+        spans.append((start, start + len(chunk)))
+        pos = start + 1
+    return spans
+
+
+def coverage(text, spans):
+    covered = bytearray(len(text))
+    for a, b in spans:
+        covered[a:b] = b"\x01" * (b - a)
+    content = [i for i, ch in enumerate(text) if not ch.isspace()]
+    return sum(covered[i] for i in content) / len(content) if content else 1.0
+
+
+def measure(splitter, texts, encoding):
+    start = time.perf_counter()
+    outputs = [splitter.split_text(text) for text in texts]
+    elapsed = time.perf_counter() - start
+    sizes, overlaps, coverages, sentence_ends = [], [], [], 0
+    for text, chunks in zip(texts, outputs):
+        sizes.extend(len(encoding.encode_ordinary(c)) for c in chunks)
+        sentence_ends += sum(c.rstrip()[-1:] in ".?!;" for c in chunks)
+        spans = spans_of(text, chunks)
+        if spans is None:
+            continue
+        coverages.append(coverage(text, spans))
+        for (a, b), (c, _) in zip(spans, spans[1:]):
+            overlaps.append(len(encoding.encode_ordinary(text[c:b])) if c < b else 0)
+    return elapsed, outputs, {
+        "chunks": sum(len(o) for o in outputs),
+        "mean_tokens": statistics.mean(sizes) if sizes else 0,
+        "max_tokens": max(sizes) if sizes else 0,
+        "mean_overlap": statistics.mean(overlaps) if overlaps else 0,
+        "coverage": min(coverages) if coverages else float("nan"),
+        "sentence_end": sentence_ends / max(1, sum(len(o) for o in outputs)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--corpus", help="directory of PDFs (default: generated papers)")
+    parser.add_argument("--papers", type=int, default=12)
+    parser.add_argument("--pages", type=int, default=15)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--flatten", action="store_true", help="replace newlines with spaces")
+    args = parser.parse_args()
+
+    if args.corpus:
+        texts = []
+        for path in sorted(glob.glob(os.path.join(args.corpus, "*.pdf"))):
+            with open(path, "rb") as f:
+                texts.append(extract_pdf_text(f.read()))
+    else:
+        rng = random.Random(0)
+        texts = [extract_pdf_text(random_paper(rng, n_pages=args.pages)) for _ in range(args.papers)]
+    if args.flatten:
+        texts = [text.replace("\n", " ") for text in texts]
+    print(f"{len(texts)} documents, {sum(map(len, texts)) / 1e6:.2f}M chars, chunk_size={CHUNK_SIZE}")
+
+    results = {}
+    for kind in ("langchain", "native"):
+        splitter = build_splitter(kind)
+        encoding = splitter.encoding if kind == "native" else build_splitter("native").encoding
+        best = None
+        for _ in range(args.repeat):
+            elapsed, outputs, stats = measure(splitter, texts, encoding)
+            best = elapsed if best is None else min(best, elapsed)
+        results[kind] = outputs
+        print(f"{kind:10s} {best:7.3f}s  docs/s={len(texts) / best:7.1f}  chunks={stats['chunks']:5d}  "
+              f"tokens mean={stats['mean_tokens']:6.1f} max={stats['max_tokens']:5d}  "
+              f"overlap={stats['mean_overlap']:6.1f}  coverage={stats['coverage']:.4f}  "
+              f"sentence_end={stats['sentence_end']:.2f}")
+
+    lc = {c for chunks in results["langchain"] for c in chunks}
+    native = [c for chunks in results["native"] for c in chunks]
+    same = sum(c in lc for c in native)
+    print(f"identical chunks: {same}/{len(native)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,343 @@
+# benchmarks/bench_e2e.py
+# Offline end-to-end benchmark, no API keys needed:
+#   1. ingest_fetch: mongodb.upload_tags against a local arXiv/PDF server, into mongomock + GridFS
+#   2. ingest_index: run_ingestion (extract, chunk, stub-embed, upsert) into the local mmap index,
+#      chunk store and BM25 index under a scratch directory
+#   3. search: POST /search under load against a server process reading that index, with the stub
+#      embedder and a scripted token-streaming LLM
+# Reports throughput, latency percentiles, CPU seconds and peak RSS per phase plus per-stage timings
+# from the metrics, and writes them to JSON so runs can be compared across commits.
+#
+#   python benchmarks/bench_e2e.py --tags 8 --per-tag 4 --requests 300 --concurrency 50
+#   python benchmarks/bench_e2e.py --compare bench_results/e2e_<old>.json
+#
+# Needs mongomock (pip install mongomock); it is not a runtime dependency of the service.
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import httpx
+
+from bench_arxiv_ingest import FakeArxiv
+from load_test_search import free_port, one_request, percentile
+from stubs import StubAsyncLLM, StubEmbedder
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+
+
+# ===== Process probes =====
+def rss_mb(pid="self", field="VmRSS"):
+    """Resident (VmRSS) or peak resident (VmHWM) size of a process from /proc, in MB."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 if pid == "self" else float("nan")
+
+
+def cpu_seconds(pid):
+    """User + system CPU seconds of another process."""
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+
+
+def own_cpu_seconds():
+    usage = [resource.getrusage(who) for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)]
+    return sum(u.ru_utime + u.ru_stime for u in usage)
+
+
+class Phase:
+    """Wall time, CPU seconds and peak RSS of `pid` (this process by default) over a with-block."""
+
+    def __init__(self, name, pid=None, interval=0.02):
+        self.name = name
+        self.pid = pid
+        self.interval = interval
+        self.result = {}
+        self._stop = threading.Event()
+
+    def _cpu(self):
+        return own_cpu_seconds() if self.pid is None else cpu_seconds(self.pid)
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, rss_mb(self.pid or "self"))
+
+    def __enter__(self):
+        self.peak = rss_mb(self.pid or "self")
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        self._cpu0 = self._cpu()
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        wall = time.perf_counter() - self._t0
+        cpu = self._cpu() - self._cpu0
+        self._stop.set()
+        self._thread.join()
+        self.result = {"wall_s": round(wall, 3), "cpu_s": round(cpu, 3),
+                       "cpu_share": round(cpu / wall, 3) if wall else 0.0, "peak_rss_mb": round(self.peak, 1)}
+        return False
+
+
+def latency_summary(values_ms):
+    return {f"p{p}": round(percentile(values_ms, p), 2) for p in (50, 90, 95, 99)} | {
+        "mean": round(sum(values_ms) / len(values_ms), 2) if values_ms else float("nan")}
+
+
+# ===== Environment =====
+def configure_env(args, scratch, arxiv_url):
+    """Point every store at the scratch directory before any backend module is imported."""
+    os.environ.update({
+        "VECTOR_STORE": "local",
+        "LOCAL_INDEX_DIR": os.path.join(scratch, "local_index"),
+        "CHUNK_STORE_DIR": os.path.join(scratch, "chunk_store"),
+        "SPARSE_INDEX_DIR": os.path.join(scratch, "sparse_index"),
+        "EXTRACT_CACHE_DIR": os.path.join(scratch, "extract_cache"),
+        "INGESTION_CACHE_DIR": "",
+        "EMBED_CACHE_PATH": "",
+        "ARXIV_API_URL": arxiv_url,
+        "HOST_MIN_INTERVAL": "0",
+        "ARXIV_API_MIN_INTERVAL": "0",
+    })
+
+
+def stub_embedder(args):
+    return StubEmbedder(ms_per_call=args.embed_ms, ms_per_text=args.embed_ms_per_text)
+
+
+# ===== Search server (own process, so the load generator does not share its GIL) =====
+def serve(args, port):
+    import uvicorn
+    import rag_pipeline
+    from pinecone_ingestion import set_embed_model
+
+    set_embed_model(stub_embedder(args))
+    rag_pipeline.set_async_llm_client(StubAsyncLLM(
+        n_tokens=args.tokens, first_token_ms=args.ttft_ms, inter_token_ms=args.inter_token_ms
+    ))
+    # low-relevance triggers are still scheduled and counted, but fetch and index nothing
+    rag_pipeline.ingestion_scheduler.fetch_fn = lambda query: None
+    rag_pipeline.ingestion_scheduler.index_fn = lambda: None
+    from app import app
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def start_server(args, port):
+    proc = multiprocessing.get_context("spawn").Process(target=serve, args=(args, port), daemon=True)
+    proc.start()
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/ready").status_code == 200:
+                return proc
+        except httpx.TransportError:
+            time.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError("search server did not come up")
+
+
+def make_queries(args, vocabulary):
+    """`--requests` queries drawn from `--distinct` questions built from words in the corpus."""
+    rng = random.Random(1)
+    words = vocabulary or ["attention", "training", "results"]
+    distinct = [f"how does {' '.join(rng.sample(words, min(3, len(words))))} work" for _ in range(args.distinct)]
+    return [rng.choice(distinct) for _ in range(args.requests)]
+
+
+async def drive_search(base_url, queries, concurrency):
+    sem = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=0)
+
+    async with httpx.AsyncClient(limits=limits, timeout=None) as client:
+        async def worker(query):
+            async with sem:
+                return await one_request(client, f"{base_url}/search", query)
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(worker(q) for q in queries))
+        return results, time.perf_counter() - start
+
+
+# ===== Phases =====
+def run_ingestion_phases(args, report):
+    import mongomock
+    import mongomock.gridfs
+    import mongodb
+    import pinecone_ingestion
+    import preprocess_pipeline
+    from chunk_store import get_chunk_store
+    from metrics import INGESTION_STAGE_SECONDS
+
+    mongomock.gridfs.enable_gridfs_integration()
+    mongo = mongomock.MongoClient()
+    for module in (mongodb, pinecone_ingestion, preprocess_pipeline):
+        module.set_mongo_client(mongo)
+    pinecone_ingestion.set_embed_model(stub_embedder(args))
+
+    tags = [f"topic {i}" for i in range(args.tags)]
+    with Phase("ingest_fetch") as phase:
+        inserted = mongodb.upload_tags(tags, args.per_tag)
+    report["ingest_fetch"] = phase.result | {
+        "papers": len(inserted), "papers_per_s": round(len(inserted) / phase.result["wall_s"], 2)}
+
+    with Phase("ingest_index") as phase:
+        indexed, failed = pinecone_ingestion.run_ingestion()
+    chunk_store = get_chunk_store()
+    chunks = len(chunk_store)
+    report["ingest_index"] = phase.result | {
+        "papers": len(indexed), "failed": len(failed), "chunks": chunks,
+        "papers_per_s": round(len(indexed) / phase.result["wall_s"], 2),
+        "chunks_per_s": round(chunks / phase.result["wall_s"], 1),
+    }
+    report["ingest_stages"] = {
+        stage: {"count": count, "total_s": round(total, 4), "mean_ms": round(1000 * total / count, 3)}
+        for (stage,), (count, total) in sorted(INGESTION_STAGE_SECONDS.totals().items()) if count
+    }
+    vocabulary = set()
+    for arxiv_id in indexed:
+        vocabulary.update(w for w in (chunk_store.get(arxiv_id, 0) or "").lower().split() if w.isalpha() and len(w) > 4)
+    return sorted(vocabulary)
+
+
+def run_search_phase(args, report, vocabulary):
+    port = free_port()
+    server = start_server(args, port)
+    base_url = f"http://127.0.0.1:{port}"
+    queries = make_queries(args, vocabulary)
+    try:
+        with Phase("search", pid=server.pid) as phase:
+            results, elapsed = asyncio.run(drive_search(base_url, queries, args.concurrency))
+        timings = httpx.get(f"{base_url}/pipeline/timings").json()
+        caches = httpx.get(f"{base_url}/cache/stats").json()
+        server_peak = rss_mb(server.pid, "VmHWM")
+    finally:
+        server.terminate()
+        server.join(timeout=5)
+
+    ttfts = [r[0] * 1000 for r in results if r[0] is not None]
+    totals = [r[1] * 1000 for r in results]
+    report["search"] = phase.result | {
+        "requests": len(queries),
+        "concurrency": args.concurrency,
+        "throughput_rps": round(len(queries) / elapsed, 2),
+        "ttft_ms": latency_summary(ttfts),
+        "total_ms": latency_summary(totals),
+        "server_cpu_ms_per_request": round(1000 * phase.result["cpu_s"] / len(queries), 3),
+        "server_lifetime_peak_rss_mb": round(server_peak, 1),
+        "answer_cache_hit_rate": round(caches["answers"]["hit_rate"], 3),
+    }
+    report["search_stages"] = timings["stages"]
+
+
+# ===== Reporting =====
+def git_revision():
+    try:
+        sha = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                             capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=BACKEND_DIR,
+                               capture_output=True, text=True, check=True).stdout.strip()
+        return sha + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def flatten(report, prefix=""):
+    flat = {}
+    for key, value in report.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(old, new):
+    old_flat, new_flat = flatten({k: v for k, v in old.items() if k != "config"}), flatten(
+        {k: v for k, v in new.items() if k != "config"})
+    print(f"\ncompared with {old.get('revision', '?')}:")
+    for key in sorted(set(old_flat) & set(new_flat)):
+        a, b = old_flat[key], new_flat[key]
+        change = f"{(b - a) / a * 100:+7.1f}%" if a else "      -"
+        print(f"  {key:45s} {a:12.3f} -> {b:12.3f}  {change}")
+
+
+def print_report(report):
+    for phase in ("ingest_fetch", "ingest_index", "search"):
+        r = report[phase]
+        print(f"{phase:13s} wall={r['wall_s']:7.2f}s  cpu={r['cpu_s']:7.2f}s  peak_rss={r['peak_rss_mb']:7.1f} MB  "
+              + "  ".join(f"{k}={v}" for k, v in r.items()
+                          if k in ("papers", "chunks", "papers_per_s", "chunks_per_s", "throughput_rps")))
+    s = report["search"]
+    print(f"{'':13s} ttft p50={s['ttft_ms']['p50']} p99={s['ttft_ms']['p99']} ms  "
+          f"total p50={s['total_ms']['p50']} p99={s['total_ms']['p99']} ms  "
+          f"server cpu/request={s['server_cpu_ms_per_request']} ms")
+    for group in ("ingest_stages", "search_stages"):
+        print(f"{group}:")
+        for stage, stats in report[group].items():
+            print(f"  {stage:14s} " + "  ".join(f"{k}={v}" for k, v in stats.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tags", type=int, default=8)
+    parser.add_argument("--per-tag", type=int, default=4)
+    parser.add_argument("--pages", type=int, default=6, help="pages per generated PDF")
+    parser.add_argument("--pdf-ms", type=float, default=50, help="local server latency per PDF")
+    parser.add_argument("--api-ms", type=float, default=50, help="local server latency per arXiv call")
+    parser.add_argument("--embed-ms", type=float, default=15.0, help="stub encode cost per call")
+    parser.add_argument("--embed-ms-per-text", type=float, default=2.0, help="stub encode cost per text")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--distinct", type=int, default=100, help="distinct queries among the requests")
+    parser.add_argument("--ttft-ms", type=float, default=150.0)
+    parser.add_argument("--inter-token-ms", type=float, default=10.0)
+    parser.add_argument("--tokens", type=int, default=50)
+    parser.add_argument("--out", help="JSON path (default bench_results/e2e_<revision>_<time>.json)")
+    parser.add_argument("--compare", help="earlier JSON result to diff against")
+    args = parser.parse_args()
+
+    fake = FakeArxiv(pdf_ms=args.pdf_ms, api_ms=args.api_ms, pages=args.pages,
+                     pool_size=max(40, args.tags * args.per_tag))
+    arxiv_server = fake.serve()
+    report = {"revision": git_revision(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+              "cpus": os.cpu_count(), "config": vars(args)}
+    with tempfile.TemporaryDirectory(prefix="athena_e2e_") as scratch:
+        configure_env(args, scratch, f"{fake.base_url}/api/query")
+        vocabulary = run_ingestion_phases(args, report)
+        arxiv_server.shutdown()
+        run_search_phase(args, report, vocabulary)
+
+    print_report(report)
+    out = args.out or os.path.join(BACKEND_DIR, "bench_results",
+                                   f"e2e_{report['revision']}_{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Saved {out}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
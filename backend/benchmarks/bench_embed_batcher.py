@@ -0,0 +1,76 @@
+# benchmarks/bench_embed_batcher.py
+# Throughput vs added latency of the query-embedding batcher at different arrival rates.
+# Queries arrive as a Poisson process; each row compares one encode per query (batch size 1)
+# with micro-batching at the configured wait window.
+#
+#   python benchmarks/bench_embed_batcher.py --rates 20 50 100 200 --wait-ms 0 3 10
+#   python benchmarks/bench_embed_batcher.py --real-model     # all-mpnet-base-v2 instead of the stub
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from embed_batcher import EmbeddingBatcher
+from stubs import StubEmbedder
+
+
+async def drive(batcher, rate, n_queries, seed=0):
+    rng = random.Random(seed)
+    latencies = []
+
+    async def one(i):
+        start = time.perf_counter()
+        await asyncio.wrap_future(batcher.submit(f"query number {i} about attention"))
+        latencies.append(time.perf_counter() - start)
+
+    tasks = []
+    start = time.perf_counter()
+    for i in range(n_queries):
+        tasks.append(asyncio.create_task(one(i)))
+        await asyncio.sleep(rng.expovariate(rate))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+    return elapsed, np.array(latencies) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rates", type=float, nargs="+", default=[20, 50, 100, 200],
+                        help="query arrivals per second")
+    parser.add_argument("--wait-ms", type=float, nargs="+", default=[0, 3, 10])
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--queries", type=int, default=400)
+    parser.add_argument("--ms-per-call", type=float, default=15.0, help="stub model fixed cost per encode")
+    parser.add_argument("--ms-per-text", type=float, default=2.0, help="stub model cost per text in a batch")
+    parser.add_argument("--real-model", action="store_true")
+    args = parser.parse_args()
+
+    if args.real_model:
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer("sentence-transformers/all-mpnet-base-v2")
+    else:
+        model = StubEmbedder(args.ms_per_call, args.ms_per_text)
+
+    print(f"{'rate/s':>7} {'mode':>12} {'q/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'batch':>6} {'queue':>8}")
+    for rate in args.rates:
+        configs = [("unbatched", 1, 0.0)] + [(f"wait={w:g}ms", args.max_batch, w) for w in args.wait_ms]
+        for label, max_batch, wait_ms in configs:
+            batcher = EmbeddingBatcher(lambda: model, max_batch_size=max_batch,
+                                       max_wait_ms=wait_ms, workers=args.workers)
+            elapsed, lat = asyncio.run(drive(batcher, rate, args.queries))
+            stats = batcher.stats()
+            batcher.shutdown()
+            print(f"{rate:7.0f} {label:>12} {args.queries / elapsed:8.1f} "
+                  f"{np.percentile(lat, 50):8.1f} {np.percentile(lat, 99):8.1f} "
+                  f"{stats['mean_batch_size']:6.2f} {stats['mean_queue_wait_ms']:6.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# benchmarks/bench_image_query.py
+# Cost of turning uploaded images into queries: the old blip.image_to_query (model loaded per
+# call, one image per generate) against the shared captioner, one image per batch and batched
+# across concurrent uploads, and finally the same uploads again served from the content-hash cache.
+#
+#   python benchmarks/bench_image_query.py --images 32 --load-ms 800
+import argparse
+import asyncio
+import io
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import image_query
+from blip import set_captioner
+from embed_batcher import EmbeddingBatcher
+from stubs import StubCaptioner
+
+
+def make_images(n, size=256, seed=0):
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    images = []
+    for _ in range(n):
+        pixels = rng.integers(0, 256, (size, size, 3), dtype=np.uint8)
+        buffer = io.BytesIO()
+        Image.fromarray(pixels).save(buffer, format="PNG")
+        images.append(buffer.getvalue())
+    return images
+
+
+async def upload_all(images):
+    start = time.perf_counter()
+    latencies = []
+
+    async def one(data):
+        t = time.perf_counter()
+        await image_query.describe_image(data, with_clip=False)
+        latencies.append(time.perf_counter() - t)
+
+    await asyncio.gather(*(one(data) for data in images))
+    return time.perf_counter() - start, np.array(latencies) * 1000
+
+
+def report(name, elapsed, latencies_ms, n):
+    print(f"{name:<28} {elapsed:8.2f}s {n / elapsed:8.1f} img/s   p50 {np.percentile(latencies_ms, 50):8.1f} ms"
+          f"   p95 {np.percentile(latencies_ms, 95):8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--images", type=int, default=32)
+    parser.add_argument("--load-ms", type=float, default=800.0, help="stub BLIP load time")
+    parser.add_argument("--ms-per-call", type=float, default=120.0)
+    parser.add_argument("--ms-per-image", type=float, default=25.0)
+    parser.add_argument("--max-batch", type=int, default=8)
+    args = parser.parse_args()
+
+    images = make_images(args.images)
+    print(f"{args.images} concurrent uploads, stub BLIP: load {args.load_ms:.0f} ms, "
+          f"generate {args.ms_per_call:.0f} ms + {args.ms_per_image:.0f} ms/image\n")
+
+    # old path: every call loads the model and captions one image
+    start, latencies = time.perf_counter(), []
+    for data in images:
+        t = time.perf_counter()
+        StubCaptioner(args.load_ms, args.ms_per_call, args.ms_per_image).encode([image_query.decode_image(data)])
+        latencies.append(time.perf_counter() - t)
+    report("reload per call", time.perf_counter() - start, np.array(latencies) * 1000, args.images)
+
+    set_captioner(StubCaptioner(args.load_ms, args.ms_per_call, args.ms_per_image))
+    for name, max_batch in (("shared model, batch 1", 1), (f"shared model, batch {args.max_batch}", args.max_batch)):
+        image_query.caption_batcher.shutdown()
+        image_query.caption_batcher = EmbeddingBatcher(image_query.get_captioner, max_batch_size=max_batch,
+                                                       max_wait_ms=image_query.IMAGE_BATCH_MAX_WAIT_MS,
+                                                       name="caption", convert=list)
+        image_query.caption_cache.clear()
+        elapsed, latencies = asyncio.run(upload_all(images))
+        report(name, elapsed, latencies, args.images)
+
+    elapsed, latencies = asyncio.run(upload_all(images))
+    report("repeat uploads (cache)", elapsed, latencies, args.images)
+    print(f"\ncaption batches: {image_query.caption_batcher.stats()['batch_size_counts']}")
+    image_query.shutdown_image_query()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# benchmarks/bench_preprocess.py
+# Papers/sec/core for PDF extraction + chunking on a local corpus (no Mongo needed).
+#
+#   python benchmarks/bench_preprocess.py --corpus /path/to/pdfs --workers 1 2 4
+#   python benchmarks/bench_preprocess.py --papers 40        # generated sample corpus
+import argparse
+import glob
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from preprocess_pipeline import build_splitter, chunk_paper, extract_pdf_text
+from sample_pdfs import write_corpus
+
+_splitter = None
+
+
+def process_file(path):
+    global _splitter
+    if _splitter is None:
+        _splitter = build_splitter()
+    with open(path, "rb") as f:
+        text = extract_pdf_text(f.read())
+    paper = {"arxiv_id": os.path.basename(path)[:-4], "title": ""}
+    return len(chunk_paper(paper, text, _splitter))
+
+
+def _warm():
+    global _splitter
+    _splitter = build_splitter()
+
+
+def run(paths, workers):
+    if workers <= 1:
+        _warm()
+        start = time.perf_counter()
+        n_chunks = sum(process_file(p) for p in paths)
+        return time.perf_counter() - start, n_chunks
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_warm) as pool:
+        # Start the workers before timing so spawn/import cost is not counted
+        list(pool.map(int, range(workers)))
+        start = time.perf_counter()
+        n_chunks = sum(pool.map(process_file, paths, chunksize=1))
+        return time.perf_counter() - start, n_chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--corpus", help="directory of PDFs (default: generate a sample corpus)")
+    parser.add_argument("--papers", type=int, default=24)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.corpus:
+            paths = sorted(glob.glob(os.path.join(args.corpus, "*.pdf")))
+        else:
+            paths = write_corpus(tmp, args.papers, args.pages)
+        print(f"corpus: {len(paths)} PDFs")
+        for workers in args.workers:
+            elapsed, n_chunks = run(paths, workers)
+            pps = len(paths) / elapsed
+            print(f"workers={workers:2d}  {elapsed:7.2f}s  chunks={n_chunks:5d}  "
+                  f"papers/s={pps:7.2f}  papers/s/core={pps / workers:6.2f}")
+
+
+if __name__ == "__main__":
+    main()
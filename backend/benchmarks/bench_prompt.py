@@ -0,0 +1,116 @@
+# benchmarks/bench_prompt.py
+# Prompt assembly before and after overlap-aware packing: context tokens sent to the LLM and build
+# time per prompt, for retrieved sets where neighbouring chunks of the same paper come back together.
+# Also checks that stitching every chunk of a paper reproduces its extracted text exactly.
+#
+#   python benchmarks/bench_prompt.py --papers 10 --top-k 10 --budget 4000
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chunk_store import ChunkStore
+from pinecone_ingestion import chunk_metadata, chunk_vector_id
+from preprocess_pipeline import build_splitter, chunk_paper, extract_pdf_text
+from prompt_builder import clean_chunk, context_passages, get_encoding, pack_context, stitch
+from sample_pdfs import random_paper
+
+
+def clean_chunk_four_pass(text):
+    """The previous cleaner: one re.sub per rule."""
+    text = re.sub(r'https?://\S+', '', text)
+    text = re.sub(r'\[\d+(,\s*\d+)*\]', '', text)
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'\b\w{1,3}$', '', text)
+    return text.strip()
+
+
+def old_context(matches, store):
+    contexts = [clean_chunk_four_pass(store.get_by_id(m["id"]) or m["metadata"]["snippet"]) for m in matches]
+    return "\n\n".join(c for c in contexts if c.strip())
+
+
+def retrieved_sets(papers, top_k, n_sets, rng):
+    """Retrieval results biased towards runs of neighbouring chunks, as overlapping chunks score alike."""
+    sets = []
+    for _ in range(n_sets):
+        matches, seen = [], set()
+        while len(matches) < top_k:
+            chunks = rng.choice(papers)
+            start = rng.randrange(len(chunks))
+            for chunk in chunks[start:start + rng.randint(1, 3)]:
+                if chunk_vector_id(chunk) not in seen and len(matches) < top_k:
+                    seen.add(chunk_vector_id(chunk))
+                    matches.append({"id": chunk_vector_id(chunk), "score": 1.0, "metadata": chunk_metadata(chunk)})
+        sets.append(matches)
+    return sets
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--papers", type=int, default=10)
+    parser.add_argument("--pages", type=int, default=12)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--sets", type=int, default=50, help="retrieved sets to build prompts for")
+    parser.add_argument("--budget", type=int, default=4000, help="PROMPT_CONTEXT_TOKENS")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    splitter = build_splitter("native")
+    encoding = get_encoding()
+    papers, texts = [], {}
+    for i in range(args.papers):
+        paper = {"arxiv_id": f"2409.{i:05d}", "title": f"Paper {i}"}
+        text = extract_pdf_text(random_paper(rng, n_pages=args.pages))
+        texts[paper["arxiv_id"]] = text
+        papers.append(chunk_paper(paper, text, splitter))
+
+    for chunks in papers:
+        with_spans = stitch([(c["chunk"], (c["char_start"], c["char_end"])) for c in chunks])
+        by_text = stitch([(c["chunk"], None) for c in chunks])
+        whole = texts[chunks[0]["arxiv_id"]]
+        expected = whole[chunks[0]["char_start"]:chunks[-1]["char_end"]]
+        assert with_spans == expected, "span stitching lost or repeated text"
+        assert by_text == expected, "text-overlap stitching lost or repeated text"
+    print(f"stitching: {len(papers)} papers reassembled exactly (by span and by text overlap)")
+
+    sample = " ".join(c["chunk"] for c in papers[0]) + " see https://arxiv.org/abs/1 [12, 3] ab"
+    assert clean_chunk(sample) == clean_chunk_four_pass(sample), "single-pass cleaner differs"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ChunkStore(tmp)
+        store.put_many([c for chunks in papers for c in chunks])
+        sets = retrieved_sets(papers, args.top_k, args.sets, rng)
+
+        start = time.perf_counter()
+        old = [old_context(m, store) for m in sets]
+        old_ms = (time.perf_counter() - start) * 1000 / len(sets)
+        start = time.perf_counter()
+        new = [pack_context(context_passages(m, store), args.budget)[0] for m in sets]
+        new_ms = (time.perf_counter() - start) * 1000 / len(sets)
+        unbudgeted = [pack_context(context_passages(m, store), 10 ** 9)[0] for m in sets]
+        store.close()
+
+    old_tokens = [len(encoding.encode_ordinary(c)) for c in old]
+    new_tokens = [len(encoding.encode_ordinary(c)) for c in new]
+    unbudgeted = [len(encoding.encode_ordinary(c)) for c in unbudgeted]
+    print(f"top_k={args.top_k}, {len(sets)} retrieved sets")
+    print(f"{'joined chunks':22s} tokens mean={sum(old_tokens) / len(sets):8.0f} max={max(old_tokens):6d}  build={old_ms:6.2f} ms")
+    print(f"{'merged, no budget':22s} tokens mean={sum(unbudgeted) / len(sets):8.0f} max={max(unbudgeted):6d}")
+    print(f"{'merged, budget ' + str(args.budget):22s} tokens mean={sum(new_tokens) / len(sets):8.0f} max={max(new_tokens):6d}  build={new_ms:6.2f} ms")
+
+    big = sample * 20
+    for name, fn in (("four-pass clean", clean_chunk_four_pass), ("single-pass clean", clean_chunk)):
+        start = time.perf_counter()
+        for _ in range(20):
+            fn(big)
+        print(f"{name:22s} {(time.perf_counter() - start) * 1000 / 20:8.2f} ms per {len(big) / 1e3:.0f}K chars")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# benchmarks/bench_quantization.py
+# Memory per million chunks and recall@k of the local index at each storage dtype
+# (float32 / float16 / int8 with per-row scales), plus the cost of serializing an upsert batch
+# per vector with tolist() versus straight from the contiguous array.
+#
+#   python benchmarks/bench_quantization.py --vectors 100000 --queries 200
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import orjson
+
+from bench_vector_index import build_store, clustered_data, recall
+from vector_store import normalize_rows, top_k_indices
+
+
+def dir_bytes(path, names=("vectors.bin", "scales.bin")):
+    return sum(os.path.getsize(os.path.join(path, n)) for n in names if os.path.exists(os.path.join(path, n)))
+
+
+def serialize_cost(embeddings, repeat=5):
+    """(ms, peak MB) to build the upsert payload for one batch, per strategy."""
+    ids = [f"2409.{i:05d}_chunk0" for i in range(len(embeddings))]
+    metas = [{"arxiv_id": "2409.00000", "chunk_index": i} for i in range(len(embeddings))]
+
+    def per_vector():
+        return json.dumps({"vectors": [{"id": v, "values": e.tolist(), "metadata": m}
+                                       for v, e, m in zip(ids, embeddings, metas)]})
+
+    def per_batch():
+        values = embeddings.tolist()
+        return json.dumps({"vectors": [{"id": v, "values": vals, "metadata": m}
+                                       for v, vals, m in zip(ids, values, metas)]})
+
+    def contiguous():
+        return orjson.dumps({"vectors": [{"id": v, "values": embeddings[i], "metadata": m}
+                                         for i, (v, m) in enumerate(zip(ids, metas))]},
+                            option=orjson.OPT_SERIALIZE_NUMPY)
+
+    strategies = {"tolist per vector": per_vector, "tolist per batch": per_batch, "orjson from array": contiguous}
+    results = {}
+    for name, fn in strategies.items():
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        ms = (time.perf_counter() - start) * 1000 / repeat
+        tracemalloc.start()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[name] = (ms, peak / 1e6)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--vectors", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--batch", type=int, default=1000, help="upsert batch size for the serialization test")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    data = clustered_data(args.vectors, args.dim, args.clusters, rng)
+    queries = normalize_rows(data[rng.integers(0, len(data), args.queries)]
+                             + 1.0 * normalize_rows(rng.standard_normal((args.queries, args.dim))))
+    truth = [top_k_indices(data @ q, args.k) for q in queries]
+
+    print(f"{args.vectors} vectors x {args.dim} dims, recall@{args.k} vs float32 brute force")
+    with tempfile.TemporaryDirectory() as tmp:
+        for dtype in ("float32", "float16", "int8"):
+            path = os.path.join(tmp, dtype)
+            store = build_store(path, data, dtype)
+            results = [store.search(q, args.k)[0] for q in queries]
+            per_vector = dir_bytes(path) / args.vectors
+            start = time.perf_counter()
+            for q in queries:
+                store.search(q, args.k)
+            ms = (time.perf_counter() - start) * 1000 / len(queries)
+            print(f"{dtype:8s} bytes/vector={per_vector:7.1f}  GB per 1M chunks={per_vector * 1e6 / 1e9:6.2f}  "
+                  f"recall={recall(results, truth, args.k):.4f}  exact search={ms:6.1f} ms")
+
+    print(f"\nupsert payload for a batch of {args.batch}:")
+    for name, (ms, peak) in serialize_cost(data[:args.batch]).items():
+        print(f"{name:20s} {ms:8.1f} ms  peak={peak:7.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# benchmarks/bench_reindex.py
+# Incremental re-indexing against rebuilding from scratch, offline (mongomock + generated PDFs +
+# stub embedders, local mmap index in a scratch directory):
+#   1. initial   first versioned build of the un-versioned index (every paper re-chunked)
+#   2. no-op     plan with nothing changed (nothing is built)
+#   3. embedder  new query/document embedder: stored chunk text is re-encoded, PDFs are not touched
+#   4. pdfs      a few papers get a new PDF: the rest is copied
+# Each build is swapped in; the plan, per-action counts and wall time are printed per step.
+#
+#   python benchmarks/bench_reindex.py --papers 40 --pages 8 --changed 4
+#
+# Needs mongomock (pip install mongomock); it is not a runtime dependency of the service.
+import argparse
+import hashlib
+import os
+import random
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from sample_pdfs import random_paper
+from stubs import StubEmbedder
+
+
+def configure_env(scratch):
+    """Point every store at the scratch directory before any backend module is imported."""
+    os.environ.update({
+        "VECTOR_STORE": "local",
+        "INDEX_ROOT": os.path.join(scratch, "indexes"),
+        "LOCAL_INDEX_DIR": os.path.join(scratch, "local_index"),
+        "CHUNK_STORE_DIR": os.path.join(scratch, "chunk_store"),
+        "SPARSE_INDEX_DIR": os.path.join(scratch, "sparse_index"),
+        "EXTRACT_CACHE_DIR": "",
+        "IMAGE_RETRIEVAL": "caption",
+        "REINDEX_AUTO_SWAP": "1",
+    })
+
+
+def add_papers(db, fs, rng, ids, pages):
+    for arxiv_id in ids:
+        pdf = random_paper(rng, n_pages=pages)
+        file_id = fs.put(pdf, filename=f"{arxiv_id}.pdf", sha256=hashlib.sha256(pdf).hexdigest())
+        db.papers.update_one({"arxiv_id": arxiv_id},
+                             {"$set": {"title": f"Paper {arxiv_id}", "file_id": file_id, "pinecone_indexed": False}},
+                             upsert=True)
+
+
+def step(name, fn):
+    import reindex
+
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    counts = result.get("counts", {}) if isinstance(result, dict) else {}
+    print(f"{name:<10} {elapsed:8.2f}s  {result.get('status', ''):<11} plan={result.get('plan')}  built={counts}  "
+          f"active={reindex.active_index.version}")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--papers", type=int, default=40)
+    parser.add_argument("--pages", type=int, default=8)
+    parser.add_argument("--changed", type=int, default=4, help="papers given a new PDF in the last step")
+    parser.add_argument("--embed-ms-per-text", type=float, default=2.0)
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix="athena-reindex-")
+    configure_env(scratch)
+
+    import gridfs
+    import mongomock
+    import mongomock.gridfs
+
+    import pinecone_ingestion
+    import preprocess_pipeline
+    import reindex
+
+    mongomock.gridfs.enable_gridfs_integration()
+    mongo = mongomock.MongoClient()
+    for module in (pinecone_ingestion, preprocess_pipeline):
+        module.set_mongo_client(mongo)
+    db = mongo[pinecone_ingestion.DB_NAME]
+    fs = gridfs.GridFS(db)
+    rng = random.Random(0)
+    ids = [f"0000.{i:05d}" for i in range(args.papers)]
+    add_papers(db, fs, rng, ids, args.pages)
+
+    pinecone_ingestion.set_embed_model(StubEmbedder(ms_per_call=5, ms_per_text=args.embed_ms_per_text))
+    start = time.perf_counter()
+    pinecone_ingestion.run_ingestion()
+    print(f"{'legacy':<10} {time.perf_counter() - start:8.2f}s  un-versioned ingestion of {args.papers} papers")
+
+    step("initial", reindex.reindex_job.run)
+    step("no-op", reindex.reindex_job.run)
+
+    # another embedder: new model name and dimension
+    reindex.EMBED_MODEL_NAME = "stub-384"
+    pinecone_ingestion.set_embed_model(StubEmbedder(ms_per_call=5, ms_per_text=args.embed_ms_per_text, dim=384),
+                                       "stub-384")
+    step("embedder", reindex.reindex_job.run)
+
+    add_papers(db, fs, rng, rng.sample(ids, args.changed), args.pages)
+    step("pdfs", reindex.reindex_job.run)
+    print(f"scratch: {scratch}")
+
+
+if __name__ == "__main__":
+    main()
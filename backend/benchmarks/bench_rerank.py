@@ -0,0 +1,84 @@
+# benchmarks/bench_rerank.py
+# Cross-encoder re-ranking under a latency budget: for each (candidates, budget) pair, the added
+# latency per query, how often the budget forced the retrieval order, and how often the one relevant
+# passage among the candidates ends up in the kept top_n, with and without re-ranking.
+# Retrieval is simulated by placing the relevant passage at a random rank among look-alike distractors.
+#
+#   python benchmarks/bench_rerank.py --candidates 10 30 50 --budgets 50 150 400
+#   python benchmarks/bench_rerank.py --real-model     # cross-encoder/ms-marco-MiniLM-L-6-v2
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reranker import CrossEncoderReranker, load_cross_encoder
+from stubs import StubCrossEncoder
+
+TOPICS = ["attention", "diffusion", "retrieval", "quantization", "tokenization", "distillation",
+          "reinforcement", "graph", "contrastive", "sparsity", "pruning", "alignment"]
+FILLER = ("we study the problem in detail and report results on standard benchmarks "
+          "with ablations over model size data and training budget").split()
+
+
+def passage(rng, words):
+    body = rng.sample(FILLER, 12) + words
+    rng.shuffle(body)
+    return " ".join(body)
+
+
+def make_case(rng, n_candidates):
+    """(query, passages, index of the relevant passage)."""
+    a, b, c = rng.sample(TOPICS, 3)
+    query = f"how does {a} interact with {b} and {c}"
+    passages = []
+    for _ in range(n_candidates - 1):
+        # distractors share some of the query topics, never all of them
+        passages.append(passage(rng, rng.sample([a, b, c], rng.randint(0, 2)) + rng.sample(TOPICS, 2)))
+    relevant = rng.randrange(n_candidates)
+    passages.insert(relevant, passage(rng, [a, b, c, "interact"]))
+    return query, passages, relevant
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--candidates", type=int, nargs="+", default=[10, 30, 50])
+    parser.add_argument("--budgets", type=float, nargs="+", default=[50, 150, 400], help="RERANK_BUDGET_MS")
+    parser.add_argument("--top-n", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--ms-per-call", type=float, default=5.0, help="stub model fixed cost per batch")
+    parser.add_argument("--ms-per-pair", type=float, default=1.5, help="stub model cost per pair")
+    parser.add_argument("--real-model", action="store_true")
+    args = parser.parse_args()
+
+    model = load_cross_encoder() if args.real_model else StubCrossEncoder(args.ms_per_call, args.ms_per_pair)
+
+    print(f"top_n={args.top_n}  batch={args.batch_size}  {args.queries} queries per row")
+    print(f"{'cands':>5} {'budget':>7} {'p50 ms':>7} {'p99 ms':>7} {'fallback':>8} {'hit retrieval':>14} {'hit reranked':>13}")
+    for n_candidates in args.candidates:
+        for budget in args.budgets:
+            reranker = CrossEncoderReranker(lambda: model, batch_size=args.batch_size, budget_ms=budget)
+            reranker.warmup()
+            rng = random.Random(0)
+            latencies, base_hits, hits = [], 0, 0
+            for _ in range(args.queries):
+                query, passages, relevant = make_case(rng, n_candidates)
+                start = time.perf_counter()
+                order = reranker.rerank(query, passages, args.top_n)
+                latencies.append((time.perf_counter() - start) * 1000)
+                base_hits += relevant < args.top_n
+                hits += relevant in order
+            stats = reranker.stats()
+            fallbacks = sum(stats["fallbacks"].values()) / stats["requests"]
+            print(f"{n_candidates:5d} {budget:6.0f}ms {np.percentile(latencies, 50):7.1f} "
+                  f"{np.percentile(latencies, 99):7.1f} {fallbacks:8.0%} {base_hits / args.queries:14.0%} "
+                  f"{hits / args.queries:13.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# benchmarks/bench_sse.py
+# Framing cost of the SSE endpoints at many concurrent streams: one json.dumps frame per LLM delta
+# (the old event_stream) against coalesced orjson frames. Deltas are word/space pieces arriving at
+# a fixed interval; the loop's CPU time is measured, transport excluded.
+#
+#   python benchmarks/bench_sse.py --streams 300 --tokens 300 --inter-token-ms 5
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sse import coalesce, sse_frame, DONE_FRAME
+
+TEXT = ("Attention lets every position look at every other position. The cost grows with the square "
+        "of the sequence length, which is why long-context models use sparse or linear variants.\n\n")
+
+
+def deltas(n):
+    pieces = []
+    for word in TEXT.replace("\n", " \n").split(" "):
+        pieces.extend([word, " "])
+    return [pieces[i % len(pieces)] for i in range(n)]
+
+
+async def token_source(tokens, inter_token_ms):
+    for token in tokens:
+        await asyncio.sleep(inter_token_ms / 1000)
+        yield token
+
+
+async def per_delta(tokens, inter_token_ms):
+    frames = nbytes = 0
+    async for chunk in token_source(tokens, inter_token_ms):
+        if chunk.strip():
+            frame = f"data: {json.dumps({'delta': chunk})}\n\n".encode()
+            frames += 1
+            nbytes += len(frame)
+    return frames, nbytes + len(b"data: [DONE]\n\n")
+
+
+async def coalesced(tokens, inter_token_ms, window_ms):
+    frames = nbytes = 0
+    async for chunk in coalesce(token_source(tokens, inter_token_ms), window_ms=window_ms):
+        frame = sse_frame({"delta": chunk})
+        frames += 1
+        nbytes += len(frame)
+    return frames, nbytes + len(DONE_FRAME)
+
+
+async def run(streams, make):
+    cpu, wall = time.process_time(), time.perf_counter()
+    results = await asyncio.gather(*(make() for _ in range(streams)))
+    return time.process_time() - cpu, time.perf_counter() - wall, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--streams", type=int, default=300)
+    parser.add_argument("--tokens", type=int, default=300)
+    parser.add_argument("--inter-token-ms", type=float, default=5.0)
+    parser.add_argument("--windows", type=float, nargs="+", default=[0, 30, 100])
+    args = parser.parse_args()
+    tokens = deltas(args.tokens)
+
+    configs = [("json.dumps per delta", lambda: per_delta(tokens, args.inter_token_ms))]
+    for window in args.windows:
+        configs.append((f"orjson, window {window:g} ms",
+                        lambda window=window: coalesced(tokens, args.inter_token_ms, window)))
+
+    print(f"{args.streams} streams x {args.tokens} deltas every {args.inter_token_ms:g} ms\n")
+    for name, make in configs:
+        cpu, wall, results = asyncio.run(run(args.streams, make))
+        frames = sum(f for f, _ in results) / args.streams
+        nbytes = sum(b for _, b in results) / args.streams
+        print(f"{name:<24} cpu {cpu:6.2f}s  wall {wall:6.2f}s  frames/stream {frames:7.1f}  bytes/stream {nbytes:8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# benchmarks/bench_startup.py
+# Cold-start profile of the FastAPI service: seconds and peak RSS to `import app`, then to warmup().
+# Each run is a fresh interpreter, so nothing is shared between runs.
+#
+#   python benchmarks/bench_startup.py --runs 5
+#   python benchmarks/bench_startup.py --no-warmup --importtime 15   # slowest imports only
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = r"""
+import json, resource, sys, time
+t0 = time.perf_counter()
+import app
+result = {
+    "import_s": time.perf_counter() - t0,
+    "import_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}
+if sys.argv[1] == "1":
+    import rag_pipeline
+    t1 = time.perf_counter()
+    result["warmup_ok"] = rag_pipeline.warmup()
+    result["warmup_s"] = time.perf_counter() - t1
+    result["warmup_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    result["warmup_error"] = rag_pipeline.warmup_state["error"]
+print("@@" + json.dumps(result))
+"""
+
+
+def probe(warm):
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE, "1" if warm else "0"],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    ).stdout
+    line = next(l for l in out.splitlines() if l.startswith("@@"))
+    return json.loads(line[2:])
+
+
+def slowest_imports(n):
+    """Top-n modules by cumulative import time, from `python -X importtime`."""
+    err = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    ).stderr
+    rows = []
+    for line in err.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:n]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--no-warmup", action="store_true")
+    parser.add_argument("--importtime", type=int, default=0, metavar="N", help="also list the N slowest imports")
+    args = parser.parse_args()
+
+    results = [probe(not args.no_warmup) for _ in range(args.runs)]
+    keys = ["import_s", "import_rss_mb"] + ([] if args.no_warmup else ["warmup_s", "warmup_rss_mb"])
+    for key in keys:
+        values = [r[key] for r in results]
+        print(f"{key:15s} median={statistics.median(values):8.2f}  min={min(values):8.2f}  max={max(values):8.2f}")
+    errors = {r.get("warmup_error") for r in results} - {None}
+    if errors:
+        print(f"warmup errors: {errors}")
+
+    if args.importtime:
+        print("\nslowest imports (cumulative):")
+        for us, name in slowest_imports(args.importtime):
+            print(f"{us / 1000:9.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# benchmarks/bench_vector_index.py
+# Recall@k and latency of LocalVectorStore (exact float32/float16, IVF) against brute force.
+#
+#   python benchmarks/bench_vector_index.py --vectors 100000 --queries 200
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("VECTOR_STORE", "local")
+
+import numpy as np
+
+from vector_store import LocalVectorStore, normalize_rows, top_k_indices
+
+
+def clustered_data(n, dim, n_clusters, rng):
+    """Unit vectors drawn around random topic centres, closer to real embeddings than pure noise."""
+    centres = normalize_rows(rng.standard_normal((n_clusters, dim)))
+    labels = rng.integers(0, n_clusters, size=n)
+    return normalize_rows(centres[labels] + 3.0 * normalize_rows(rng.standard_normal((n, dim)))).astype(np.float32)
+
+
+def latency_stats(fn, queries):
+    times, results = [], []
+    for q in queries:
+        start = time.perf_counter()
+        results.append(fn(q))
+        times.append((time.perf_counter() - start) * 1000)
+    return results, np.percentile(times, 50), np.percentile(times, 99)
+
+
+def recall(results, truth, k):
+    return float(np.mean([len(set(r[:k]) & set(t[:k])) / k for r, t in zip(results, truth)]))
+
+
+def build_store(path, data, dtype, batch=4096):
+    store = LocalVectorStore(path, dimension=data.shape[1], dtype=dtype)
+    ids = [f"v{i}" for i in range(len(data))]
+    for s in range(0, len(data), batch):
+        store.upsert(ids[s:s + batch], data[s:s + batch], [{} for _ in range(min(batch, len(data) - s))])
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--vectors", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 16, 32])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    data = clustered_data(args.vectors, args.dim, args.clusters, rng)
+    queries = normalize_rows(data[rng.integers(0, len(data), args.queries)]
+                             + 1.0 * normalize_rows(rng.standard_normal((args.queries, args.dim))))
+
+    truth, p50, p99 = latency_stats(lambda q: list(top_k_indices(data @ q, args.k)), queries)
+    print(f"{'mode':28s} {'recall@' + str(args.k):>10s} {'p50 ms':>8s} {'p99 ms':>8s}")
+    print(f"{'brute force (in-memory f32)':28s} {1.0:10.3f} {p50:8.2f} {p99:8.2f}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for dtype in ("float32", "float16"):
+            path = os.path.join(tmp, dtype)
+            build_store(path, data, dtype)
+            start = time.perf_counter()
+            store = LocalVectorStore(path)
+            load_ms = (time.perf_counter() - start) * 1000
+            rows, p50, p99 = latency_stats(lambda q: list(store.search(q, args.k, nprobe=0)[0]), queries)
+            print(f"{'local exact ' + dtype:28s} {recall(rows, truth, args.k):10.3f} {p50:8.2f} {p99:8.2f}"
+                  f"   (mmap load {load_ms:.0f} ms, {os.path.getsize(os.path.join(path, 'vectors.bin')) / 2**20:.0f} MiB)")
+
+        store = LocalVectorStore(os.path.join(tmp, "float32"))
+        start = time.perf_counter()
+        store.build_ivf()
+        print(f"IVF build: {len(store._centroids)} lists in {time.perf_counter() - start:.2f}s")
+        for nprobe in args.nprobe:
+            rows, p50, p99 = latency_stats(lambda q: list(store.search(q, args.k, nprobe=nprobe)[0]), queries)
+            print(f"{'local ivf nprobe=' + str(nprobe):28s} {recall(rows, truth, args.k):10.3f} {p50:8.2f} {p99:8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+# benchmarks/load_test_search.py
+# Load test for POST /search with stubbed embedder, Pinecone and Groq.
+# Reports p50/p99 time-to-first-token under concurrency.
+#
+#   python benchmarks/load_test_search.py --requests 500 --concurrency 200
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+import uvicorn
+
+from stubs import StubAsyncLLM, StubEmbedder, StubVectorStore
+
+
+def percentile(values, pct):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def install_stubs(args):
+    os.environ["VECTOR_STORE"] = "memory"   # never build a Pinecone client
+    scratch = tempfile.mkdtemp(prefix="athena_load_")
+    os.environ["CHUNK_STORE_DIR"] = os.path.join(scratch, "chunk_store")
+    os.environ["SPARSE_INDEX_DIR"] = os.path.join(scratch, "sparse_index")
+    import rag_pipeline
+    from pinecone_ingestion import set_embed_model
+    from vector_store import set_vector_store
+
+    set_embed_model(StubEmbedder(ms_per_call=args.embed_ms))
+    set_vector_store(StubVectorStore(latency_ms=args.index_ms))
+    rag_pipeline.set_async_llm_client(StubAsyncLLM(
+        n_tokens=args.tokens, first_token_ms=args.ttft_ms, inter_token_ms=args.inter_token_ms
+    ))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def serve(args, port):
+    # Runs in its own process so the load generator does not compete for the server's GIL
+    install_stubs(args)
+    from app import app
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def start_server(args, port):
+    proc = multiprocessing.Process(target=serve, args=(args, port), daemon=True)
+    proc.start()
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/ready").status_code == 200:
+                return proc
+        except httpx.TransportError:
+            time.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError("server did not come up")
+
+
+async def one_request(client, url, query):
+    start = time.perf_counter()
+    ttft = None
+    async with client.stream("POST", url, json={"query": query}) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            if ttft is None and line != "data: [DONE]":
+                ttft = time.perf_counter() - start
+    return ttft, time.perf_counter() - start
+
+
+async def run_load(url, n_requests, concurrency):
+    sem = asyncio.Semaphore(concurrency)
+    # fresh connection per request, so a keep-alive reap on the server never races a reused socket
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=0)
+
+    async with httpx.AsyncClient(limits=limits, timeout=None) as client:
+        async def worker(i):
+            async with sem:
+                return await one_request(client, url, f"what is attention #{i}")
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(worker(i) for i in range(n_requests)))
+        elapsed = time.perf_counter() - start
+    return results, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--embed-ms", type=float, default=15.0, help="CPU time per encode call")
+    parser.add_argument("--index-ms", type=float, default=20.0, help="vector query latency")
+    parser.add_argument("--ttft-ms", type=float, default=150.0, help="LLM time to first token")
+    parser.add_argument("--inter-token-ms", type=float, default=10.0)
+    parser.add_argument("--tokens", type=int, default=50)
+    args = parser.parse_args()
+
+    port = free_port()
+    server = start_server(args, port)
+    try:
+        results, elapsed = asyncio.run(
+            run_load(f"http://127.0.0.1:{port}/search", args.requests, args.concurrency)
+        )
+    finally:
+        server.terminate()
+        server.join(timeout=5)
+
+    ttfts = [r[0] * 1000 for r in results if r[0] is not None]
+    totals = [r[1] * 1000 for r in results]
+    print(f"requests={args.requests} concurrency={args.concurrency} wall={elapsed:.2f}s "
+          f"throughput={args.requests / elapsed:.1f} req/s")
+    print(f"TTFT   p50={percentile(ttfts, 50):8.1f} ms  p99={percentile(ttfts, 99):8.1f} ms  "
+          f"mean={statistics.mean(ttfts):8.1f} ms")
+    print(f"total  p50={percentile(totals, 50):8.1f} ms  p99={percentile(totals, 99):8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
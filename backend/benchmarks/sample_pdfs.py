@@ -0,0 +1,87 @@
+# benchmarks/sample_pdfs.py
+# Generates a local corpus of small text PDFs so preprocessing can be benchmarked offline.
+#
+#   python benchmarks/sample_pdfs.py --out /tmp/athena_corpus --papers 50 --pages 12
+import argparse
+import os
+import random
+
+WORDS = (
+    "attention transformer gradient embedding retrieval token layer network training "
+    "dataset benchmark model loss optimization inference latency vector encoder decoder "
+    "representation sparse dense query context language learning neural graph diffusion"
+).split()
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(pages):
+    """Build a minimal valid PDF; `pages` is a list of pages, each a list of text lines."""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once page object numbers are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_refs = []
+    for lines in pages:
+        ops = ["BT", "/F1 10 Tf", "12 TL", "50 780 Td"]
+        for line in lines:
+            ops.append(f"({_escape(line)}) Tj T*")
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_ref = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_ref
+        )
+        page_refs.append(len(objects))
+    kids = " ".join(f"{ref} 0 R" for ref in page_refs)
+    objects[1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_refs)} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def random_paper(rng, n_pages=10, lines_per_page=60, words_per_line=14):
+    pages = []
+    for _ in range(n_pages):
+        lines = []
+        for _ in range(lines_per_page):
+            line = " ".join(rng.choice(WORDS) for _ in range(words_per_line))
+            lines.append(line.capitalize() + ".")
+        pages.append(lines)
+    return make_pdf(pages)
+
+
+def write_corpus(out_dir, n_papers=20, n_pages=10, seed=0):
+    rng = random.Random(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for i in range(n_papers):
+        path = os.path.join(out_dir, f"0000.{i:05d}.pdf")
+        with open(path, "wb") as f:
+            f.write(random_paper(rng, n_pages=n_pages))
+        paths.append(path)
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a corpus of sample PDFs")
+    parser.add_argument("--out", default="sample_corpus")
+    parser.add_argument("--papers", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=10)
+    args = parser.parse_args()
+    paths = write_corpus(args.out, args.papers, args.pages)
+    print(f"Wrote {len(paths)} PDFs to {args.out}")
@@ -0,0 +1,162 @@
+# benchmarks/stubs.py
+# In-process stand-ins for the remote backends, so benchmarks run without API keys.
+import asyncio
+import hashlib
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+DIMENSION = 768
+
+
+def model_compute(ms):
+    """Block the calling thread for `ms` milliseconds.
+    Torch kernels release the GIL, so a plain sleep models a forward pass better than a spin loop."""
+    time.sleep(ms / 1000)
+
+
+def text_vector(text, dim=DIMENSION):
+    seed = int(hashlib.md5(text.encode()).hexdigest()[:8], 16)
+    vec = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return vec / np.linalg.norm(vec)
+
+
+# ===== Embedding model =====
+class StubEmbedder:
+    def __init__(self, ms_per_call=15.0, ms_per_text=2.0, dim=DIMENSION):
+        self.ms_per_call = ms_per_call
+        self.ms_per_text = ms_per_text
+        self.dim = dim
+
+    def encode(self, texts, **kwargs):
+        single = isinstance(texts, str)
+        if single:
+            texts = [texts]
+        model_compute(self.ms_per_call + self.ms_per_text * len(texts))
+        vectors = np.stack([text_vector(t, self.dim) for t in texts]) if texts else np.zeros((0, self.dim), np.float32)
+        return vectors[0] if single else vectors
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+
+# ===== Vector index =====
+def _stub_matches(top_k, score):
+    return [
+        {
+            "id": f"0000.{i:05d}_chunk0",
+            "score": score - i * 0.01,
+            "metadata": {
+                "arxiv_id": f"0000.{i:05d}",
+                "title": f"Stub paper {i}",
+                "chunk_index": 0,
+                "snippet": "Transformers use self-attention to mix information across tokens. " * 4,
+            },
+        }
+        for i in range(top_k)
+    ]
+
+
+class StubVectorStore:
+    """Remote-index stand-in: fixed matches after a network-like delay."""
+
+    def __init__(self, latency_ms=20.0, score=0.8):
+        self.latency_ms = latency_ms
+        self.score = score
+
+    def upsert(self, ids, embeddings, metadatas):
+        time.sleep(self.latency_ms / 1000)
+
+    def query(self, vector, top_k=10, include_metadata=True):
+        time.sleep(self.latency_ms / 1000)
+        return {"matches": _stub_matches(top_k, self.score)}
+
+    async def aquery(self, vector, top_k=10, include_metadata=True):
+        await asyncio.sleep(self.latency_ms / 1000)
+        return {"matches": _stub_matches(top_k, self.score)}
+
+    async def aclose(self):
+        pass
+
+
+# ===== LLM =====
+def _chunk(token):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=token))])
+
+
+class _AsyncTokenStream:
+    def __init__(self, tokens, first_token_ms, inter_token_ms, on_abandon=None):
+        self.tokens = tokens
+        self.first_token_ms = first_token_ms
+        self.inter_token_ms = inter_token_ms
+        self.on_abandon = on_abandon
+        self.sent = 0
+        self.closed = False
+
+    def __aiter__(self):
+        return self._run()
+
+    async def _run(self):
+        await asyncio.sleep(self.first_token_ms / 1000)
+        for i, token in enumerate(self.tokens):
+            if i:
+                await asyncio.sleep(self.inter_token_ms / 1000)
+            self.sent += 1
+            yield _chunk(token)
+
+    async def close(self):
+        """Like AsyncStream.close(): drops the HTTP response, abandoning the generation if unfinished."""
+        if not self.closed:
+            self.closed = True
+            if self.sent < len(self.tokens) and self.on_abandon is not None:
+                self.on_abandon()
+
+
+class StubAsyncLLM:
+    """Mimics `AsyncGroq().chat.completions.create(stream=True)`."""
+
+    def __init__(self, n_tokens=50, first_token_ms=150.0, inter_token_ms=10.0):
+        self.tokens = [f"tok{i} " for i in range(n_tokens)]
+        self.first_token_ms = first_token_ms
+        self.inter_token_ms = inter_token_ms
+        self.abandoned = 0    # streams closed before their last token
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _abandon(self):
+        self.abandoned += 1
+
+    async def _create(self, **kwargs):
+        return _AsyncTokenStream(self.tokens, self.first_token_ms, self.inter_token_ms, self._abandon)
+
+
+# ===== Cross-encoder =====
+class StubCrossEncoder:
+    """Mimics `CrossEncoder.predict`: scores each (query, passage) pair by the share of query words it contains."""
+
+    def __init__(self, ms_per_call=5.0, ms_per_pair=1.5):
+        self.ms_per_call = ms_per_call
+        self.ms_per_pair = ms_per_pair
+
+    def predict(self, pairs, **kwargs):
+        model_compute(self.ms_per_call + self.ms_per_pair * len(pairs))
+        scores = []
+        for query, passage in pairs:
+            terms = set(query.lower().split())
+            scores.append(len(terms & set(passage.lower().split())) / max(1, len(terms)))
+        return np.asarray(scores, dtype=np.float32)
+
+
+# ===== Image captioner =====
+class StubCaptioner:
+    """Mimics BlipCaptioner: `load_ms` once when built, then a fixed plus per-image generate cost."""
+
+    def __init__(self, load_ms=0.0, ms_per_call=120.0, ms_per_image=25.0):
+        model_compute(load_ms)
+        self.ms_per_call = ms_per_call
+        self.ms_per_image = ms_per_image
+
+    def encode(self, images, **kwargs):
+        images = list(images)
+        model_compute(self.ms_per_call + self.ms_per_image * len(images))
+        return [f"a figure with mean pixel value {int(np.asarray(image).mean())}" for image in images]
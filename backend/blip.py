@@ -1,22 +1,82 @@
-from rag_pipeline import rag_query
+# blip.py
+# BLIP image captioning. The processor and model are loaded once per process on first use, and
+# encode() captions a whole batch of images in one generate call (see image_query.py).
+import os
+import threading
 
-def image_to_query(image_path):
+from dotenv import load_dotenv
+
+load_dotenv()
+CAPTION_MODEL_NAME = os.getenv("CAPTION_MODEL", "Salesforce/blip-image-captioning-base")
+CAPTION_MAX_TOKENS = int(os.getenv("CAPTION_MAX_TOKENS", "30"))
+
+
+class BlipCaptioner:
+    """Duck-types the embedding model interface: encode(images) returns one caption per image."""
+
+    def __init__(self, model_name=CAPTION_MODEL_NAME, max_new_tokens=CAPTION_MAX_TOKENS):
+        self.model_name = model_name
+        self.max_new_tokens = max_new_tokens
+        self.processor = None
+        self.model = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        if self.model is None:
+            with self._lock:
+                if self.model is None:
+                    # imported here so importing this module does not pull in torch
+                    from transformers import BlipProcessor, BlipForConditionalGeneration
+                    self.processor = BlipProcessor.from_pretrained(self.model_name)
+                    model = BlipForConditionalGeneration.from_pretrained(self.model_name)
+                    model.eval()
+                    self.model = model
+        return self
+
+    def loaded(self):
+        return self.model is not None
+
+    def encode(self, images, **kwargs):
+        import torch
+
+        self.load()
+        inputs = self.processor(images=list(images), return_tensors="pt")
+        with torch.inference_mode():
+            out = self.model.generate(**inputs, max_new_tokens=self.max_new_tokens)
+        return [caption.strip() for caption in self.processor.batch_decode(out, skip_special_tokens=True)]
 
 
-    from transformers import BlipProcessor, BlipForConditionalGeneration
+_captioner = None
+_captioner_lock = threading.Lock()
+
+
+def get_captioner():
+    global _captioner
+    if _captioner is None:
+        with _captioner_lock:
+            if _captioner is None:
+                _captioner = BlipCaptioner()
+    return _captioner
+
+
+def set_captioner(captioner):
+    global _captioner
+    _captioner = captioner
+
+
+def image_to_query(image_path):
     from PIL import Image
-    
-    processor = BlipProcessor.from_pretrained("Salesforce/blip-image-captioning-base")
-    model = BlipForConditionalGeneration.from_pretrained("Salesforce/blip-image-captioning-base")
 
-    image = Image.open(image_path)
-    inputs = processor(images=image, return_tensors="pt")
-    out = model.generate(**inputs)
-    caption = processor.decode(out[0], skip_special_tokens=True)
-    return caption
+    with Image.open(image_path) as image:
+        return get_captioner().encode([image.convert("RGB")])[0]
+
 
 # Example usage:
-image_query = image_to_query("pasta.jpg")
-print("Generated caption:", image_query)
-answer = rag_query(image_query)
-# print(answer)
\ No newline at end of file
+if __name__ == "__main__":
+    import sys
+    from rag_pipeline import rag_query
+
+    image_query = image_to_query(sys.argv[1] if len(sys.argv) > 1 else "pasta.jpg")
+    print("Generated caption:", image_query)
+    answer = rag_query(image_query)
+    # print(answer)
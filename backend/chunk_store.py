@@ -0,0 +1,158 @@
+# chunk_store.py
+# Full chunk text, keyed like the vector ids ({arxiv_id}_chunk{n}), so prompts are built from
+# whole chunks instead of the 300-char metadata snippet.
+#
+# chunks.bin  append-only UTF-8 text of every chunk, memory-mapped for reads
+# chunks.idx  append-only fixed-width records (paper, chunk, offset, length) into chunks.bin
+# .lock       held while appending, so several processes can write to the same store
+import mmap
+import os
+import threading
+
+import numpy as np
+from dotenv import load_dotenv
+
+from file_lock import file_lock
+from index_versions import active_path
+
+load_dotenv()
+CHUNK_STORE_DIR = os.getenv("CHUNK_STORE_DIR", "chunk_store")
+
+INDEX_RECORD = np.dtype([("paper", "S32"), ("chunk", "<u4"), ("offset", "<u8"), ("length", "<u4")])
+
+
+def split_chunk_id(chunk_id):
+    arxiv_id, _, n = chunk_id.rpartition("_chunk")
+    return arxiv_id, int(n)
+
+
+class ChunkStore:
+    def __init__(self, path=CHUNK_STORE_DIR):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._text_path = os.path.join(path, "chunks.bin")
+        self._index_path = os.path.join(path, "chunks.idx")
+        self._lock_path = os.path.join(path, ".lock")
+        for p in (self._text_path, self._index_path):
+            if not os.path.exists(p):
+                open(p, "wb").close()
+        self._lock = threading.Lock()
+        self._locations = {}        # (arxiv_id, chunk_index) -> (offset, length)
+        self._paper_chunks = {}     # arxiv_id -> highest chunk_index seen
+        self._records_read = 0
+        self._mm = None
+        self._mm_size = 0
+        self._refresh()
+
+    def __len__(self):
+        return len(self._locations)
+
+    # ---------------------- Loading ----------------------
+    def _refresh(self):
+        """Pick up records appended since the last read (possibly by another process)."""
+        with self._lock:
+            size = os.path.getsize(self._index_path)
+            n = size // INDEX_RECORD.itemsize
+            if n > self._records_read:
+                records = np.fromfile(self._index_path, dtype=INDEX_RECORD, count=n - self._records_read,
+                                      offset=self._records_read * INDEX_RECORD.itemsize)
+                self._apply(records)
+                self._records_read = n
+
+    def _apply(self, records):
+        for paper, chunk, offset, length in records.tolist():
+            arxiv_id = paper.decode()
+            self._locations[(arxiv_id, chunk)] = (offset, length)
+            if chunk > self._paper_chunks.get(arxiv_id, -1):
+                self._paper_chunks[arxiv_id] = chunk
+
+    def _view(self, end):
+        if end > self._mm_size:
+            with self._lock:
+                if end > self._mm_size:
+                    size = os.path.getsize(self._text_path)
+                    if size:
+                        with open(self._text_path, "rb") as f:
+                            # the old map is dropped, not closed: readers may still hold views of it
+                            self._mm = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+                    self._mm_size = size
+        return memoryview(self._mm) if self._mm is not None else memoryview(b"")
+
+    # ---------------------- Writes ----------------------
+    def put_many(self, chunks):
+        """Append chunk dicts ({"arxiv_id", "chunk_index", "chunk"}). Re-putting a key supersedes it."""
+        if not chunks:
+            return
+        encoded = [c["chunk"].encode("utf-8") for c in chunks]
+        with file_lock(self._lock_path):
+            # records other writers appended first; ours then follow them in chunks.idx
+            self._refresh()
+            self._append(chunks, encoded)
+
+    def _append(self, chunks, encoded):
+        with self._lock:
+            offset = os.path.getsize(self._text_path)
+            records = np.zeros(len(chunks), dtype=INDEX_RECORD)
+            for i, (c, data) in enumerate(zip(chunks, encoded)):
+                records[i] = (c["arxiv_id"].encode(), c["chunk_index"], offset, len(data))
+                offset += len(data)
+            with open(self._text_path, "ab") as tf:
+                tf.write(b"".join(encoded))
+            # index last, so a reader never sees a record whose text is not on disk yet
+            with open(self._index_path, "ab") as xf:
+                xf.write(records.tobytes())
+            self._apply(records)
+            self._records_read += len(records)
+
+    # ---------------------- Reads ----------------------
+    def get(self, arxiv_id, chunk_index):
+        location = self._locations.get((arxiv_id, chunk_index))
+        if location is None:
+            self._refresh()
+            location = self._locations.get((arxiv_id, chunk_index))
+            if location is None:
+                return None
+        offset, length = location
+        # decode straight from the mapped pages: the returned str is the only allocation
+        return str(self._view(offset + length)[offset:offset + length], "utf-8")
+
+    def get_by_id(self, chunk_id):
+        return self.get(*split_chunk_id(chunk_id))
+
+    def last_chunk_index(self, arxiv_id, default=None):
+        """Highest chunk_index stored for the paper."""
+        return self._paper_chunks.get(arxiv_id, default)
+
+    def window(self, arxiv_id, chunk_index, before=1, after=1):
+        """Texts of chunk_index-before .. chunk_index+after that exist, in order."""
+        last = self.last_chunk_index(arxiv_id, chunk_index)
+        texts = []
+        for n in range(max(0, chunk_index - before), min(last, chunk_index + after) + 1):
+            text = self.get(arxiv_id, n)
+            if text is not None:
+                texts.append(text)
+        return texts
+
+    def close(self):
+        with self._lock:
+            self._mm = None
+            self._mm_size = 0
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_chunk_store():
+    """Chunk store of the active index version."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ChunkStore(active_path("chunks", CHUNK_STORE_DIR))
+    return _store
+
+
+def set_chunk_store(store):
+    global _store
+    _store = store
@@ -0,0 +1,124 @@
+# embed_batcher.py
+# Micro-batching in front of the embedding model: texts submitted within a few milliseconds of
+# each other are encoded in one model.encode call and the rows fanned back to their callers.
+import queue
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+
+import numpy as np
+
+
+def _deliver(setter, value):
+    # a future resolved elsewhere must not take the worker thread (and every queued caller) down with it
+    try:
+        setter(value)
+    except InvalidStateError:
+        pass
+
+
+class EmbeddingBatcher:
+    """
+    submit(text) returns a concurrent.futures.Future resolving to a float32 vector;
+    await it with asyncio.wrap_future or block on .result().
+    A worker takes the first waiting text, then keeps collecting for up to `max_wait_ms` or until
+    `max_batch_size` texts are in hand, and encodes them together.
+    Any model with encode(list) works; `convert` turns its output into per-item rows
+    (a float32 matrix by default, `list` for e.g. captions).
+    """
+
+    def __init__(self, model_fn, max_batch_size=32, max_wait_ms=5.0, workers=1, name="embed", convert=None):
+        self.model_fn = model_fn          # callable returning the model, resolved on first batch
+        self.convert = convert or (lambda out: np.asarray(out, dtype=np.float32))
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self.batches = 0
+        self.items = 0
+        self.batch_size_counts = {}       # batch size -> number of batches
+        self.queue_wait_seconds = 0.0
+        self.encode_seconds = 0.0
+        self._threads = [
+            threading.Thread(target=self._run, name=f"{name}-batcher-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    # ---------------------- Client side ----------------------
+    def submit(self, text) -> Future:
+        future = Future()
+        if self._closed:
+            future.set_exception(RuntimeError("embedding batcher is shut down"))
+            return future
+        self._queue.put((text, future, time.perf_counter()))
+        return future
+
+    def encode(self, text):
+        return self.submit(text).result()
+
+    # ---------------------- Worker side ----------------------
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            self._queue.put(None)   # let the other workers see the shutdown too
+            return None
+        # a caller that went away (e.g. a disconnected request) has cancelled its future: skip it
+        batch = [first] if first[1].set_running_or_notify_cancel() else []
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)   # let the other workers see the shutdown too
+                break
+            if item[1].set_running_or_notify_cancel():
+                batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            if not batch:
+                continue
+            texts = [text for text, _, _ in batch]
+            start = time.perf_counter()
+            try:
+                embeddings = self.convert(self.model_fn().encode(texts))
+            except Exception as e:
+                for _, future, _ in batch:
+                    _deliver(future.set_exception, e)
+                continue
+            finished = time.perf_counter()
+            for row, (_, future, _) in zip(embeddings, batch):
+                _deliver(future.set_result, row)
+            with self._lock:
+                self.batches += 1
+                self.items += len(batch)
+                self.batch_size_counts[len(batch)] = self.batch_size_counts.get(len(batch), 0) + 1
+                self.queue_wait_seconds += sum(start - queued_at for _, _, queued_at in batch)
+                self.encode_seconds += finished - start
+
+    # ---------------------- Introspection ----------------------
+    def stats(self):
+        with self._lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "batches": self.batches,
+                "items": self.items,
+                "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+                "batch_size_counts": dict(sorted(self.batch_size_counts.items())),
+                "mean_queue_wait_ms": 1000 * self.queue_wait_seconds / self.items if self.items else 0.0,
+                "mean_encode_ms": 1000 * self.encode_seconds / self.batches if self.batches else 0.0,
+            }
+
+    def shutdown(self):
+        self._closed = True
+        self._queue.put(None)
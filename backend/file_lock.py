@@ -0,0 +1,29 @@
+# file_lock.py
+# Cross-process writer locks. The stores are append-only files shared by every web worker and
+# ingestion process; readers never lock, but writers are serialized with an flock on a lock file
+# next to the data, which also excludes other threads (each acquire opens its own descriptor).
+import fcntl
+import os
+from contextlib import contextmanager
+
+
+@contextmanager
+def file_lock(path, blocking=True):
+    """
+    Hold an exclusive lock on `path` (created if missing). With blocking=False, yields False
+    instead of waiting when another holder has it.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
@@ -0,0 +1,135 @@
+# image_query.py
+# Image questions (POST /search/image). The uploaded image is captioned by BLIP and the caption is
+# answered like a typed query. Concurrent uploads are captioned together in one generate call, and
+# captions and CLIP embeddings are cached by the SHA-256 of the image bytes, so re-sent images never
+# reach a model. With IMAGE_RETRIEVAL=clip the CLIP image embedding searches the CLIP chunk index
+# directly and the caption only phrases the question.
+import asyncio
+import hashlib
+import io
+import os
+
+from dotenv import load_dotenv
+
+from blip import get_captioner
+from embed_batcher import EmbeddingBatcher
+from metrics import register_cache
+from multimodal import IMAGE_RETRIEVAL, get_clip_model, get_clip_store
+from query_cache import LRUTTLCache
+from rag_pipeline import (QUERIES, RERANK_ENABLED, build_prompt, rag_query_async, rerank_matches,
+                          retrieval_depth, stage_timings, stream_completion)
+
+load_dotenv()
+IMAGE_MAX_BYTES = int(float(os.getenv("IMAGE_MAX_MB", "10")) * 1024 * 1024)
+# Uploads arriving within this window are captioned / CLIP-encoded as one batch
+IMAGE_BATCH_MAX_WAIT_MS = float(os.getenv("IMAGE_BATCH_MAX_WAIT_MS", "20"))
+IMAGE_BATCH_MAX_SIZE = int(os.getenv("IMAGE_BATCH_MAX_SIZE", "8"))
+
+# ===== Per-image caches (image content hash -> caption / CLIP embedding) =====
+caption_cache = LRUTTLCache(
+    max_entries=int(os.getenv("IMAGE_CACHE_MAX_ENTRIES", "4096")),
+    size_fn=len,
+    ttl_seconds=float(os.getenv("IMAGE_CACHE_TTL_SECONDS", "86400")),
+)
+clip_cache = LRUTTLCache(
+    max_entries=int(os.getenv("IMAGE_CACHE_MAX_ENTRIES", "4096")),
+    size_fn=lambda vec: vec.nbytes,
+    ttl_seconds=float(os.getenv("IMAGE_CACHE_TTL_SECONDS", "86400")),
+)
+register_cache("image_captions", caption_cache)
+register_cache("image_clip", clip_cache)
+
+# ===== Model batchers; each model is loaded by its first batch =====
+caption_batcher = EmbeddingBatcher(get_captioner, max_batch_size=IMAGE_BATCH_MAX_SIZE,
+                                   max_wait_ms=IMAGE_BATCH_MAX_WAIT_MS, name="caption", convert=list)
+clip_batcher = EmbeddingBatcher(get_clip_model, max_batch_size=IMAGE_BATCH_MAX_SIZE,
+                                max_wait_ms=IMAGE_BATCH_MAX_WAIT_MS, name="clip")
+
+
+class InvalidImage(ValueError):
+    pass
+
+
+def image_key(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def decode_image(data):
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            return image.convert("RGB")
+    except (UnidentifiedImageError, OSError) as e:
+        raise InvalidImage(f"Could not read image: {e}") from e
+    except Image.DecompressionBombError as e:
+        # small file declaring a huge canvas (more than twice Image.MAX_IMAGE_PIXELS)
+        raise InvalidImage(f"Image too large: {e}") from e
+
+
+async def describe_image(data, with_clip=IMAGE_RETRIEVAL == "clip"):
+    """
+    (caption, CLIP embedding or None) for the image bytes. The image is only decoded, and each
+    model only queued, for what the caches do not already hold.
+    """
+    key = image_key(data)
+    caption = caption_cache.get(key)
+    embedding = clip_cache.get(key) if with_clip else None
+    if caption is not None and (embedding is not None or not with_clip):
+        return caption, embedding
+
+    image = await asyncio.to_thread(decode_image, data)
+    futures = {}
+    if caption is None:
+        futures["caption"] = caption_batcher.submit(image)
+    if with_clip and embedding is None:
+        futures["clip"] = clip_batcher.submit(image)
+    with stage_timings.time("describe_image"):
+        results = dict(zip(futures, await asyncio.gather(*map(asyncio.wrap_future, futures.values()))))
+    if "caption" in results:
+        caption = results["caption"]
+        caption_cache.put(key, caption)
+    if "clip" in results:
+        embedding = results["clip"]
+        clip_cache.put(key, embedding)
+    return caption, embedding
+
+
+async def image_query_async(caption, clip_embedding=None, top_k=5, max_new_tokens=300, threshold=0.2):
+    """
+    Answer for a described image. Without a CLIP embedding (or while the CLIP index is empty) the
+    caption goes through rag_query_async, answer cache and hybrid search included.
+    """
+    if clip_embedding is not None:
+        with stage_timings.time("clip_query"):
+            results = await get_clip_store().aquery(clip_embedding.tolist(), top_k=retrieval_depth(top_k),
+                                                    include_metadata=True)
+        matches = results.get("matches", [])
+        if matches:
+            if RERANK_ENABLED:
+                with stage_timings.time("rerank"):
+                    matches = await asyncio.to_thread(rerank_matches, caption, matches, top_k)
+            with stage_timings.time("prompt"):
+                prompt = build_prompt(caption, matches[:top_k])
+            async for token in stream_completion(prompt, max_new_tokens, []):
+                yield token
+            QUERIES.inc(outcome="image_clip")
+            return
+
+    async for token in rag_query_async(caption, top_k=top_k, max_new_tokens=max_new_tokens, threshold=threshold):
+        yield token
+
+
+def image_stats():
+    return {
+        "retrieval": IMAGE_RETRIEVAL,
+        "captions": caption_batcher.stats(),
+        "clip": clip_batcher.stats(),
+        "caption_cache": caption_cache.stats(),
+        "clip_cache": clip_cache.stats(),
+    }
+
+
+def shutdown_image_query():
+    caption_batcher.shutdown()
+    clip_batcher.shutdown()
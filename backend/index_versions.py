@@ -0,0 +1,169 @@
+# index_versions.py
+# Versioned index layout for blue/green re-indexing (see reindex.py). Each version lives in
+# INDEX_ROOT/<version>/ with its own vectors/, chunks/, sparse/ (and clip/) stores plus:
+#   manifest.json  what the version was built with (embedder, chunker config, metadata layout) and its status
+#   papers.jsonl   append-only, one line per paper landed in the version: file id, content hash, chunk count
+# INDEX_ROOT/active.json names the version queries read; switching it is a single rename.
+# INDEX_ROOT/updated is rewritten after every ingestion run (see touch_index_stamp).
+# Without active.json the original un-versioned paths (LOCAL_INDEX_DIR, CHUNK_STORE_DIR, ...) are used.
+import hashlib
+import json
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+INDEX_ROOT = os.getenv("INDEX_ROOT", "indexes")
+BUILDING, READY, FAILED = "building", "ready", "failed"
+
+
+def config_hash(config):
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def _write_json(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+# ---------------------- Active version pointer ----------------------
+def active_version(root=INDEX_ROOT):
+    try:
+        with open(os.path.join(root, "active.json")) as f:
+            return json.load(f)["version"]
+    except FileNotFoundError:
+        return None
+
+
+def set_active_version(version, root=INDEX_ROOT):
+    os.makedirs(root, exist_ok=True)
+    _write_json(os.path.join(root, "active.json"), {"version": version, "activated_at": time.time()})
+
+
+def version_path(version, part=None, root=INDEX_ROOT):
+    path = os.path.join(root, version)
+    return os.path.join(path, part) if part else path
+
+
+def active_path(part, default, root=INDEX_ROOT):
+    """Directory of `part` in the active version, or `default` when nothing is versioned yet."""
+    version = active_version(root)
+    return version_path(version, part, root) if version else default
+
+
+def version_dimension(version, root=INDEX_ROOT):
+    """Embedding dimension recorded in a version's manifest, None if unknown."""
+    if not version:
+        return None
+    try:
+        with open(os.path.join(version_path(version, root=root), "manifest.json")) as f:
+            return json.load(f).get("dimension")
+    except FileNotFoundError:
+        return None
+
+
+def list_versions(root=INDEX_ROOT):
+    if not os.path.isdir(root):
+        return []
+    versions = [name for name in os.listdir(root) if os.path.exists(os.path.join(root, name, "manifest.json"))]
+    return sorted(versions, key=lambda name: (len(name), name))
+
+
+def next_version_name(root=INDEX_ROOT):
+    numbers = [int(name[1:]) for name in list_versions(root) if name[:1] == "v" and name[1:].isdigit()]
+    return f"v{max(numbers, default=0) + 1}"
+
+
+# ---------------------- Update stamp ----------------------
+# Rewritten whenever papers land in the index, so every serving process (not just the one that ran
+# ingestion) knows cached answers may be out of date.
+def _stamp_path(root):
+    return os.path.join(root, "updated")
+
+
+def touch_index_stamp(root=INDEX_ROOT):
+    os.makedirs(root, exist_ok=True)
+    _write_json(_stamp_path(root), {"updated_at": time.time()})
+
+
+def index_stamp(root=INDEX_ROOT):
+    try:
+        return os.stat(_stamp_path(root)).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+
+# ---------------------- Manifest ----------------------
+class IndexManifest:
+    """manifest.json and papers.jsonl of one version. Paper records are re-read incrementally."""
+
+    def __init__(self, version, root=INDEX_ROOT):
+        self.version = version
+        self.path = version_path(version, root=root)
+        self._manifest_path = os.path.join(self.path, "manifest.json")
+        self._papers_path = os.path.join(self.path, "papers.jsonl")
+        self._lock = threading.Lock()
+        self._papers = {}
+        self._offset = 0
+        with open(self._manifest_path) as f:
+            self.data = json.load(f)
+
+    @classmethod
+    def create(cls, version, config, source=None, root=INDEX_ROOT):
+        path = version_path(version, root=root)
+        os.makedirs(path, exist_ok=True)
+        _write_json(os.path.join(path, "manifest.json"), {
+            "version": version,
+            "status": BUILDING,
+            "source": source,
+            "config": config,
+            "created_at": time.time(),
+        })
+        return cls(version, root)
+
+    @property
+    def config(self):
+        return self.data["config"]
+
+    @property
+    def status(self):
+        return self.data["status"]
+
+    def update(self, **fields):
+        with self._lock:
+            self.data.update(fields)
+            _write_json(self._manifest_path, self.data)
+
+    def papers(self):
+        """arxiv_id -> latest record, including lines appended by other processes."""
+        if not os.path.exists(self._papers_path) or os.path.getsize(self._papers_path) <= self._offset:
+            return self._papers
+        with self._lock:
+            with open(self._papers_path, "rb") as f:
+                f.seek(self._offset)
+                for raw in f:
+                    if not raw.endswith(b"\n"):
+                        break   # partially written tail, picked up next time
+                    self._offset += len(raw)
+                    record = json.loads(raw)
+                    self._papers[record["arxiv_id"]] = record
+        return self._papers
+
+    def record_papers(self, records):
+        if not records:
+            return
+        with self._lock:
+            with open(self._papers_path, "a") as f:
+                f.write("".join(json.dumps(record) + "\n" for record in records))
+
+    def summary(self):
+        return {**self.data, "papers": len(self.papers())}
+
+
+def paper_record(arxiv_id, file_id, content_hash, chunks, action):
+    return {"arxiv_id": arxiv_id, "file_id": str(file_id), "content_hash": content_hash,
+            "chunks": chunks, "action": action, "at": time.time()}
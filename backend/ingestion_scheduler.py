@@ -0,0 +1,202 @@
+# ingestion_scheduler.py
+# One process-wide scheduler for the background ingestion that low-relevance queries trigger.
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import Counter, ERRORS, INGESTION_STAGE_SECONDS
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+
+INGESTION_TRIGGERS = Counter("athena_ingestion_triggers_total",
+                             "Ingestion requests by result (queued, merged into a live job, rejected)", ["result"])
+
+STOPWORDS = {
+    "a", "an", "the", "of", "in", "on", "for", "to", "and", "or", "is", "are", "was",
+    "what", "how", "why", "when", "which", "who", "does", "do", "can", "explain",
+    "about", "me", "tell", "with", "between", "vs", "i", "you", "it", "this", "that",
+}
+
+
+def topic_terms(topic: str) -> frozenset:
+    """Normalize a query into a bag of terms: lowercase, no punctuation/stopwords, naive plural stemming."""
+    words = re.findall(r"[a-z0-9]+", topic.lower())
+    terms = set()
+    for w in words:
+        if w in STOPWORDS:
+            continue
+        if len(w) > 3 and w.endswith("s") and not w.endswith("ss"):
+            w = w[:-1]
+        terms.add(w)
+    return frozenset(terms)
+
+
+def similarity(a: frozenset, b: frozenset) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class IngestionJob:
+    def __init__(self, topic: str, terms: frozenset):
+        self.id = uuid.uuid4().hex[:12]
+        self.topic = topic
+        self.terms = terms
+        self.status = QUEUED
+        self.coalesced = 0          # how many later requests were merged into this job
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.future = None
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "topic": self.topic,
+            "status": self.status,
+            "coalesced": self.coalesced,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class IngestionScheduler:
+    """
+    fetch_fn(topic) pulls new papers for a topic into Mongo and may run concurrently (max_workers).
+    index_fn() embeds every un-indexed paper; it is serialized and skipped when a pass that
+    started after this job's fetch already covered its papers.
+    Identical / near-identical topics (term Jaccard >= dedup_similarity) are merged into the
+    queued, running or recently finished job instead of starting a new one, and submits are
+    rejected once max_queue jobs are waiting.
+    """
+
+    def __init__(self, fetch_fn, index_fn, max_workers=2, max_queue=20,
+                 dedup_similarity=0.6, cooldown_seconds=600, history_size=200):
+        self.fetch_fn = fetch_fn
+        self.index_fn = index_fn
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.dedup_similarity = dedup_similarity
+        self.cooldown_seconds = cooldown_seconds
+        self.history_size = history_size
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._index_lock = threading.Lock()
+        self._last_index_started = 0.0
+        self.rejected = 0
+        self._closed = False
+
+    # ---------------------- Submission ----------------------
+    def _find_duplicate(self, terms, now):
+        for job in reversed(self._jobs.values()):
+            if job.status in (FAILED, CANCELLED):
+                continue
+            if job.status == DONE and now - job.finished_at > self.cooldown_seconds:
+                continue
+            if similarity(terms, job.terms) >= self.dedup_similarity:
+                return job
+        return None
+
+    def _queued_count(self):
+        return sum(1 for job in self._jobs.values() if job.status == QUEUED)
+
+    def _trim_history(self):
+        while len(self._jobs) > self.history_size:
+            oldest_id, oldest = next(iter(self._jobs.items()))
+            if oldest.status in (QUEUED, RUNNING):
+                break
+            del self._jobs[oldest_id]
+
+    def submit(self, topic: str):
+        """Schedule ingestion for `topic`. Returns the (possibly existing) job, or None if rejected."""
+        terms = topic_terms(topic)
+        now = time.time()
+        with self._lock:
+            if self._closed:
+                return None
+            duplicate = self._find_duplicate(terms, now)
+            if duplicate is not None:
+                duplicate.coalesced += 1
+                INGESTION_TRIGGERS.inc(result="merged")
+                print(f"🔁 Ingestion for '{topic}' merged into job {duplicate.id} ({duplicate.status})")
+                return duplicate
+            if self._queued_count() >= self.max_queue:
+                self.rejected += 1
+                INGESTION_TRIGGERS.inc(result="rejected")
+                print(f"⛔ Ingestion queue full, dropping '{topic}'")
+                return None
+            job = IngestionJob(topic, terms)
+            self._jobs[job.id] = job
+            self._trim_history()
+            # submitted under the lock, so shutdown() sees the future of every queued job
+            job.future = self._executor.submit(self._run, job)
+        INGESTION_TRIGGERS.inc(result="queued")
+        return job
+
+    # ---------------------- Execution ----------------------
+    def _run(self, job):
+        with self._lock:
+            job.status = RUNNING
+            job.started_at = time.time()
+        try:
+            self.fetch_fn(job.topic)
+            fetched_at = time.time()
+            with self._index_lock:
+                # A pass that started after our fetch has already picked up our papers
+                if self._last_index_started < fetched_at:
+                    self._last_index_started = time.time()
+                    self.index_fn()
+            status, error = DONE, None
+        except Exception as e:
+            print(f"❌ Ingestion job {job.id} ('{job.topic}') failed: {e}")
+            ERRORS.inc(stage="ingestion_job")
+            status, error = FAILED, str(e)
+        with self._lock:
+            job.status = status
+            job.error = error
+            job.finished_at = time.time()
+        INGESTION_STAGE_SECONDS.observe(job.finished_at - job.started_at, stage="job")
+
+    # ---------------------- Introspection ----------------------
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.to_dict() if job else None
+
+    def snapshot(self):
+        with self._lock:
+            jobs = [job.to_dict() for job in reversed(self._jobs.values())]
+        counts = {state: 0 for state in (QUEUED, RUNNING, DONE, FAILED, CANCELLED)}
+        for job in jobs:
+            counts[job["status"]] += 1
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "counts": counts,
+            "rejected": self.rejected,
+            "jobs": jobs,
+        }
+
+    @staticmethod
+    def _cancel(job):
+        job.status = CANCELLED
+        job.error = "scheduler shut down"
+        job.finished_at = time.time()
+
+    def shutdown(self, wait=False):
+        """Stop accepting jobs; queued jobs are dropped and reported as cancelled."""
+        with self._lock:
+            self._closed = True
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+        with self._lock:
+            for job in self._jobs.values():
+                if job.status == QUEUED and job.future is not None and job.future.cancelled():
+                    self._cancel(job)
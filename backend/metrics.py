@@ -0,0 +1,175 @@
+# metrics.py
+# In-process counters and fixed-bucket histograms rendered in the Prometheus text format (GET /metrics).
+# An observation is one lock and a bisect, so instrumentation stays on in production.
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# seconds; spans a cached embed lookup up to a full ingestion phase
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics[metric.name] = metric   # a re-imported module replaces its metrics
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for suffix, names, values, value in metric.samples():
+                lines.append(f"{metric.name}{suffix}{_format_labels(names, values)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=(), registry=REGISTRY):
+        super().__init__(name, help, labelnames, registry)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield "", self.labelnames, key, value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS, registry=REGISTRY):
+        super().__init__(name, help, labelnames, registry)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}     # label values -> [per-bucket counts (+Inf last), sum]
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][i] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def totals(self):
+        """{label values: (count, sum)} for every series observed so far."""
+        with self._lock:
+            return {key: (sum(counts), total) for key, (counts, total) in self._series.items()}
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, list(counts), total) for key, (counts, total) in self._series.items())
+        names = self.labelnames + ("le",)
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                yield "_bucket", names, key + (_format_value(bound),), cumulative
+            yield "_count", self.labelnames, key, cumulative
+            yield "_sum", self.labelnames, key, total
+
+
+class CallbackMetric(_Metric):
+    """Read at scrape time from `fn()`, which returns a number or {label values tuple: number}."""
+
+    def __init__(self, name, help, fn, kind="gauge", labelnames=(), registry=REGISTRY):
+        super().__init__(name, help, labelnames, registry)
+        self.kind = kind
+        self.fn = fn
+
+    def samples(self):
+        try:
+            values = self.fn()
+        except Exception:
+            return
+        if not isinstance(values, dict):
+            values = {(): values}
+        for key, value in sorted(values.items()):
+            yield "", self.labelnames, key, value
+
+
+# ===== Shared across the query path and ingestion =====
+ERRORS = Counter("athena_errors_total", "Errors by pipeline stage", ["stage"])
+INGESTION_STAGE_SECONDS = Histogram(
+    "athena_ingestion_stage_seconds",
+    "Duration of ingestion phases: fetch (one arXiv call), download (one PDF), read/extract/chunk "
+    "(one paper), embed/clip_embed/upsert (one batch), job (one scheduled ingestion)",
+    ["stage"],
+)
+
+# caches exposing stats() with hits/misses/entries, registered by the module that owns them
+_caches = {}
+
+
+def register_cache(name, cache):
+    _caches[name] = cache
+
+
+def _cache_stat(field):
+    return lambda: {(name,): cache.stats()[field] for name, cache in list(_caches.items())}
+
+
+CallbackMetric("athena_cache_hits_total", "Cache hits", _cache_stat("hits"), kind="counter", labelnames=["cache"])
+CallbackMetric("athena_cache_misses_total", "Cache misses", _cache_stat("misses"), kind="counter", labelnames=["cache"])
+CallbackMetric("athena_cache_entries", "Entries held by each cache", _cache_stat("entries"), labelnames=["cache"])
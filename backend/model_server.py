@@ -0,0 +1,183 @@
+# model_server.py
+# Dedicated embedding process for multi-worker serving. It loads all-mpnet-base-v2 once and answers
+# encode requests from every web worker over a local socket (EMBED_SERVER). Texts arriving from
+# different workers are coalesced by one EmbeddingBatcher, so RAM holds a single copy of the model
+# however many workers run, and the model still sees full batches.
+#
+#   EMBED_SERVER=/run/athena/embed.sock EMBED_SERVER_AUTHKEY=<random hex> python model_server.py
+#
+# serve.py starts it with a socket in a private temporary directory and a fresh random key.
+import os
+import threading
+import time
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+import numpy as np
+from dotenv import load_dotenv
+
+from embed_batcher import EmbeddingBatcher
+
+load_dotenv()
+# Unix socket path of the model server; when set, web workers encode through it instead of loading the model
+EMBED_SERVER = os.getenv("EMBED_SERVER", "")
+# Shared secret of the server and its clients: connections unpickle what they receive, so there is no default
+EMBED_SERVER_AUTHKEY = os.getenv("EMBED_SERVER_AUTHKEY", "").encode()
+# How long a client keeps retrying while the server is still loading the model
+EMBED_SERVER_CONNECT_TIMEOUT = float(os.getenv("EMBED_SERVER_CONNECT_TIMEOUT", "180"))
+MODEL_SERVER_THREADS = int(os.getenv("MODEL_SERVER_THREADS", "2"))
+MODEL_SERVER_BATCH_MAX_SIZE = int(os.getenv("MODEL_SERVER_BATCH_MAX_SIZE", "64"))
+MODEL_SERVER_BATCH_MAX_WAIT_MS = float(os.getenv("MODEL_SERVER_BATCH_MAX_WAIT_MS", "3"))
+
+
+def _require_authkey(authkey):
+    if not authkey:
+        raise RuntimeError("EMBED_SERVER_AUTHKEY must be set to use the model server (serve.py generates one)")
+    return authkey
+
+
+# ---------------------- Server ----------------------
+class ModelServer:
+    """
+    One thread per client connection. Requests are ("encode", [texts]) -> ("ok", float32 array)
+    or ("error", message), and ("stats",) -> ("ok", batcher stats).
+    """
+
+    def __init__(self, address, model_fn, authkey=EMBED_SERVER_AUTHKEY, max_batch_size=MODEL_SERVER_BATCH_MAX_SIZE,
+                 max_wait_ms=MODEL_SERVER_BATCH_MAX_WAIT_MS, workers=MODEL_SERVER_THREADS):
+        self.address = address
+        self.authkey = _require_authkey(authkey)
+        self.model = model_fn()   # loaded before listening, so an accepted connection is ready to encode
+        self.dimension = self.model.get_sentence_embedding_dimension()
+        self.batcher = EmbeddingBatcher(lambda: self.model, max_batch_size=max_batch_size,
+                                        max_wait_ms=max_wait_ms, workers=workers, name="model-server")
+        self.connections = 0
+        self._listener = None
+        self._closed = False
+
+    def encode(self, texts):
+        futures = [self.batcher.submit(text) for text in texts]
+        if not futures:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        return np.stack([future.result() for future in futures])
+
+    def _handle(self, conn):
+        with conn:
+            while True:
+                try:
+                    request = conn.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    if request[0] == "encode":
+                        conn.send(("ok", self.encode(request[1])))
+                    elif request[0] == "stats":
+                        conn.send(("ok", self.stats()))
+                    else:
+                        conn.send(("error", f"unknown request {request[0]!r}"))
+                except (EOFError, OSError):
+                    return
+                except Exception as e:
+                    conn.send(("error", f"{type(e).__name__}: {e}"))
+
+    def serve_forever(self):
+        if os.path.exists(self.address):
+            os.unlink(self.address)   # stale socket from a previous run
+        self._listener = Listener(self.address, family="AF_UNIX", authkey=self.authkey)
+        print(f"🧠 Model server listening on {self.address}")
+        while not self._closed:
+            try:
+                conn = self._listener.accept()
+            except AuthenticationError:
+                print("⚠️ Model server refused a connection with a wrong key")
+                continue
+            except OSError:
+                if self._closed:
+                    return
+                continue
+            self.connections += 1
+            threading.Thread(target=self._handle, args=(conn,), name="model-server-conn", daemon=True).start()
+
+    def stats(self):
+        return {"connections": self.connections, "dimension": self.dimension, **self.batcher.stats()}
+
+    def close(self):
+        self._closed = True
+        if self._listener is not None:
+            self._listener.close()
+        self.batcher.shutdown()
+
+
+# ---------------------- Client ----------------------
+class RemoteEmbedModel:
+    """
+    Stands in for SentenceTransformer in a web worker: encode() sends the texts to the model server
+    and returns its float32 rows. One connection per calling thread; a dropped connection is
+    re-opened once before the error is raised.
+    """
+
+    def __init__(self, address=EMBED_SERVER, authkey=EMBED_SERVER_AUTHKEY, connect_timeout=EMBED_SERVER_CONNECT_TIMEOUT):
+        self.address = address
+        self.authkey = _require_authkey(authkey)
+        self.connect_timeout = connect_timeout
+        self._local = threading.local()
+        self._dimension = None
+
+    def _connect(self):
+        deadline = time.monotonic() + self.connect_timeout
+        while True:
+            try:
+                return Client(self.address, family="AF_UNIX", authkey=self.authkey)
+            except (FileNotFoundError, ConnectionRefusedError):
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.2)
+
+    def _request(self, *request):
+        for attempt in range(2):
+            conn = getattr(self._local, "conn", None)
+            if conn is None:
+                conn = self._local.conn = self._connect()
+            try:
+                conn.send(request)
+                status, payload = conn.recv()
+                break
+            except (EOFError, OSError):
+                conn.close()
+                self._local.conn = None
+                if attempt:
+                    raise
+        if status != "ok":
+            raise RuntimeError(f"model server: {payload}")
+        return payload
+
+    def encode(self, texts, **kwargs):
+        single = isinstance(texts, str)
+        embeddings = self._request("encode", [texts] if single else list(texts))
+        return embeddings[0] if single else embeddings
+
+    def get_sentence_embedding_dimension(self):
+        if self._dimension is None:
+            self._dimension = self._request("stats")["dimension"]
+        return self._dimension
+
+    def stats(self):
+        return self._request("stats")
+
+
+def main():
+    from pinecone_ingestion import load_embed_model
+
+    if not EMBED_SERVER:
+        raise SystemExit("EMBED_SERVER must be set to the socket path to listen on")
+    server = ModelServer(EMBED_SERVER, load_embed_model)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,136 @@
 from pymongo import MongoClient
+from pymongo.errors import BulkWriteError
 import requests
+from requests.adapters import HTTPAdapter
 import gridfs
 from dotenv import load_dotenv
+import hashlib
 import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
 import feedparser
-from openai import OpenAI
+from query_cache import PersistentCache, normalize_query
+from metrics import ERRORS, INGESTION_STAGE_SECONDS, register_cache
 
 load_dotenv()
 
 MONGO_URL = os.getenv("MONGODB_URI")  # Atlas URI from .env
 DB_NAME = "arxiv_db"
 COLLECTION_NAME = "papers"
+DUPLICATE_KEY_ERROR = 11000   # another ingestion stored the same arxiv_id first
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
-client = OpenAI(
-    base_url="https://openrouter.ai/api/v1",
-    api_key=OPENROUTER_API_KEY,
+ARXIV_API_URL = os.getenv("ARXIV_API_URL", "http://export.arxiv.org/api/query")
+# Concurrent PDF downloads per bulk upload
+DOWNLOAD_WORKERS = int(os.getenv("DOWNLOAD_WORKERS", "4"))
+# Minimum seconds between request starts to one host; arXiv asks for 3s between API calls
+HOST_MIN_INTERVAL = float(os.getenv("HOST_MIN_INTERVAL", "0.5"))
+ARXIV_API_MIN_INTERVAL = float(os.getenv("ARXIV_API_MIN_INTERVAL", "3"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "60"))
+DOWNLOAD_CHUNK_BYTES = 256 * 1024
+# Tags OR-joined into one arXiv search_query
+ARXIV_TAGS_PER_QUERY = int(os.getenv("ARXIV_TAGS_PER_QUERY", "10"))
+INGESTION_CACHE_DIR = os.getenv("INGESTION_CACHE_DIR", "ingestion_cache")
+# A tag fetched within this window is not sent to arXiv again
+ARXIV_FRESHNESS_SECONDS = float(os.getenv("ARXIV_FRESHNESS_SECONDS", "86400"))
+TAG_CACHE_TTL_SECONDS = float(os.getenv("TAG_CACHE_TTL_SECONDS", str(7 * 86400)))
+
+
+# ---------------------- Shared clients ----------------------
+_llm_client = None
+_mongo_client = None
+_http_session = None
+_papers_index_ready = False
+_resource_lock = threading.Lock()
+
+
+def get_llm_client():
+    global _llm_client
+    if _llm_client is None:
+        with _resource_lock:
+            if _llm_client is None:
+                from openai import OpenAI
+                _llm_client = OpenAI(
+                    base_url="https://openrouter.ai/api/v1",
+                    api_key=OPENROUTER_API_KEY,
+                )
+    return _llm_client
+
+
+def get_db():
+    """One MongoClient per process; the unique arxiv_id index is ensured once."""
+    global _mongo_client, _papers_index_ready
+    if _mongo_client is None:
+        with _resource_lock:
+            if _mongo_client is None:
+                _mongo_client = MongoClient(MONGO_URL)
+    db = _mongo_client[DB_NAME]
+    if not _papers_index_ready:
+        db[COLLECTION_NAME].create_index("arxiv_id", unique=True)
+        _papers_index_ready = True
+    return db
+
+
+def set_mongo_client(mongo_client):
+    global _mongo_client, _papers_index_ready
+    _mongo_client = mongo_client
+    _papers_index_ready = False
+
+
+def get_http_session():
+    """Pooled keep-alive session shared by the arXiv API calls and the PDF downloads."""
+    global _http_session
+    if _http_session is None:
+        with _resource_lock:
+            if _http_session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(DOWNLOAD_WORKERS, 1))
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _http_session = session
+    return _http_session
+
+
+class HostRateLimiter:
+    """Spaces request starts to the same host at least `interval` seconds apart, across threads."""
+
+    def __init__(self, interval=HOST_MIN_INTERVAL, overrides=None):
+        self.interval = interval
+        self.overrides = overrides or {}
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url):
+        host = urlsplit(url).netloc
+        interval = self.overrides.get(host, self.interval)
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, 0.0))
+            self._next_slot[host] = slot + interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+rate_limiter = HostRateLimiter(overrides={urlsplit(ARXIV_API_URL).netloc: ARXIV_API_MIN_INTERVAL})
+
+# ---------------------- Ingestion caches ----------------------
+# normalized query -> extracted tags
+tag_cache = PersistentCache(
+    path=os.path.join(INGESTION_CACHE_DIR, "tags.json") if INGESTION_CACHE_DIR else None,
+    max_entries=5000, ttl_seconds=TAG_CACHE_TTL_SECONDS,
 )
+# normalized tag -> arXiv ids returned the last time it was fetched
+arxiv_results_cache = PersistentCache(
+    path=os.path.join(INGESTION_CACHE_DIR, "arxiv_results.json") if INGESTION_CACHE_DIR else None,
+    max_entries=20000, ttl_seconds=ARXIV_FRESHNESS_SECONDS,
+)
+tag_cache.load()
+arxiv_results_cache.load()
+register_cache("tags", tag_cache)
+register_cache("arxiv_results", arxiv_results_cache)
+
 
 def is_contextual(title: str, abstract: str) -> bool:
     bad_keywords = [
@@ -25,7 +140,11 @@ def is_contextual(title: str, abstract: str) -> bool:
     combined = (title + " " + abstract).lower()
     return not any(bad_kw in combined for bad_kw in bad_keywords)
 def extract_tags(query: str) -> list[str]:
-    completion = client.chat.completions.create(
+    key = normalize_query(query)
+    cached = tag_cache.get(key)
+    if cached is not None:
+        return list(cached)
+    completion = get_llm_client().chat.completions.create(
         model="deepseek/deepseek-chat-v3.1:free",
         messages=[
             {"role": "system", "content": "Extract 3-5 short keywords or topics from the user query for searching in arXiv. Return only comma-separated keywords."},
@@ -34,7 +153,11 @@ def extract_tags(query: str) -> list[str]:
         max_tokens=50,
     )
     tags_text = completion.choices[0].message.content.strip()
-    return [tag.strip() for tag in tags_text.split(",") if tag.strip()]
+    tags = [tag.strip() for tag in tags_text.split(",") if tag.strip()]
+    if tags:
+        tag_cache.put(key, tags)
+        tag_cache.save()
+    return tags
 
 def expand_tags(tags: list[str]) -> list[str]:
     expanded = []
@@ -45,13 +168,79 @@ def expand_tags(tags: list[str]) -> list[str]:
         expanded.append(f"{tag} introduction")
         expanded.append(f"{tag} fundamentals")
         expanded.append(f"{tag} basics")
-    return expanded
+    # the LLM often returns overlapping tags; keep the first spelling of each
+    seen = set()
+    unique = []
+    for tag in expanded:
+        key = normalize_query(tag)
+        if key not in seen:
+            seen.add(key)
+            unique.append(tag)
+    return unique
+
+
+SEARCH_TERM_PATTERN = re.compile(r"[A-Za-z0-9][A-Za-z0-9\-]*")
+
+
+def combine_search_query(tags):
+    """One arXiv search_query matching any of the tags: (all:a AND all:b) OR (all:c) ..."""
+    clauses = []
+    for tag in tags:
+        terms = SEARCH_TERM_PATTERN.findall(tag)
+        if terms:
+            clauses.append("(" + " AND ".join(f"all:{t}" for t in terms) + ")")
+    return " OR ".join(clauses)
+
+
+def fetch_arxiv_for_tags(tags, max_results_per_tag=2, fetched=None):
+    """
+    Metadata for every tag in as few arXiv calls as possible: tags fetched within the freshness
+    window are skipped, the rest are OR-joined ARXIV_TAGS_PER_QUERY at a time.
+    Fetched tags are marked fresh right away, unless `fetched` is given: it is then filled with
+    normalized tag -> arXiv ids, for the caller to mark with mark_tags_fetched once they are stored.
+    """
+    keys = list(dict.fromkeys(normalize_query(tag) for tag in tags))
+    stale = [key for key in keys if arxiv_results_cache.get(key) is None]
+    if len(stale) < len(keys):
+        print(f"♻️ {len(keys) - len(stale)} tags fetched recently, skipping them")
+
+    articles = []
+    for start in range(0, len(stale), ARXIV_TAGS_PER_QUERY):
+        group = stale[start:start + ARXIV_TAGS_PER_QUERY]
+        search_query = combine_search_query(group)
+        if not search_query:
+            continue
+        try:
+            with INGESTION_STAGE_SECONDS.time(stage="fetch"):
+                found = fetch_arxiv(search_query, max_results_per_tag * len(group))
+        except Exception as e:
+            print(f"❌ arXiv query failed for {group}: {e}")
+            ERRORS.inc(stage="fetch")
+            continue
+        articles.extend(found)
+        # results of an OR query are not attributable to single tags; each tag records the whole group's ids
+        ids = [paper["arxiv_id"] for paper in found]
+        for key in group:
+            if fetched is None:
+                arxiv_results_cache.put(key, ids)
+            else:
+                fetched[key] = ids
+    if fetched is None:
+        arxiv_results_cache.save()
+    return articles
+
+
+def mark_tags_fetched(fetched, failed=()):
+    """Mark tags fresh (skipped until ARXIV_FRESHNESS_SECONDS pass), except those with a paper in `failed`."""
+    for key, ids in fetched.items():
+        if not any(arxiv_id in failed for arxiv_id in ids):
+            arxiv_results_cache.put(key, ids)
+    arxiv_results_cache.save()
 def fetch_arxiv(query="machine learning", max_results=5):
     """
     Fetch metadata from arXiv based on query.
     Returns a list of dicts with arxiv_id, title, abstract, and pdf_url.
     """
-    base_url = "http://export.arxiv.org/api/query"
     params = {
         "search_query": query,
         "start": 0,
@@ -60,7 +249,8 @@ def fetch_arxiv(query="machine learning", max_results=5):
         "sortOrder": "descending"
     }
 
-    response = requests.get(base_url, params=params)
+    rate_limiter.wait(ARXIV_API_URL)
+    response = get_http_session().get(ARXIV_API_URL, params=params, timeout=HTTP_TIMEOUT)
     response.raise_for_status()
 
     feed = feedparser.parse(response.text)
@@ -92,53 +282,131 @@ def fetch_arxiv(query="machine learning", max_results=5):
 
     return articles
 
-def upload_to_mongo(query, max_results=5):
-    client = MongoClient(MONGO_URL)
-    db = client[DB_NAME]
-    papers_collection = db[COLLECTION_NAME]
-
-    # Ensure unique index on arxiv_id
-    papers_collection.create_index("arxiv_id", unique=True)
+def stream_pdf_to_gridfs(fs, paper):
+    """
+    Download a paper's PDF straight into GridFS chunk by chunk; returns the file id.
+    The file document carries the sha256 of the bytes, so preprocessing can look up its
+    extraction cache without reading the PDF back.
+    """
+    rate_limiter.wait(paper["pdf_url"])
+    with get_http_session().get(paper["pdf_url"], stream=True, timeout=HTTP_TIMEOUT) as response:
+        response.raise_for_status()
+        grid_in = fs.new_file(filename=f"{paper['arxiv_id']}.pdf")
+        digest = hashlib.sha256()
+        try:
+            for block in response.iter_content(chunk_size=DOWNLOAD_CHUNK_BYTES):
+                grid_in.write(block)
+                digest.update(block)
+        except BaseException:
+            grid_in.abort()
+            raise
+        grid_in.sha256 = digest.hexdigest()
+        grid_in.close()
+    return grid_in._id
 
-    articles = fetch_arxiv(query, max_results)
 
-    fs = gridfs.GridFS(db)  # Initialize GridFS once
+def upload_papers(articles, max_workers=None, failed=None):
+    """
+    Bulk path: one $in query for existing ids, concurrent PDF downloads into GridFS,
+    then a single insert_many. Returns the arxiv_ids that were inserted; `failed`, if given,
+    is filled with the arxiv_ids whose PDF could not be downloaded.
+    """
+    db = get_db()
+    papers_collection = db[COLLECTION_NAME]
+    fs = gridfs.GridFS(db)
 
+    candidates = {}
     for paper in articles:
+        if paper["arxiv_id"] in candidates:
+            continue
+        if not is_contextual(paper["title"], paper["abstract"]):
+            print(f"⚠️ Skipped irrelevant paper: {paper['title']}")
+            continue
+        candidates[paper["arxiv_id"]] = paper
+    if not candidates:
+        return []
+
+    existing = {
+        doc["arxiv_id"]
+        for doc in papers_collection.find({"arxiv_id": {"$in": list(candidates)}}, {"arxiv_id": 1})
+    }
+    for arxiv_id in existing:
+        print(f"⚠️ Duplicate found, skipping: {candidates[arxiv_id]['title']} [{arxiv_id}]")
+    new_papers = [paper for arxiv_id, paper in candidates.items() if arxiv_id not in existing]
+    if not new_papers:
+        return []
+    if max_workers is None:
+        max_workers = DOWNLOAD_WORKERS
+
+    def download(paper):
         try:
-            # Check if paper already exists
-            if papers_collection.find_one({"arxiv_id": paper["arxiv_id"]}):
-                print(f"⚠️ Duplicate found, skipping: {paper['title']} [{paper['arxiv_id']}]")
-                continue
-            if not is_contextual(paper["title"], paper["abstract"]):
-                print(f"⚠️ Skipped irrelevant paper: {paper['title']}")
-                continue
+            with INGESTION_STAGE_SECONDS.time(stage="download"):
+                return paper, stream_pdf_to_gridfs(fs, paper)
+        except Exception as e:
+            print(f"❌ Error saving {paper['title']} ({paper['arxiv_id']}): {e}")
+            ERRORS.inc(stage="download")
+            return paper, None
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(new_papers))),
+                            thread_name_prefix="pdf-download") as pool:
+        downloaded = list(pool.map(download, new_papers))
+    if failed is not None:
+        failed.update(paper["arxiv_id"] for paper, file_id in downloaded if file_id is None)
 
-            # Download PDF content
-            response = requests.get(paper["pdf_url"], stream=True)
-            response.raise_for_status()
+    paper_docs = [
+        {
+            "arxiv_id": paper["arxiv_id"],
+            "title": paper["title"],
+            "abstract": paper["abstract"],
+            "pdf_url": paper["pdf_url"],
+            "file_id": file_id,
+            "pinecone_indexed": False  # New field to track indexing status
+        }
+        for paper, file_id in downloaded if file_id is not None
+    ]
+    if not paper_docs:
+        return []
 
-            # Save PDF into GridFS
-            file_id = fs.put(response.content, filename=f"{paper['arxiv_id']}.pdf")
+    rejected = set()
+    try:
+        papers_collection.insert_many(paper_docs, ordered=False)
+    except BulkWriteError as e:
+        for error in e.details.get("writeErrors", []):
+            doc = paper_docs[error["index"]]
+            rejected.add(error["index"])
+            if error.get("code") == DUPLICATE_KEY_ERROR:
+                # another ingestion inserted it since the $in check; drop our orphaned PDF
+                fs.delete(doc["file_id"])
+                continue
+            print(f"❌ Could not insert {doc['arxiv_id']} (PDF kept as GridFS file {doc['file_id']}): {error.get('errmsg')}")
+            ERRORS.inc(stage="insert")
+            if failed is not None:
+                failed.add(doc["arxiv_id"])
+        if e.details.get("writeConcernErrors"):
+            # inserts may not be durable: have the tags fetched again (re-inserts are duplicates)
+            print(f"❌ Write concern not met inserting papers: {e.details['writeConcernErrors']}")
+            ERRORS.inc(stage="insert")
+            if failed is not None:
+                failed.update(doc["arxiv_id"] for doc in paper_docs)
+    inserted = [doc for i, doc in enumerate(paper_docs) if i not in rejected]
+    for doc in inserted:
+        print(f"✅ Inserted: {doc['title']} [{doc['arxiv_id']}]")
+    return [doc["arxiv_id"] for doc in inserted]
 
-            # Build document
-            paper_doc = {
-                "arxiv_id": paper["arxiv_id"],
-                "title": paper["title"],
-                "abstract": paper["abstract"],
-                "pdf_url": paper["pdf_url"],
-                "file_id": file_id,
-                "pinecone_indexed": False  # New field to track indexing status
-            }
 
-            # Insert into MongoDB
-            papers_collection.insert_one(paper_doc)
-            print(f"✅ Inserted: {paper_doc['title']} [{paper_doc['arxiv_id']}]")
+def upload_to_mongo(query, max_results=5):
+    return upload_papers(fetch_arxiv(query, max_results))
 
-        except Exception as e:
-            print(f"❌ Error saving {paper['title']} ({paper['arxiv_id']}): {e}")
 
-    client.close()
+def upload_tags(tags, max_results_per_tag=2):
+    """
+    Fetch metadata for many tags with combined queries, then store every new paper in one bulk upload.
+    Tags are only marked fresh once their papers are stored, so a failed download is retried next time.
+    """
+    fetched, failed = {}, set()
+    inserted = upload_papers(fetch_arxiv_for_tags(tags, max_results_per_tag, fetched), failed=failed)
+    mark_tags_fetched(fetched, failed)
+    return inserted
 
 
 if __name__ == "__main__":
@@ -147,5 +415,4 @@ if __name__ == "__main__":
     print(f"🔖 Extracted tags: {tags}")
     expanded_tags = expand_tags(tags)
     print(f"🔖 Expanded tags: {expanded_tags}")
-    for tag in expanded_tags:
-        upload_to_mongo(tag,2)
\ No newline at end of file
+    upload_tags(expanded_tags, 2)
\ No newline at end of file
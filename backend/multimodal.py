@@ -1,39 +1,113 @@
-from sentence_transformers import SentenceTransformer, util
-from PIL import Image
-
-# ===== 1. Load CLIP model =====
-model = SentenceTransformer("clip-ViT-B-32")  # lightweight and supports both text+image
-
-# ===== 2. Sample data =====
-texts = [
-    "A cute dog playing in the park",
-    "A spaceship flying through space",
-    "A bowl of pasta with tomato sauce"
-]
-
-# Replace with your own image files (download a few .jpg/.png)
-image_paths = [
-    "dog.jpg",
-    "rocket.jpg",
-    "pasta.jpg"
-]
-
-# ===== 3. Encode text and image embeddings =====
-text_embs = model.encode(texts, convert_to_tensor=True)
-image_embs = model.encode([Image.open(p) for p in image_paths], convert_to_tensor=True)
-
-# ===== 4. Ask a query =====
-query = "animal running on grass"
-query_emb = model.encode(query, convert_to_tensor=True)
-
-# ===== 5. Compute similarity =====
-text_scores = util.cos_sim(query_emb, text_embs)[0]
-image_scores = util.cos_sim(query_emb, image_embs)[0]
-
-# ===== 6. Find best matches =====
-best_text_idx = text_scores.argmax()
-best_image_idx = image_scores.argmax()
-
-print("\n🔹 Query:", query)
-print(f"📝 Best text match: '{texts[best_text_idx]}' (score={text_scores[best_text_idx]:.3f})")
-print(f"🖼 Best image match: '{image_paths[best_image_idx]}' (score={image_scores[best_image_idx]:.3f})")
\ No newline at end of file
+# multimodal.py
+# CLIP (clip-ViT-B-32) embeds images and text into one 512-d space. Loaded once per process; with
+# IMAGE_RETRIEVAL=clip, ingestion also writes CLIP text embeddings of each chunk to a separate
+# index so an uploaded image can be matched against papers directly.
+import os
+import threading
+
+from dotenv import load_dotenv
+
+from index_versions import active_version, version_path
+from vector_store import InMemoryVectorStore, LocalVectorStore, PineconeVectorStore, VECTOR_STORE, INDEX_NAME
+
+load_dotenv()
+CLIP_MODEL_NAME = os.getenv("CLIP_MODEL", "clip-ViT-B-32")  # lightweight and supports both text+image
+CLIP_DIMENSION = 512
+# caption: search with the BLIP caption as a text query; clip: also index chunks with CLIP and
+# retrieve with the image embedding
+IMAGE_RETRIEVAL = os.getenv("IMAGE_RETRIEVAL", "caption")
+CLIP_INDEX_NAME = f"{INDEX_NAME}-clip"
+CLIP_INDEX_DIR = os.getenv("CLIP_INDEX_DIR", "clip_index")
+# CLIP's text tower takes 77 tokens; chunk text is cut to roughly that before encoding
+CLIP_TEXT_MAX_CHARS = int(os.getenv("CLIP_TEXT_MAX_CHARS", "200"))
+
+_clip_model = None
+_clip_store = None
+_lock = threading.Lock()
+
+
+def get_clip_model():
+    global _clip_model
+    if _clip_model is None:
+        with _lock:
+            if _clip_model is None:
+                from sentence_transformers import SentenceTransformer
+                _clip_model = SentenceTransformer(CLIP_MODEL_NAME)
+    return _clip_model
+
+
+def set_clip_model(model):
+    global _clip_model
+    _clip_model = model
+
+
+def clip_model_loaded():
+    return _clip_model is not None
+
+
+def clip_text(text):
+    return text[:CLIP_TEXT_MAX_CHARS]
+
+
+def open_clip_store(version=None):
+    """CLIP-embedded chunk index of an index version, on the same backend as the main store (VECTOR_STORE)."""
+    if VECTOR_STORE == "memory":
+        return InMemoryVectorStore(dimension=CLIP_DIMENSION)
+    if VECTOR_STORE == "local":
+        return LocalVectorStore(version_path(version, "clip") if version else CLIP_INDEX_DIR, dimension=CLIP_DIMENSION)
+    return PineconeVectorStore(CLIP_INDEX_NAME, dimension=CLIP_DIMENSION, namespace=version or "")
+
+
+def get_clip_store():
+    global _clip_store
+    if _clip_store is None:
+        with _lock:
+            if _clip_store is None:
+                _clip_store = open_clip_store(active_version())
+    return _clip_store
+
+
+def set_clip_store(store):
+    global _clip_store
+    _clip_store = store
+
+
+if __name__ == "__main__":
+    from PIL import Image
+    from sentence_transformers import util
+
+    model = get_clip_model()
+
+    # ===== Sample data =====
+    texts = [
+        "A cute dog playing in the park",
+        "A spaceship flying through space",
+        "A bowl of pasta with tomato sauce"
+    ]
+
+    # Replace with your own image files (download a few .jpg/.png)
+    image_paths = [
+        "dog.jpg",
+        "rocket.jpg",
+        "pasta.jpg"
+    ]
+
+    # ===== Encode text and image embeddings (one batch each) =====
+    text_embs = model.encode(texts, convert_to_tensor=True)
+    image_embs = model.encode([Image.open(p) for p in image_paths], convert_to_tensor=True)
+
+    # ===== Ask a query =====
+    query = "animal running on grass"
+    query_emb = model.encode(query, convert_to_tensor=True)
+
+    # ===== Compute similarity =====
+    text_scores = util.cos_sim(query_emb, text_embs)[0]
+    image_scores = util.cos_sim(query_emb, image_embs)[0]
+
+    # ===== Find best matches =====
+    best_text_idx = text_scores.argmax()
+    best_image_idx = image_scores.argmax()
+
+    print("\n🔹 Query:", query)
+    print(f"📝 Best text match: '{texts[best_text_idx]}' (score={text_scores[best_text_idx]:.3f})")
+    print(f"🖼 Best image match: '{image_paths[best_image_idx]}' (score={image_scores[best_image_idx]:.3f})")
@@ -1,10 +1,17 @@
 # pinecone_ingestion.py
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from pymongo import MongoClient
-from sentence_transformers import SentenceTransformer
-from pinecone import Pinecone, ServerlessSpec
+import numpy as np
 from tqdm import tqdm
-from preprocess_pipeline import preprocess_pdfs_into_chunks
+from vector_store import get_vector_store, INDEX_NAME
+from chunk_store import get_chunk_store
+from sparse_index import get_sparse_index
+from metrics import ERRORS, INGESTION_STAGE_SECONDS
+from multimodal import IMAGE_RETRIEVAL, get_clip_store, get_clip_model, clip_text
+from index_versions import INDEX_ROOT, IndexManifest, active_version, paper_record, touch_index_stamp
+from file_lock import file_lock
 from dotenv import load_dotenv
 
 # ---------------------- Load environment ----------------------
@@ -12,75 +19,274 @@ load_dotenv()
 MONGO_URL = os.getenv("MONGODB_URI")
 DB_NAME = "arxiv_db"
 COLLECTION_NAME = "papers"
-PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
-INDEX_NAME = "arxiv-papers"
-DIMENSION = 768
+# Changing the model (or the metadata layout below) calls for a re-index: python reindex.py run
+EMBED_MODEL_NAME = os.getenv("EMBED_MODEL", "sentence-transformers/all-mpnet-base-v2")
 BATCH_SIZE = 64
+UPSERT_WORKERS = int(os.getenv("UPSERT_WORKERS", "2"))
+# Upsert batches allowed in flight while the next batch is being encoded
+MAX_PENDING_UPSERTS = int(os.getenv("MAX_PENDING_UPSERTS", "4"))
+# Held for a whole ingestion run, so web workers and CLI runs never embed the same papers twice
+INGESTION_LOCK_PATH = os.getenv("INGESTION_LOCK_PATH", os.path.join(INDEX_ROOT, "ingestion.lock"))
 
+# ---------------------- Shared resources ----------------------
+_embed_models = {}      # model name -> loaded model
+_mongo_client = None
+_resource_lock = threading.Lock()
 
-def upsert_to_pinecone(chunks, paper_ids):
-    if not chunks:
-        print("⚠️ No chunks to upsert!")
-        return
 
-    model = SentenceTransformer("sentence-transformers/all-mpnet-base-v2")
-    pc = Pinecone(api_key=PINECONE_API_KEY)
-
-    if INDEX_NAME not in pc.list_indexes().names():
-        pc.create_index(
-            name=INDEX_NAME,
-            dimension=DIMENSION,
-            metric="cosine",
-            spec=ServerlessSpec(cloud="aws", region="us-east-1"),
-        )
-    index = pc.Index(INDEX_NAME)
-
-    def batch(iterable, n):
-        for i in range(0, len(iterable), n):
-            yield iterable[i:i+n]
-
-    print(f"Embedding {len(chunks)} chunks and upserting to Pinecone...")
-
-    for batch_items in tqdm(list(batch(chunks, BATCH_SIZE)), desc="Upserting batches"):
-        texts = [c["chunk"] for c in batch_items]
-        embeddings = model.encode(texts, show_progress_bar=False, convert_to_numpy=True)
-
-        vectors = [
-            {
-                "id": f"{c['arxiv_id']}_chunk{c['chunk_index']}",
-                "values": emb.tolist(),
-                "metadata": {
-                    "arxiv_id": c["arxiv_id"],
-                    "title": c["title"],
-                    "chunk_index": c["chunk_index"],
-                    "snippet": c["chunk"][:300]
-                }
-            }
-            for c, emb in zip(batch_items, embeddings)
-        ]
-        index.upsert(vectors=vectors)
-
-    # ✅ Update Mongo once all upserts are done
-    client = MongoClient(MONGO_URL)
-    db = client[DB_NAME]
-    papers_collection = db[COLLECTION_NAME]
-    papers_collection.update_many(
-        {"arxiv_id": {"$in": paper_ids}},
+def load_embed_model(name=EMBED_MODEL_NAME):
+    # imported here so importing this module does not pull in torch
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(name)
+
+
+def get_embed_model(name=None):
+    """
+    Load the embedder once per process instead of once per ingestion run. With EMBED_SERVER set
+    (multi-worker serving) the configured model is a client of the shared model server instead.
+    `name` selects another model, e.g. the one the active index version was built with while a
+    re-index to a new model is still running.
+    """
+    name = name or EMBED_MODEL_NAME
+    model = _embed_models.get(name)
+    if model is None:
+        with _resource_lock:
+            model = _embed_models.get(name)
+            if model is None:
+                from model_server import EMBED_SERVER, RemoteEmbedModel
+                if EMBED_SERVER and name == EMBED_MODEL_NAME:
+                    model = RemoteEmbedModel(EMBED_SERVER)
+                else:
+                    model = load_embed_model(name)
+                _embed_models[name] = model
+    return model
+
+
+def set_embed_model(model, name=None):
+    _embed_models[name or EMBED_MODEL_NAME] = model
+
+
+def embed_model_loaded():
+    return bool(_embed_models)
+
+
+def set_mongo_client(mongo_client):
+    global _mongo_client
+    _mongo_client = mongo_client
+
+
+def get_papers_collection():
+    global _mongo_client
+    if _mongo_client is None:
+        with _resource_lock:
+            if _mongo_client is None:
+                _mongo_client = MongoClient(MONGO_URL)
+    return _mongo_client[DB_NAME][COLLECTION_NAME]
+
+
+def mark_paper_indexed(arxiv_id):
+    get_papers_collection().update_one(
+        {"arxiv_id": arxiv_id},
         {"$set": {"pinecone_indexed": True}}
     )
-    client.close()
+
+
+def chunk_vector_id(chunk):
+    return f"{chunk['arxiv_id']}_chunk{chunk['chunk_index']}"
+
+
+SPAN_FIELDS = ("char_start", "char_end", "token_start", "token_end")
+# bump when chunk_metadata changes shape; index versions built with another layout get re-embedded
+METADATA_VERSION = 2
+
+
+def chunk_metadata(chunk):
+    metadata = {
+        "arxiv_id": chunk["arxiv_id"],
+        "title": chunk["title"],
+        "chunk_index": chunk["chunk_index"],
+        "snippet": chunk["chunk"][:300]
+    }
+    # spans into the paper's extracted text (native chunker only)
+    metadata.update({field: chunk[field] for field in SPAN_FIELDS if field in chunk})
+    return metadata
+
+
+# ---------------------- Embed & Upsert ----------------------
+def timed_upsert(store, ids, embeddings, metadatas):
+    with INGESTION_STAGE_SECONDS.time(stage="upsert"):
+        store.upsert(ids, embeddings, metadatas)
+
+
+def embed_and_upsert(paper_chunks, store=None, model=None, on_paper_done=None, batch_size=BATCH_SIZE,
+                     chunk_store=None, sparse_index=None, clip_store=None):
+    """
+    Consume (arxiv_id, chunks) pairs, encode chunks in batches that may span papers and upsert
+    each batch on a background thread while the next one is encoded.
+    A paper is checkpointed through `on_paper_done` (Mongo `pinecone_indexed`) as soon as every
+    batch holding its chunks has landed, so a crash only re-embeds the papers still in flight.
+    Vector ids are deterministic, so re-running after a failure simply overwrites.
+    Full chunk text goes to the local chunk store under the same ids (metadata keeps a snippet),
+    and each paper is (re)indexed in the BM25 sparse index as it is read.
+    With IMAGE_RETRIEVAL=clip (or an explicit `clip_store`) each batch is also CLIP-encoded into
+    the image-search index, and a paper only counts as indexed once both upserts have landed.
+    Returns (indexed_ids, failed_ids).
+    """
+    if store is None:
+        store = get_vector_store()
+    if model is None:
+        model = get_embed_model()
+    if on_paper_done is None:
+        on_paper_done = mark_paper_indexed
+    if chunk_store is None:
+        chunk_store = get_chunk_store()
+    if sparse_index is None:
+        sparse_index = get_sparse_index()
+    clip_model = None
+    if clip_store is None and IMAGE_RETRIEVAL == "clip":
+        clip_store = get_clip_store()
+    if clip_store is not None:
+        clip_model = get_clip_model()
+
+    outstanding = {}        # arxiv_id -> upsert batches not yet landed
+    fully_read = set()      # papers whose chunks have all been handed to a batch
+    failed = set()
+    indexed, failed_ids = [], []
+    in_flight = {}          # future -> arxiv_ids in that batch
+    buffer = []
+    buffered = set()        # papers with chunks still waiting in `buffer`
+    progress = tqdm(desc="Upserting chunks", unit="chunk")
+
+    def finish(arxiv_id):
+        if arxiv_id not in fully_read or arxiv_id in buffered or outstanding.get(arxiv_id):
+            return
+        fully_read.discard(arxiv_id)
+        outstanding.pop(arxiv_id, None)
+        if arxiv_id in failed:
+            failed.discard(arxiv_id)
+            failed_ids.append(arxiv_id)
+            return
+        try:
+            on_paper_done(arxiv_id)
+            indexed.append(arxiv_id)
+        except Exception as e:
+            print(f"❌ Could not mark {arxiv_id} as indexed: {e}")
+            failed_ids.append(arxiv_id)
+
+    def settle(done):
+        for future in done:
+            papers = in_flight.pop(future)
+            error = future.exception()
+            if error is not None:
+                print(f"❌ Upsert failed for {sorted(papers)}: {error}")
+                ERRORS.inc(stage="upsert")
+                failed.update(papers)
+            for arxiv_id in papers:
+                outstanding[arxiv_id] -= 1
+                finish(arxiv_id)
+
+    def flush(executor):
+        if not buffer:
+            return
+        batch = buffer[:]
+        buffer.clear()
+        buffered.clear()
+        texts = [c["chunk"] for c in batch]
+        # one contiguous float32 (n, dim) array per batch, handed to the store as is
+        with INGESTION_STAGE_SECONDS.time(stage="embed"):
+            embeddings = np.asarray(
+                model.encode(texts, batch_size=batch_size, show_progress_bar=False, convert_to_numpy=True),
+                dtype=np.float32,
+            )
+        chunk_store.put_many(batch)
+        papers = {c["arxiv_id"] for c in batch}
+        ids = [chunk_vector_id(c) for c in batch]
+        metadatas = [chunk_metadata(c) for c in batch]
+        targets = [(store, embeddings)]
+        if clip_store is not None:
+            with INGESTION_STAGE_SECONDS.time(stage="clip_embed"):
+                clip_embeddings = np.asarray(clip_model.encode([clip_text(t) for t in texts], batch_size=batch_size,
+                                                               show_progress_bar=False), dtype=np.float32)
+            targets.append((clip_store, clip_embeddings))
+        for target, vectors in targets:
+            for arxiv_id in papers:
+                outstanding[arxiv_id] = outstanding.get(arxiv_id, 0) + 1
+            future = executor.submit(timed_upsert, target, ids, vectors, metadatas)
+            in_flight[future] = papers
+        progress.update(len(batch))
+        if len(in_flight) >= MAX_PENDING_UPSERTS:
+            done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+            settle(done)
+
+    with ThreadPoolExecutor(max_workers=UPSERT_WORKERS, thread_name_prefix="upsert") as executor:
+        for arxiv_id, chunks in paper_chunks:
+            sparse_index.add_paper(arxiv_id, chunks)
+            for chunk in chunks:
+                buffer.append(chunk)
+                buffered.add(arxiv_id)
+                if len(buffer) >= batch_size:
+                    flush(executor)
+            fully_read.add(arxiv_id)
+            finish(arxiv_id)   # all of its batches may already have landed
+        flush(executor)
+        for arxiv_id in list(fully_read):
+            finish(arxiv_id)
+        if in_flight:
+            done, _ = wait(list(in_flight))
+            settle(done)
+    progress.close()
+
+    print(f"✅ Indexed {len(indexed)} papers" + (f", {len(failed_ids)} failed" if failed_ids else ""))
+    return indexed, failed_ids
+
+
+def upsert_to_pinecone(chunks, paper_ids, store=None):
+    if not chunks:
+        print("⚠️ No chunks to upsert!")
+        return
+    by_paper = {arxiv_id: [] for arxiv_id in paper_ids}
+    for c in chunks:
+        by_paper.setdefault(c["arxiv_id"], []).append(c)
+    print(f"Embedding {len(chunks)} chunks and upserting to {INDEX_NAME}...")
+    embed_and_upsert(by_paper.items(), store=store)
     print("✅ Ingestion complete.")
 
 # ---------------------- Public Runner ----------------------
-def run_ingestion():
-# ---------------------- Stage 2: Preprocess PDFs ----------------------
+def run_ingestion(store=None):
+    """Index every paper not yet indexed; runs wait for one another across processes."""
+    with file_lock(INGESTION_LOCK_PATH):
+        indexed, failed_ids = _run_ingestion(store)
+    if indexed:
+        touch_index_stamp()
+    return indexed, failed_ids
+
+
+def _run_ingestion(store=None):
+# ---------------------- Stage 2: Preprocess PDFs (streamed per paper) ----------------------
+# ---------------------- Stage 3: Embed & Upsert, checkpointing each paper ----------------------
+
+    # the PDF/langchain/tiktoken stack is only needed once ingestion actually runs
+    from preprocess_pipeline import iter_paper_chunks
+
+    version = active_version()
+    if version is None:
+        return embed_and_upsert(iter_paper_chunks(), store=store)
 
-    chunks, paper_ids = preprocess_pdfs_into_chunks()
+    # new papers land in the active index version and are recorded in its manifest,
+    # so the next re-index plan copies them instead of re-embedding
+    manifest = IndexManifest(version)
+    paper_info = {}
 
-# ---------------------- Stage 3: Embed & Upsert ----------------------
+    def on_paper_done(arxiv_id):
+        mark_paper_indexed(arxiv_id)
+        info = paper_info[arxiv_id]
+        manifest.record_papers([paper_record(arxiv_id, info["file_id"], info["content_hash"], info["chunks"], "ingest")])
 
-    upsert_to_pinecone(chunks, paper_ids)
+    # embedded with the model the active version was built with, even while a re-index to another runs
+    model = get_embed_model(manifest.config["embedding"]["model"])
+    return embed_and_upsert(iter_paper_chunks(paper_info=paper_info), store=store, model=model,
+                            on_paper_done=on_paper_done)
 
 
 if __name__ == "__main__":
-    run_ingestion()
\ No newline at end of file
+    run_ingestion()
@@ -3,12 +3,19 @@
 from pymongo import MongoClient
 import gridfs
 import os
+import hashlib
+import json
+import re
+import time
+import zlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
 from dotenv import load_dotenv
 from tqdm import tqdm
 from PyPDF2 import PdfReader
 import io
-import tiktoken
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+import numpy as np
+from metrics import Counter, ERRORS, INGESTION_STAGE_SECONDS
 
 # ---------------------- Load environment ----------------------
 load_dotenv()
@@ -26,69 +33,519 @@ COLLECTION_NAME = "papers"
 #     return chunks
 
 
-# ---------------------- Fetch PDFs from MongoDB and convert into Chunks----------------------
-def preprocess_pdfs_into_chunks():
-    client = MongoClient(MONGO_URL)
-    db = client[DB_NAME]
-    papers_collection = db[COLLECTION_NAME]
-    fs = gridfs.GridFS(db)
+# ---------------------- Chunking config ----------------------
+CHUNK_SIZE = 1000        # 1000 tokens per chunk
+CHUNK_OVERLAP = 250      # 250 tokens overlap between chunks
+ENCODING_NAME = "cl100k_base"  # Example: compatible with GPT-4/Grok
+SEPARATORS = ["\n\n", "\n", ". ", "? ", "! ", "; ", " "]
+# native: tokenize once and cut at separator boundaries; langchain: RecursiveCharacterTextSplitter
+CHUNKER = os.getenv("CHUNKER", "native")
+
+# Worker processes for PDF extraction + chunking (0 = one per core, 1 = in-process)
+PREPROCESS_WORKERS = int(os.getenv("PREPROCESS_WORKERS", "0")) or os.cpu_count() or 1
+# PDFs longer than this are extracted in page ranges of this size spread over the pool
+PAGES_PER_TASK = int(os.getenv("PAGES_PER_TASK", "16"))
+# Extracted text keyed by PDF content hash, so re-chunking never re-parses a PDF ("" disables)
+EXTRACT_CACHE_DIR = os.getenv("EXTRACT_CACHE_DIR", "extract_cache")
+EXTRACTOR_VERSION = "pypdf2-1"   # bump when extraction output changes
+# Papers slower than this are logged; every paper's timing is appended to PAPER_TIMINGS_PATH if set
+SLOW_PAPER_SECONDS = float(os.getenv("SLOW_PAPER_SECONDS", "20"))
+PAPER_TIMINGS_PATH = os.getenv("PAPER_TIMINGS_PATH") or None
+NEW_PAPERS_FILTER = {"pinecone_indexed": {"$ne": True}}
+PAPER_PROJECTION = {"_id": 0, "arxiv_id": 1, "title": 1, "file_id": 1}
+
+
+# ---------------------- Native token chunker ----------------------
+# Places a chunk may start or end, coarsest first (same preference order as SEPARATORS):
+# paragraph, line, sentence, word. Sentence boundaries sit after the punctuation, so chunks end
+# with "." rather than start with it. All positions are byte offsets into the UTF-8 text.
+PARAGRAPH_PATTERN = re.compile(rb"\n[ \t\r\f\v]*\n")
+SENTENCE_END_BYTES = np.frombuffer(b".?!;", dtype=np.uint8)
+WHITESPACE_BYTES = np.frombuffer(b" \n\t\r", dtype=np.uint8)
+SENTENCE_LEVEL = 2
+
+
+class TokenChunker:
+    """
+    Tokenizes a document once, then cuts chunks of at most `chunk_size` tokens over the token
+    offset array. Each chunk ends at the coarsest boundary in the back half of its window; the next
+    chunk starts at the earliest sentence (or, failing that, word) boundary within `chunk_overlap`
+    tokens before that end.
+    """
+
+    def __init__(self, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, encoding_name=ENCODING_NAME):
+        import tiktoken
+
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.encoding = tiktoken.get_encoding(encoding_name)
+
+    @staticmethod
+    def _boundaries(data, token_starts):
+        """Per level, sorted token indices at which a chunk may begin or end."""
+        buf = np.frombuffer(data, dtype=np.uint8)
+        paragraphs = np.array([m.start() for m in PARAGRAPH_PATTERN.finditer(data)], dtype=np.int64)
+        lines = np.flatnonzero(buf == ord("\n"))
+        sentences = np.flatnonzero(np.isin(buf[:-1], SENTENCE_END_BYTES) & np.isin(buf[1:], WHITESPACE_BYTES)) + 1
+        words = np.flatnonzero(buf == ord(" "))
+        return [
+            np.unique(np.searchsorted(token_starts, positions, side="left"))
+            for positions in (paragraphs, lines, sentences, words)
+        ]
+
+    @staticmethod
+    def _last_boundary(levels, lo, hi):
+        """Coarsest-level boundary in (lo, hi], the furthest one within that level."""
+        for level in levels:
+            i = np.searchsorted(level, hi, side="right") - 1
+            if i >= 0 and level[i] > lo:
+                return int(level[i])
+        return None
+
+    @staticmethod
+    def _first_boundary(levels, lo, hi):
+        """Earliest boundary in [lo, hi), preferring sentence-or-coarser over word boundaries."""
+        for group in (levels[:SENTENCE_LEVEL + 1], levels[SENTENCE_LEVEL + 1:]):
+            best = None
+            for level in group:
+                i = np.searchsorted(level, lo, side="left")
+                if i < len(level) and level[i] < hi and (best is None or level[i] < best):
+                    best = int(level[i])
+            if best is not None:
+                return best
+        return None
+
+    def split_with_spans(self, text):
+        """[{"text", "char_start", "char_end", "token_start", "token_end"}] in document order."""
+        tokens = self.encoding.encode_ordinary(text)
+        n = len(tokens)
+        if not n:
+            return []
+        data = text.encode("utf-8")
+        token_bytes = self.encoding.decode_tokens_bytes(tokens)
+        starts = np.zeros(n + 1, dtype=np.int64)   # starts[n] is the end of the text
+        np.cumsum(np.fromiter(map(len, token_bytes), dtype=np.int64, count=n), out=starts[1:])
+        if len(data) == len(text):
+            char_at = None   # ASCII: byte offsets are character offsets
+        else:
+            is_lead = (np.frombuffer(data, dtype=np.uint8) & 0xC0) != 0x80
+            char_at = np.append(np.cumsum(is_lead) - 1, len(text))
+        levels = self._boundaries(data, starts[:n])
+
+        chunks = []
+        start = 0
+        while start < n:
+            limit = start + self.chunk_size
+            if limit >= n:
+                end = n
+            else:
+                end = (self._last_boundary(levels, start + self.chunk_size // 2, limit)
+                       or self._last_boundary(levels, start, limit)
+                       or limit)
+            byte_start, byte_end = int(starts[start]), int(starts[end])
+            if char_at is None:
+                char_start, char_end = byte_start, byte_end
+            else:
+                # a token may end inside a multi-byte character; round outwards to whole characters
+                char_start = int(char_at[byte_start])
+                char_end = int(char_at[byte_end]) if byte_end == len(data) or char_at[byte_end] != char_at[byte_end - 1] \
+                    else int(char_at[byte_end]) + 1
+            piece = text[char_start:char_end]
+            stripped = piece.strip()
+            if stripped:
+                lead = len(piece) - len(piece.lstrip())
+                chunks.append({
+                    "text": stripped,
+                    "char_start": char_start + lead,
+                    "char_end": char_start + lead + len(stripped),
+                    "token_start": start,
+                    "token_end": end,
+                })
+            if end >= n:
+                break
+            if self.chunk_overlap <= 0:
+                start = end
+                continue
+            lo = max(end - self.chunk_overlap, start + 1)
+            start = self._first_boundary(levels, lo, end) or lo
+        return chunks
+
+    def split_text(self, text):
+        return [chunk["text"] for chunk in self.split_with_spans(text)]
+
 
-    tiktoken.get_encoding("cl100k_base")  # Example: compatible with GPT-4/Grok
+def build_splitter(kind=None):
+    if (kind or CHUNKER) == "native":
+        return TokenChunker()
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
 
     # Initialize token-based splitter
-    token_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
-        chunk_size=1000,        # 1000 tokens per chunk
-        chunk_overlap=250,      # 250 tokens overlap between chunks
-        encoding_name="cl100k_base",
+    return RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        encoding_name=ENCODING_NAME,
         model_name="gpt-4",  # uses tiktoken tokenizer
-        separators=["\n\n", "\n", ". ", "? ", "! ", "; ", " "]
+        separators=SEPARATORS
     )
 
 
-    
-    new_papers = list(papers_collection.find({"pinecone_indexed": {"$ne": True}}))
-    if len(new_papers) == 0:
-        print("⚠️ No new papers to process!")
-        return [], []
-    all_chunks, paper_ids = [], []
-    for paper in tqdm(new_papers, desc="Processing new papers"):
-        try:
-            file_id = paper.get("file_id")
-            if not file_id:
-                continue
+def extract_page_texts(pdf_bytes, start=0, end=None):
+    """Text of pages [start, end) in order; empty pages give ""."""
+    reader = PdfReader(io.BytesIO(pdf_bytes))
+    pages = reader.pages[start:end]
+    # extract_text() is the expensive call, run it once per page
+    return [page.extract_text() or "" for page in pages]
 
-            pdf_bytes = fs.get(file_id).read()
-            reader = PdfReader(io.BytesIO(pdf_bytes))
-            text = "\n".join(page.extract_text() for page in reader.pages if page.extract_text())
 
+def join_pages(page_texts):
+    return "\n".join(text for text in page_texts if text)
 
-            if not text.strip():
-                print(f"⚠️ Empty PDF: {paper['arxiv_id']}")
-                continue
 
-            chunks = token_splitter.split_text(text)
-            for i, chunk in enumerate(chunks):
-                all_chunks.append({
-                    "arxiv_id": paper["arxiv_id"],
-                    "title": paper["title"],
-                    "chunk": chunk,
-                    "chunk_index": i
-                })
-            paper_ids.append(paper["arxiv_id"])
+def extract_pdf_text(pdf_bytes):
+    return join_pages(extract_page_texts(pdf_bytes))
+
+
+def count_pages(pdf_bytes):
+    return len(PdfReader(io.BytesIO(pdf_bytes)).pages)
+
+
+def page_ranges(n_pages, pages_per_task=PAGES_PER_TASK):
+    return [(start, min(start + pages_per_task, n_pages)) for start in range(0, n_pages, pages_per_task)]
+
+
+# ---------------------- Extraction cache ----------------------
+class ExtractionCache:
+    """zlib-compressed extracted text on local disk, keyed by sha256 of the PDF bytes."""
+
+    def __init__(self, path=EXTRACT_CACHE_DIR):
+        self.path = os.path.join(path, EXTRACTOR_VERSION) if path else None
+
+    @staticmethod
+    def content_hash(pdf_bytes):
+        return hashlib.sha256(pdf_bytes).hexdigest()
+
+    def _file(self, content_hash):
+        return os.path.join(self.path, content_hash[:2], content_hash + ".z")
+
+    def get(self, content_hash):
+        if not self.path:
+            return None
+        try:
+            with open(self._file(content_hash), "rb") as f:
+                return zlib.decompress(f.read()).decode("utf-8")
+        except FileNotFoundError:
+            return None
         except Exception as e:
-            print(f"❌ Error processing {paper['arxiv_id']}: {e}")
+            print(f"⚠️ Unreadable extraction cache entry {content_hash}: {e}")
+            return None
+
+    def put(self, content_hash, text):
+        if not self.path:
+            return
+        target = self._file(content_hash)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # several worker processes may write the same entry; the rename keeps readers safe
+        tmp_path = f"{target}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(zlib.compress(text.encode("utf-8"), 6))
+        os.replace(tmp_path, target)
+
+
+extraction_cache = ExtractionCache()
+EXTRACTION_CACHE_LOOKUPS = Counter("athena_extraction_cache_lookups_total",
+                                   "Extracted-text cache lookups by result (hit, miss)", ["result"])
 
-    client.close()
+
+def chunk_paper(paper, text, splitter):
+    """Chunk dicts; with the native chunker they also carry char_* / token_* spans into `text`."""
+    if hasattr(splitter, "split_with_spans"):
+        pieces = splitter.split_with_spans(text)
+    else:
+        pieces = [{"text": chunk} for chunk in splitter.split_text(text)]
+    chunks = []
+    for i, piece in enumerate(pieces):
+        chunk = {
+            "arxiv_id": paper["arxiv_id"],
+            "title": paper["title"],
+            "chunk": piece.pop("text"),
+            "chunk_index": i
+        }
+        chunk.update(piece)
+        chunks.append(chunk)
+    return chunks
+
+
+# ---------------------- Mongo client ----------------------
+# Set by set_mongo_client (e.g. mongomock in the offline benchmarks); otherwise each run connects to MONGO_URL.
+_mongo_client = None
+
+
+def set_mongo_client(mongo_client):
+    global _mongo_client
+    _mongo_client = mongo_client
+
+
+# ---------------------- Worker process ----------------------
+# Each worker opens its own Mongo connection and splitter once, so only the small
+# paper record crosses the process boundary and PDF bytes never touch the parent.
+_worker_state = {}
+
+
+def _init_worker():
+    client = MongoClient(MONGO_URL)
+    _worker_state["client"] = client
+    _worker_state["fs"] = gridfs.GridFS(client[DB_NAME])
+    _worker_state["splitter"] = build_splitter()
+
+
+def _chunk_result(paper, text, splitter, timing):
+    if not text.strip():
+        return paper, [], "empty PDF", timing
+    start = time.perf_counter()
+    chunks = chunk_paper(paper, text, splitter)
+    timing["chunk_s"] = time.perf_counter() - start
+    return paper, chunks, None, timing
+
+
+def process_paper(paper, fs=None, splitter=None, split_pages=None):
+    """
+    Read one paper's PDF from GridFS, extract (or load the cached text) and chunk it.
+    Returns (paper, chunks, error, timing). With `split_pages`, a PDF longer than that is not
+    extracted here: chunks is None and timing carries "pages" and "content_hash" so the caller
+    can fan extract_page_range tasks out over the pool.
+    """
+    if fs is None:
+        fs = _worker_state["fs"]
+    if splitter is None:
+        splitter = _worker_state["splitter"]
+    timing = {"arxiv_id": paper["arxiv_id"], "cached": False}
+    try:
+        start = time.perf_counter()
+        grid_out = fs.get(paper["file_id"])
+        # set at upload (mongodb.stream_pdf_to_gridfs): a cache hit never reads the PDF itself
+        content_hash = getattr(grid_out, "sha256", None)
+        text = extraction_cache.get(content_hash) if content_hash else None
+        if text is not None:
+            timing["read_s"] = time.perf_counter() - start
+            timing["content_hash"] = content_hash
+            timing["cached"] = True
+            return _chunk_result(paper, text, splitter, timing)
+
+        pdf_bytes = grid_out.read()
+        if content_hash is None:   # uploaded before hashes were stored
+            content_hash = extraction_cache.content_hash(pdf_bytes)
+            text = extraction_cache.get(content_hash)
+        timing["read_s"] = time.perf_counter() - start
+        timing["content_hash"] = content_hash
+        if text is not None:
+            timing["cached"] = True
+            return _chunk_result(paper, text, splitter, timing)
+
+        start = time.perf_counter()
+        if split_pages:
+            timing["pages"] = count_pages(pdf_bytes)
+            if timing["pages"] > split_pages:
+                return paper, None, None, timing
+        page_texts = extract_page_texts(pdf_bytes)
+        del pdf_bytes
+        timing["extract_s"] = time.perf_counter() - start
+        timing["pages"] = len(page_texts)
+        text = join_pages(page_texts)
+        extraction_cache.put(content_hash, text)
+        return _chunk_result(paper, text, splitter, timing)
+    except Exception as e:
+        return paper, [], str(e), timing
+
+
+def extract_page_range(paper, start, end):
+    """Pages [start, end) of one paper. Returns (page_texts, seconds, error)."""
+    t0 = time.perf_counter()
+    try:
+        pdf_bytes = _worker_state["fs"].get(paper["file_id"]).read()
+        return extract_page_texts(pdf_bytes, start, end), time.perf_counter() - t0, None
+    except Exception as e:
+        return [], time.perf_counter() - t0, str(e)
+
+
+def finish_paper(paper, page_texts, timing):
+    """Join the page ranges of a split paper, cache the text and chunk it."""
+    text = join_pages(page_texts)
+    extraction_cache.put(timing["content_hash"], text)
+    return _chunk_result(paper, text, _worker_state["splitter"], timing)
+
+
+def _report(paper, chunks, error, timing):
+    timing["total_s"] = sum(timing.get(k, 0.0) for k in ("read_s", "extract_s", "chunk_s"))
+    timing["chunks"] = len(chunks)
+    # workers time each phase; the parent records them, so every paper lands in this process's metrics
+    for stage in ("read", "extract", "chunk"):
+        if f"{stage}_s" in timing:
+            INGESTION_STAGE_SECONDS.observe(timing[f"{stage}_s"], stage=stage)
+    if "content_hash" in timing:
+        EXTRACTION_CACHE_LOOKUPS.inc(result="hit" if timing["cached"] else "miss")
+    if timing["total_s"] > SLOW_PAPER_SECONDS:
+        print(f"🐢 Slow PDF {paper['arxiv_id']}: {timing['total_s']:.1f}s "
+              f"({timing.get('pages', '?')} pages, extract {timing.get('extract_s', 0):.1f}s)")
+    if PAPER_TIMINGS_PATH:
+        with open(PAPER_TIMINGS_PATH, "a") as f:
+            f.write(json.dumps(timing) + "\n")
+    if error == "empty PDF":
+        print(f"⚠️ Empty PDF: {paper['arxiv_id']}")
+    elif error:
+        print(f"❌ Error processing {paper['arxiv_id']}: {error}")
+        ERRORS.inc(stage="preprocess")
+    return not error
+
+
+def _process_in_pool(pool, papers, max_in_flight):
+    """
+    Yield (paper, chunks, error, timing) as papers finish, with at most `max_in_flight` papers
+    in progress. Long PDFs come back from process_paper unextracted and are spread over the pool
+    as page ranges, then joined and chunked by a finish_paper task.
+    """
+    pending = {}      # future -> (kind, paper, range index)
+    split = {}        # arxiv_id -> state of a paper extracted in page ranges
+    in_flight = 0
+    papers = iter(papers)
+    exhausted = False
+    while True:
+        while not exhausted and in_flight < max_in_flight:
+            paper = next(papers, None)
+            if paper is None:
+                exhausted = True
+                break
+            pending[pool.submit(process_paper, paper, None, None, PAGES_PER_TASK)] = ("paper", paper, None)
+            in_flight += 1
+        if not pending:
+            return
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            kind, paper, part = pending.pop(future)
+            arxiv_id = paper["arxiv_id"]
+            try:
+                outcome = future.result()
+            except Exception as e:
+                # a task that died (worker crash, unpicklable result) fails its paper, not the run
+                if kind == "pages":
+                    outcome = [], 0.0, f"{type(e).__name__}: {e}"
+                else:
+                    timing = split.pop(arxiv_id, {}).get("timing") or {"arxiv_id": arxiv_id, "cached": False}
+                    in_flight -= 1
+                    yield paper, [], f"{type(e).__name__}: {e}", timing
+                    continue
+            if kind == "pages":
+                state = split[arxiv_id]
+                texts, seconds, error = outcome
+                state["texts"][part] = texts
+                state["timing"]["extract_s"] = state["timing"].get("extract_s", 0.0) + seconds
+                state["error"] = state["error"] or error
+                state["remaining"] -= 1
+                if state["remaining"]:
+                    continue
+                if not state["error"]:
+                    # state stays in `split` until finish_paper returns, for its timing if that task dies
+                    page_texts = [text for texts in state["texts"] for text in texts]
+                    pending[pool.submit(finish_paper, state["paper"], page_texts, state["timing"])] = ("finish", paper, None)
+                    continue
+                del split[arxiv_id]
+                result = (state["paper"], [], state["error"], state["timing"])
+            elif kind == "finish":
+                del split[arxiv_id]
+                result = outcome
+            else:
+                result = outcome
+                paper, chunks, error, timing = result
+                if chunks is None:
+                    ranges = page_ranges(timing["pages"])
+                    timing["page_tasks"] = len(ranges)
+                    split[arxiv_id] = {"paper": paper, "timing": timing, "texts": [None] * len(ranges),
+                                       "remaining": len(ranges), "error": None}
+                    for i, (start, end) in enumerate(ranges):
+                        pending[pool.submit(extract_page_range, paper, start, end)] = ("pages", paper, i)
+                    continue
+            in_flight -= 1
+            yield result
+
+
+# ---------------------- Fetch PDFs from MongoDB and convert into Chunks----------------------
+def iter_paper_chunks(workers=None, max_in_flight=None, arxiv_ids=None, paper_info=None):
+    """
+    Stream un-indexed papers (or exactly `arxiv_ids`, indexed or not) from a Mongo cursor and
+    yield (arxiv_id, chunks) per paper as soon as it is chunked. At most `max_in_flight` papers
+    are being processed at once, so memory stays flat no matter how large the backlog is.
+    `paper_info`, if given, is filled with arxiv_id -> {"file_id", "content_hash", "chunks"} for
+    every paper yielded (what an index manifest records).
+    """
+    workers = workers or PREPROCESS_WORKERS
+    owns_client = _mongo_client is None
+    if not owns_client:
+        workers = 1   # worker processes connect by URL and cannot see an injected client
+    max_in_flight = max_in_flight or 2 * workers
+
+    client = MongoClient(MONGO_URL) if owns_client else _mongo_client
+    db = client[DB_NAME]
+    papers_collection = db[COLLECTION_NAME]
+
+    papers_filter = NEW_PAPERS_FILTER if arxiv_ids is None else {"arxiv_id": {"$in": list(arxiv_ids)}}
+
+    def accept(paper, chunks, error, timing):
+        if not _report(paper, chunks, error, timing):
+            return False
+        if paper_info is not None:
+            paper_info[paper["arxiv_id"]] = {"file_id": str(paper["file_id"]), "content_hash": timing.get("content_hash"),
+                                             "chunks": len(chunks)}
+        return True
+
+    try:
+        total = papers_collection.count_documents(papers_filter)
+        if total == 0:
+            print("⚠️ No new papers to process!")
+            return
+        cursor = papers_collection.find(papers_filter, PAPER_PROJECTION).batch_size(max_in_flight)
+        papers = (paper for paper in cursor if paper.get("file_id"))
+        progress = tqdm(total=total, desc="Processing new papers")
+
+        if workers <= 1:
+            fs = gridfs.GridFS(db)
+            splitter = build_splitter()
+            results = (process_paper(paper, fs, splitter) for paper in papers)
+            for paper, chunks, error, timing in results:
+                progress.update(1)
+                if accept(paper, chunks, error, timing):
+                    yield paper["arxiv_id"], chunks
+            progress.close()
+            return
+
+        ctx = multiprocessing.get_context("spawn")  # fork is unsafe from a threaded server
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker) as pool:
+            for paper, chunks, error, timing in _process_in_pool(pool, papers, max_in_flight):
+                progress.update(1)
+                if accept(paper, chunks, error, timing):
+                    yield paper["arxiv_id"], chunks
+        progress.close()
+    finally:
+        if owns_client:
+            client.close()
+
+
+def preprocess_pdfs_into_chunks(workers=None):
+    """Collect every chunk in memory. Prefer iter_paper_chunks for large backlogs."""
+    all_chunks, paper_ids = [], []
+    for arxiv_id, chunks in iter_paper_chunks(workers):
+        all_chunks.extend(chunks)
+        paper_ids.append(arxiv_id)
     return all_chunks, paper_ids
 
 # ---------------------- Main ----------------------
 if __name__ == "__main__":
 
-    chunks,ids = preprocess_pdfs_into_chunks()
-    if chunks:
+    samples = []
+    for arxiv_id, chunks in iter_paper_chunks():
+        samples.extend(chunks[:2 - len(samples)])
+    if samples:
         # Print first 2 chunks for verification
         print("\n--- Sample Chunks ---")
-        for c in chunks[:2]:
+        for c in samples:
             print(f"Title: {c['title']}\nChunk:\n{c['chunk'][:500]}...\n")
     else:
         print("⚠️ No chunks generated.")
@@ -0,0 +1,146 @@
+# prompt_builder.py
+# Context assembly for the RAG prompt: retrieved chunks (and their neighbours) from the same paper
+# are stitched into one passage with the chunk overlap removed, cleaned in a single regex pass,
+# and packed in relevance order until the token budget is spent.
+import os
+import re
+import threading
+
+from dotenv import load_dotenv
+
+load_dotenv()
+# Tokens of retrieved context allowed in the prompt (question and instructions not included)
+PROMPT_CONTEXT_TOKENS = int(os.getenv("PROMPT_CONTEXT_TOKENS", "4000"))
+PROMPT_ENCODING_NAME = os.getenv("PROMPT_ENCODING", "cl100k_base")
+# A passage cut to fit the budget is dropped instead if fewer tokens than this would remain
+MIN_PASSAGE_TOKENS = int(os.getenv("MIN_PASSAGE_TOKENS", "64"))
+
+# URLs and bracketed citations like [12] or [3, 45], removed in one scan
+_STRIP_RE = re.compile(r"https?://\S+|\[\d+(?:,\s*\d+)*\]")
+# a dangling 1-3 letter word at the very end, usually a fragment cut off by the chunk boundary
+_TRAILING_WORD_RE = re.compile(r"\b\w{1,3}$")
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def get_encoding():
+    global _encoding
+    if _encoding is None:
+        with _encoding_lock:
+            if _encoding is None:
+                import tiktoken
+                _encoding = tiktoken.get_encoding(PROMPT_ENCODING_NAME)
+    return _encoding
+
+
+def clean_chunk(text):
+    """Drop URLs and citations, collapse whitespace, trim a trailing word fragment."""
+    text = _STRIP_RE.sub("", text)
+    ends_in_word = text[-1:].isalnum() or text[-1:] == "_"   # what \w matches
+    text = " ".join(text.split())   # whitespace collapse without a regex pass
+    if ends_in_word:
+        text = _TRAILING_WORD_RE.sub("", text).rstrip()
+    return text
+
+
+# ---------------------- Overlap removal ----------------------
+def overlap_length(prev, nxt, anchor_chars=64):
+    """Length of the longest suffix of `prev` that is also a prefix of `nxt`."""
+    anchor = nxt[:anchor_chars]
+    if not anchor:
+        return 0
+    pos = prev.find(anchor)
+    while pos >= 0:
+        if nxt.startswith(prev[pos:]):
+            return len(prev) - pos
+        pos = prev.find(anchor, pos + 1)
+    return 0
+
+
+def stitch(pieces):
+    """
+    Join consecutive chunks of one paper into one passage without repeating their overlap.
+    `pieces` are (text, span) in document order; span is (char_start, char_end) into the paper's
+    extracted text when the chunker recorded it, otherwise the overlap is found by matching text.
+    """
+    text, end = pieces[0][0], pieces[0][1] and pieces[0][1][1]
+    for piece, span in pieces[1:]:
+        if span and end is not None:
+            start, piece_end = span
+            if start > end:
+                text += " " + piece
+            elif piece_end > end:
+                text += piece[end - start:]
+            end = max(end, piece_end)
+            continue
+        cut = overlap_length(text, piece)
+        text += piece[cut:] if cut else " " + piece
+        end = span and span[1]
+    return text
+
+
+# ---------------------- Packing ----------------------
+def context_passages(matches, chunk_store, neighbours=0):
+    """
+    Passages in relevance order. Retrieved chunks plus `neighbours` on each side are grouped per
+    paper; each run of consecutive chunk indices becomes one passage, ranked by its best match.
+    """
+    papers = {}    # arxiv_id -> {"title", "chunks": {chunk_index: rank}, "spans", "snippets"}
+    for rank, match in enumerate(matches):
+        metadata = match["metadata"]
+        paper = papers.setdefault(metadata["arxiv_id"], {"title": metadata.get("title"), "chunks": {},
+                                                         "spans": {}, "snippets": {}})
+        index = int(metadata["chunk_index"])
+        last = chunk_store.last_chunk_index(metadata["arxiv_id"], index)
+        if "char_start" in metadata:
+            paper["spans"][index] = (int(metadata["char_start"]), int(metadata["char_end"]))
+        paper["snippets"][index] = metadata.get("snippet", "")
+        for n in range(max(0, index - neighbours), min(last, index + neighbours) + 1):
+            paper["chunks"][n] = min(rank, paper["chunks"].get(n, rank))
+
+    passages = []
+    for arxiv_id, paper in papers.items():
+        run, run_rank = [], None
+        for index in sorted(paper["chunks"]) + [None]:
+            text = span = None
+            if index is not None:
+                text = chunk_store.get(arxiv_id, index)
+                if text:
+                    span = paper["spans"].get(index)
+                else:
+                    # the metadata snippet is a truncated prefix: its span offsets do not apply,
+                    # so it is stitched by text overlap
+                    text = paper["snippets"].get(index)
+            if run and (text is None or index != run[-1][0] + 1):
+                passages.append((run_rank, arxiv_id, paper["title"], stitch([(t, sp) for _, t, sp in run])))
+                run, run_rank = [], None
+            if text:
+                run.append((index, text, span))
+                rank = paper["chunks"][index]
+                run_rank = rank if run_rank is None else min(run_rank, rank)
+    passages.sort(key=lambda p: p[0])
+    return [(arxiv_id, title, text) for _, arxiv_id, title, text in passages]
+
+
+def pack_context(passages, max_tokens=PROMPT_CONTEXT_TOKENS):
+    """
+    Clean each passage and keep them in order until `max_tokens` is reached; the passage that
+    crosses the budget is cut to the tokens left. Returns (context_text, tokens_used).
+    """
+    encoding = get_encoding()
+    parts, used = [], 0
+    for _, _, text in passages:
+        text = clean_chunk(text)
+        if not text:
+            continue
+        tokens = encoding.encode_ordinary(text)
+        remaining = max_tokens - used
+        if len(tokens) > remaining:
+            if remaining >= MIN_PASSAGE_TOKENS:
+                parts.append(encoding.decode(tokens[:remaining]).rstrip() + " …")
+                used += remaining
+            break
+        parts.append(text)
+        used += len(tokens)
+    return "\n\n".join(parts), used
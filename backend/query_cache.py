@@ -0,0 +1,324 @@
+# query_cache.py
+# Bounded in-process caches for the query path.
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+
+def normalize_query(text: str) -> str:
+    """Fold case, unicode forms, whitespace and trailing punctuation so equivalent questions share a key."""
+    text = unicodedata.normalize("NFKC", text).lower()
+    text = re.sub(r"\s+", " ", text).strip()
+    return text.rstrip(" ?!.")
+
+
+class LRUTTLCache:
+    """
+    Thread-safe LRU cache bounded by entry count and approximate bytes, with a per-entry TTL.
+    `size_fn(value)` estimates the bytes held by a value.
+    """
+
+    def __init__(self, max_entries=10000, max_bytes=64 * 1024 * 1024, ttl_seconds=86400, size_fn=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.size_fn = size_fn or (lambda value: 0)
+        self._data = OrderedDict()     # key -> (value, expires_at, nbytes)
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def _drop(self, key):
+        _, _, nbytes = self._data.pop(key)
+        self.bytes -= nbytes
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            value, expires_at, _ = item
+            if expires_at < time.time():
+                self._drop(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, expires_at=None):
+        nbytes = self.size_fn(value) + len(key)
+        if nbytes > self.max_bytes:
+            return
+        if expires_at is None:
+            expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (value, expires_at, nbytes)
+            self.bytes += nbytes
+            while len(self._data) > self.max_entries or self.bytes > self.max_bytes:
+                self._drop(next(iter(self._data)))
+                self.evictions += 1
+
+    def items(self):
+        """Live (key, value, expires_at) triples, oldest first."""
+        now = time.time()
+        with self._lock:
+            return [(k, v, exp) for k, (v, exp, _) in self._data.items() if exp >= now]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+# ===== Query embedding cache =====
+class EmbeddingCache(LRUTTLCache):
+    """Normalized query text -> float32 embedding, optionally persisted as .npz for warm restarts."""
+
+    def __init__(self, path=None, model=None, **kwargs):
+        super().__init__(size_fn=lambda vec: vec.nbytes, **kwargs)
+        self.path = path
+        self.model = model   # embedder the vectors came from; a saved file of another model is not loaded
+
+    def get_embedding(self, query):
+        return self.get(normalize_query(query))
+
+    def put_embedding(self, query, embedding):
+        self.put(normalize_query(query), np.asarray(embedding, dtype=np.float32))
+
+    def save(self):
+        if not self.path:
+            return
+        entries = self.items()
+        if not entries:
+            return
+        keys = np.array([k for k, _, _ in entries])
+        vectors = np.stack([v for _, v, _ in entries])
+        expires = np.array([exp for _, _, exp in entries], dtype=np.float64)
+        tmp_path = self.path + ".tmp.npz"
+        np.savez(tmp_path, keys=keys, vectors=vectors, expires=expires, model=np.array(self.model or ""))
+        os.replace(tmp_path, self.path)
+        print(f"💾 Saved {len(entries)} query embeddings to {self.path}")
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                keys, vectors, expires = data["keys"], data["vectors"], data["expires"]
+                model = str(data["model"]) if "model" in data else ""
+        except Exception as e:
+            print(f"❌ Could not load embedding cache {self.path}: {e}")
+            return
+        if model and self.model and model != self.model:
+            print(f"⚠️ Skipping embedding cache {self.path}: built with {model}, serving {self.model}")
+            return
+        now = time.time()
+        for key, vector, exp in zip(keys, vectors, expires):
+            if exp >= now:
+                self.put(str(key), vector.copy(), expires_at=float(exp))
+        print(f"📂 Loaded {len(self)} query embeddings from {self.path}")
+
+
+# ===== JSON-persisted cache =====
+class PersistentCache(LRUTTLCache):
+    """LRU/TTL cache of JSON-serializable values, saved to a JSON file so it survives restarts."""
+
+    def __init__(self, path=None, **kwargs):
+        super().__init__(size_fn=lambda value: len(json.dumps(value)), **kwargs)
+        self.path = path
+        self._save_lock = threading.Lock()
+
+    def save(self):
+        if not self.path:
+            return
+        entries = [[k, v, exp] for k, v, exp in self.items()]
+        with self._save_lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, self.path)
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                entries = json.load(f)
+        except Exception as e:
+            print(f"❌ Could not load cache {self.path}: {e}")
+            return
+        now = time.time()
+        for key, value, exp in entries:
+            if exp >= now:
+                self.put(key, value, expires_at=exp)
+
+
+# ===== Semantic answer cache =====
+class CachedAnswer:
+    def __init__(self, embedding, tokens, chunk_ids, generation, scope, expires_at, key=None):
+        self.key = key
+        self.embedding = embedding
+        self.tokens = tokens
+        self.chunk_ids = chunk_ids
+        self.generation = generation
+        self.scope = scope
+        self.expires_at = expires_at
+
+
+class SemanticAnswerCache:
+    """
+    Remembers streamed answers keyed by query embedding.
+    A lookup matches the closest stored query within `max_distance` cosine distance; the caller
+    replays it directly if the index has not changed since (same `generation`), or after checking
+    that retrieval still returns the same chunk IDs.
+    """
+
+    def __init__(self, max_entries=1000, max_distance=0.05, ttl_seconds=3600):
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self.ttl_seconds = ttl_seconds
+        self.generation = 0
+        self._entries = OrderedDict()   # id -> CachedAnswer
+        self._next_id = 0
+        self._matrix = None             # stacked unit vectors, rebuilt lazily
+        self._matrix_ids = []
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    def bump_generation(self):
+        """Call after the index changed; cached answers must then re-check their chunk IDs."""
+        with self._lock:
+            self.generation += 1
+
+    def clear(self):
+        """Drop every answer, e.g. when the query embedder changed and stored vectors no longer compare."""
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+            self._matrix_ids = []
+
+    @staticmethod
+    def _unit(embedding):
+        vec = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def _rebuild(self):
+        self._matrix_ids = list(self._entries.keys())
+        if self._matrix_ids:
+            self._matrix = np.stack([self._entries[i].embedding for i in self._matrix_ids])
+        else:
+            self._matrix = None
+
+    def lookup(self, embedding, scope=""):
+        if self.max_entries <= 0:
+            return None
+        query = self._unit(embedding)
+        now = time.time()
+        with self._lock:
+            if self._matrix is None or len(self._matrix_ids) != len(self._entries):
+                self._rebuild()
+            if self._matrix is None:
+                self.misses += 1
+                return None
+            distances = 1.0 - self._matrix @ query
+            for pos in np.argsort(distances):
+                if distances[pos] > self.max_distance:
+                    break
+                entry_id = self._matrix_ids[pos]
+                entry = self._entries.get(entry_id)
+                if entry is None or entry.scope != scope:
+                    continue
+                if entry.expires_at < now:
+                    continue
+                self._entries.move_to_end(entry_id)
+                return entry
+            self.misses += 1
+            return None
+
+    def record_hit(self, entry, revalidated=False):
+        with self._lock:
+            self.hits += 1
+            if revalidated:
+                entry.generation = self.generation
+
+    def record_stale(self, entry=None):
+        """Count a failed revalidation and evict the entry, so the fresh answer stored next replaces it."""
+        with self._lock:
+            self.stale += 1
+            self.misses += 1
+            if entry is not None and self._entries.pop(entry.key, None) is not None:
+                self._matrix = None
+
+    def store(self, embedding, tokens, chunk_ids, scope="", generation=None):
+        if self.max_entries <= 0 or not tokens:
+            return
+        entry = CachedAnswer(
+            embedding=self._unit(embedding),
+            tokens=list(tokens),
+            chunk_ids=tuple(chunk_ids),
+            generation=self.generation if generation is None else generation,
+            scope=scope,
+            expires_at=time.time() + self.ttl_seconds,
+        )
+        now = time.time()
+        with self._lock:
+            # expired entries and earlier answers to the same question (same scope, within
+            # max_distance) go, so a lookup cannot keep landing on a superseded duplicate
+            if self._entries:
+                if self._matrix is None or len(self._matrix_ids) != len(self._entries):
+                    self._rebuild()
+                distances = 1.0 - self._matrix @ entry.embedding
+                for key, distance in zip(self._matrix_ids, distances):
+                    old = self._entries[key]
+                    if old.expires_at < now or (old.scope == scope and distance <= self.max_distance):
+                        del self._entries[key]
+            entry.key = self._next_id
+            self._entries[self._next_id] = entry
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._matrix = None
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "generation": self.generation,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
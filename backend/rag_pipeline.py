@@ -1,26 +1,97 @@
 # rag_pipeline.py
-import re,os
-import concurrent.futures
+# Heavy components (embedding model, vector store client, LLM clients, the mongodb/arXiv stack)
+# are created on first use or by warmup(), so importing this module is fast.
+import os
+import asyncio
+import threading
+import time
 from dotenv import load_dotenv
-from mongodb import upload_to_mongo, extract_tags, expand_tags
-from pinecone import Pinecone
-from sentence_transformers import SentenceTransformer
-from openai import OpenAI
-from groq import Groq
-from pinecone_ingestion import run_ingestion
+from vector_store import get_vector_store, loaded_vector_store
+from chunk_store import get_chunk_store, split_chunk_id
+from sparse_index import get_sparse_index, reciprocal_rank_fusion
+from pinecone_ingestion import run_ingestion, get_embed_model, embed_model_loaded
+from reindex import active_index
+from ingestion_scheduler import IngestionScheduler
+from query_cache import EmbeddingCache, SemanticAnswerCache
+from embed_batcher import EmbeddingBatcher
+from reranker import CrossEncoderReranker, RERANK_ENABLED, RERANK_CANDIDATES
+from stage_timings import StageTimings
+from metrics import Counter, Histogram, CallbackMetric, ERRORS, register_cache
+from prompt_builder import context_passages, pack_context, get_encoding, PROMPT_CONTEXT_TOKENS
 
 # ===== Load env variables =====
 load_dotenv()
-PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
-INDEX_NAME = "arxiv-papers"
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-# ===== Initialize Pinecone =====
-pc = Pinecone(api_key=PINECONE_API_KEY)
-index = pc.Index(INDEX_NAME)
+LLM_MODEL = "openai/gpt-oss-20b"
+SYSTEM_PROMPT = "You are a knowledgeable assistant for answering questions using provided context.Important:Identify yourself as Athena AI ,an AI Assistant made by Sandarva Podder & Ankit Barik"
+# Max number of query encodes running at once; extra requests wait their turn
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "2"))
+# Queries arriving within this window are encoded together, up to the max batch size
+EMBED_BATCH_MAX_WAIT_MS = float(os.getenv("EMBED_BATCH_MAX_WAIT_MS", "3"))
+EMBED_BATCH_MAX_SIZE = int(os.getenv("EMBED_BATCH_MAX_SIZE", "32"))
 
-# ===== Load embedding model (same as used in upsert) =====
-embed_model = SentenceTransformer("sentence-transformers/all-mpnet-base-v2")
+# ===== Vector store (Pinecone, or the local mmap index with VECTOR_STORE=local) =====
+# get_vector_store() creates it on first use.
+# Full chunk text written during ingestion lives in get_chunk_store(); metadata only carries a 300-char snippet
+# Neighbouring chunks to include on each side of a retrieved chunk
+CONTEXT_NEIGHBOURS = int(os.getenv("CONTEXT_NEIGHBOURS", "0"))
+
+# ===== Sparse BM25 index (get_sparse_index()), fused with the dense results =====
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "1") == "1"
+# A BM25 hit containing this share of the query terms counts as relevant even if the dense score is low
+HYBRID_MIN_TERM_COVERAGE = float(os.getenv("HYBRID_MIN_TERM_COVERAGE", "0.75"))
+
+# ===== Cross-encoder re-ranking (RERANK=1): over-fetch RERANK_CANDIDATES, keep the best top_k =====
+reranker = CrossEncoderReranker()
+
+# ===== Embedding model (the one the active index version was built with), loaded by the first batch =====
+embed_batcher = EmbeddingBatcher(
+    lambda: get_embed_model(active_index.embed_model),
+    max_batch_size=EMBED_BATCH_MAX_SIZE,
+    max_wait_ms=EMBED_BATCH_MAX_WAIT_MS,
+    workers=EMBED_WORKERS,
+)
+
+# ===== Query embedding cache (normalized query text -> vector), loaded from disk by warmup() =====
+embedding_cache = EmbeddingCache(
+    path=os.getenv("EMBED_CACHE_PATH") or None,
+    max_entries=int(os.getenv("EMBED_CACHE_MAX_ENTRIES", "10000")),
+    max_bytes=int(float(os.getenv("EMBED_CACHE_MAX_MB", "64")) * 1024 * 1024),
+    ttl_seconds=float(os.getenv("EMBED_CACHE_TTL_SECONDS", "86400")),
+    model=active_index.embed_model,
+)
+
+# ===== Semantic answer cache (paraphrased questions replay a stored answer) =====
+answer_cache = SemanticAnswerCache(
+    max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000")),
+    max_distance=float(os.getenv("ANSWER_CACHE_MAX_DISTANCE", "0.05")),
+    ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600")),
+)
+
+# ===== Metrics (GET /metrics) and per-stage latency of the query path =====
+QUERY_STAGE_SECONDS = Histogram(
+    "athena_query_stage_seconds",
+    "Query path stages: embed, retrieve (vector_query and sparse_query in parallel), rerank, prompt, "
+    "first_token and generate (LLM time to first token and total)",
+    ["stage"],
+)
+TOP_SCORE = Histogram(
+    "athena_retrieval_top_score", "Best dense similarity per query",
+    buckets=(0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0),
+)
+QUERIES = Counter("athena_queries_total", "Queries by outcome (answered, answer_cache, revalidated, image_clip, abandoned)", ["outcome"])
+stage_timings = StageTimings(histogram=QUERY_STAGE_SECONDS, errors=ERRORS)
+register_cache("query_embedding", embedding_cache)
+register_cache("answer", answer_cache)
+CallbackMetric("athena_embed_queue_depth", "Query texts waiting for an encode batch",
+               lambda: embed_batcher.stats()["queue_depth"])
+CallbackMetric("athena_embed_batches_total", "Encode batches run", lambda: embed_batcher.batches, kind="counter")
+CallbackMetric("athena_embed_texts_total", "Query texts encoded", lambda: embed_batcher.items, kind="counter")
+CallbackMetric("athena_rerank_fallbacks_total", "Re-rankings that kept the retrieval order",
+               lambda: {(reason,): n for reason, n in reranker.stats()["fallbacks"].items()},
+               kind="counter", labelnames=["reason"])
+CallbackMetric("athena_ready", "1 once warmup has loaded every component", lambda: int(_ready.is_set()))
 
 # ===== Initialize OpenRouter Client =====
 # client = OpenAI(
@@ -28,38 +99,316 @@ embed_model = SentenceTransformer("sentence-transformers/all-mpnet-base-v2")
 #     api_key=OPENROUTER_API_KEY,
 # )
 
-client = Groq(api_key=GROQ_API_KEY)
+# ===== Groq clients, created on first use =====
+_client = None
+_async_client = None
+_client_lock = threading.Lock()
 
-def clean_chunk(text):
-    # Remove incomplete URLs
-    text = re.sub(r'https?://\S+', '', text)
-    
-    # Remove dangling citations like "[123]" or "[12, 45]" (optional)
-    text = re.sub(r'\[\d+(,\s*\d+)*\]', '', text)
-    
-    # Fix broken whitespace and line breaks
-    text = re.sub(r'\s+', ' ', text)
-    
-    # Remove incomplete trailing words if needed
-    text = re.sub(r'\b\w{1,3}$', '', text)  # optional, be careful
-    
-    return text.strip()
 
+def get_llm_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from groq import Groq
+                _client = Groq(api_key=GROQ_API_KEY)
+    return _client
+
+
+def get_async_llm_client():
+    global _async_client
+    if _async_client is None:
+        with _client_lock:
+            if _async_client is None:
+                from groq import AsyncGroq
+                _async_client = AsyncGroq(api_key=GROQ_API_KEY)
+    return _async_client
+
+
+def set_async_llm_client(async_client):
+    global _async_client
+    _async_client = async_client
+
+
+def fetch_papers_for_query(query, top_n_per_tag=2):
+    from mongodb import upload_tags, extract_tags, expand_tags   # OpenAI/arXiv stack, only needed for ingestion
 
-def background_ingestion(query, top_n_per_tag=2):
     tags = extract_tags(query)
     # print(f"🔖 Extracted tags: {tags}")
     expanded_tags = expand_tags(tags)
     # print(f"🔖 Expanded tags: {expanded_tags}")
 
     # Limit the number of documents per tag to avoid huge ingestion
-    for tag in expanded_tags[:10]:  # optional: limit total tags processed
-        upload_to_mongo(tag, top_n_per_tag)
+    # optional: limit total tags processed; they are OR-joined into combined arXiv queries
+    upload_tags(expanded_tags[:10], top_n_per_tag)
 
+
+def index_new_papers():
     run_ingestion()
+    # New chunks may change what a cached answer would have retrieved
+    answer_cache.bump_generation()
+
+
+def background_ingestion(query, top_n_per_tag=2):
+    fetch_papers_for_query(query, top_n_per_tag)
+    index_new_papers()
     print("✅ Background ingestion completed.")
 
 
+# ===== Active index version (blue/green swaps, see reindex.py) =====
+_index_lock = threading.Lock()
+_index_generation = active_index.generation
+
+
+def index_refresh_due():
+    return active_index.stale() or active_index.generation != _index_generation
+
+
+def refresh_active_index():
+    """
+    Follow a swap to another index version, or papers ingested, in this process or another one
+    (checked every INDEX_CHECK_SECONDS). Cached answers must re-check their chunk IDs afterwards; if the version uses another embedder, cached query vectors
+    and answers keyed by them are dropped, as they no longer compare with the new index.
+    """
+    global _index_generation
+    active_index.refresh()
+    with _index_lock:
+        if active_index.generation == _index_generation:
+            return False
+        if embedding_cache.model != active_index.embed_model:
+            embedding_cache.clear()
+            embedding_cache.model = active_index.embed_model
+            answer_cache.clear()
+        answer_cache.bump_generation()
+        _index_generation = active_index.generation
+    return True
+
+
+# ===== Process-wide ingestion scheduler =====
+ingestion_scheduler = IngestionScheduler(
+    fetch_fn=fetch_papers_for_query,
+    index_fn=index_new_papers,
+    max_workers=int(os.getenv("INGESTION_MAX_WORKERS", "2")),
+    max_queue=int(os.getenv("INGESTION_MAX_QUEUE", "20")),
+    dedup_similarity=float(os.getenv("INGESTION_DEDUP_SIMILARITY", "0.6")),
+    cooldown_seconds=float(os.getenv("INGESTION_COOLDOWN_SECONDS", "600")),
+)
+
+
+def trigger_background_ingestion(query):
+    print("⚠️ Low relevance in vector store. Triggering ingestion...")
+    return ingestion_scheduler.submit(query)
+
+
+# ===== Hybrid retrieval =====
+def sparse_search(query, top_k):
+    if not HYBRID_SEARCH:
+        return []
+    with stage_timings.time("sparse_query"):
+        return get_sparse_index().search(query, top_k)
+
+
+async def vector_query_async(query_embedding, top_k):
+    with stage_timings.time("vector_query"):
+        return await get_vector_store().aquery(query_embedding, top_k=top_k, include_metadata=True)
+
+
+def observe_top_score(dense_matches):
+    if dense_matches:
+        TOP_SCORE.observe(dense_matches[0]["score"])
+
+
+def fuse_matches(dense_matches, sparse_hits, top_k):
+    """Reciprocal-rank fusion of dense matches and BM25 hits, in the dense match format."""
+    if not sparse_hits:
+        return list(dense_matches[:top_k])
+    by_id = {match["id"]: match for match in dense_matches}
+    fused = reciprocal_rank_fusion([list(by_id), [doc_id for doc_id, _ in sparse_hits]])
+    matches = []
+    for doc_id, _ in fused[:top_k]:
+        match = by_id.get(doc_id)
+        if match is None:
+            arxiv_id, chunk_index = split_chunk_id(doc_id)
+            match = {
+                "id": doc_id,
+                "score": 0.0,   # not scored by the dense model
+                "metadata": {
+                    "arxiv_id": arxiv_id,
+                    "title": get_sparse_index().title(arxiv_id),
+                    "chunk_index": chunk_index,
+                    "snippet": "",
+                },
+            }
+        matches.append(match)
+    return matches
+
+
+def is_low_relevance(query, dense_matches, sparse_hits, threshold):
+    if dense_matches and dense_matches[0]["score"] >= threshold:
+        return False
+    if sparse_hits and get_sparse_index().term_coverage(query, sparse_hits[0][0]) >= HYBRID_MIN_TERM_COVERAGE:
+        return False
+    return True
+
+
+# ===== Re-ranking =====
+def retrieval_depth(top_k):
+    """Matches to fetch from each retriever: over-fetch when the re-ranker will choose among them."""
+    return max(top_k, RERANK_CANDIDATES) if RERANK_ENABLED else top_k
+
+
+def rerank_passage(match):
+    metadata = match["metadata"]
+    text = get_chunk_store().get_by_id(match["id"]) or metadata.get("snippet", "")
+    title = metadata.get("title")
+    return f"{title}. {text}" if title else text
+
+
+def rerank_matches(query, matches, top_k):
+    """Best top_k of the fused candidates by cross-encoder score (retrieval order if over budget)."""
+    if not RERANK_ENABLED or len(matches) <= 1:
+        return list(matches[:top_k])
+    order = reranker.rerank(query, [rerank_passage(match) for match in matches], top_k)
+    return [matches[i] for i in order]
+
+
+def build_prompt(query, matches, max_context_tokens=PROMPT_CONTEXT_TOKENS):
+    """
+    Full chunks (plus CONTEXT_NEIGHBOURS) from the chunk store, merged per paper without their overlap
+    and packed in relevance order up to `max_context_tokens`; the metadata snippet stands in for a
+    chunk missing from the store.
+    """
+    passages = context_passages(matches, get_chunk_store(), CONTEXT_NEIGHBOURS)
+    context_text, _ = pack_context(passages, max_context_tokens)
+    return f"""You are a helpful assistant. Use the context below to answer the question.
+    - Ignore URLs or incomplete references.
+    -If the context does not fully answer the question or is fully academic or not explanatory,then provide a basic overview from your own knowledge to fill gaps
+    
+
+Context:
+{context_text}
+
+Question: {query}
+Answer:"""
+
+
+def match_ids(matches):
+    return tuple(match["id"] for match in matches)
+
+
+async def replay_answer(tokens):
+    for token in tokens:
+        yield token
+
+
+def build_messages(prompt):
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt},
+    ]
+
+
+# ===== Query embedding =====
+def _encode_query(query):
+    embedding = embed_batcher.encode(query)
+    embedding_cache.put_embedding(query, embedding)
+    return embedding.tolist()
+
+
+def embed_query(query):
+    cached = embedding_cache.get_embedding(query)
+    if cached is not None:
+        return cached.tolist()
+    return _encode_query(query)
+
+
+async def embed_query_async(query):
+    """Serve from the embedding cache, otherwise queue the text for the next encode batch."""
+    cached = embedding_cache.get_embedding(query)
+    if cached is not None:
+        return cached.tolist()
+    embedding = await asyncio.wrap_future(embed_batcher.submit(query))
+    embedding_cache.put_embedding(query, embedding)
+    return embedding.tolist()
+
+
+# ===== Warmup and readiness =====
+_ready = threading.Event()
+_warmup_lock = threading.Lock()
+warmup_state = {"started_at": None, "seconds": None, "error": None, "attempts": 0}
+# A failed warmup (LLM/Pinecone hiccup, tokenizer download) is retried with exponential backoff
+WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", "2"))
+WARMUP_RETRY_MAX_SECONDS = float(os.getenv("WARMUP_RETRY_MAX_SECONDS", "60"))
+
+
+def warmup():
+    """
+    Load every heavy component and run one encode so the first request does not pay for it.
+    Safe to call more than once; returns True once the pipeline is ready.
+    """
+    with _warmup_lock:
+        if _ready.is_set():
+            return True
+        warmup_state["started_at"] = time.time()
+        warmup_state["error"] = None
+        warmup_state["attempts"] += 1
+        start = time.perf_counter()
+        try:
+            refresh_active_index()
+            embedding_cache.load()
+            get_chunk_store()
+            get_sparse_index()
+            get_vector_store()
+            get_async_llm_client()
+            get_encoding()
+            embed_batcher.encode("warmup")   # loads the model and runs the first forward pass
+            if RERANK_ENABLED:
+                reranker.warmup()
+        except Exception as e:
+            warmup_state["error"] = f"{type(e).__name__}: {e}"
+            print(f"❌ Warmup failed: {warmup_state['error']}")
+            return False
+        warmup_state["seconds"] = round(time.perf_counter() - start, 3)
+        _ready.set()
+        print(f"🔥 Pipeline warm in {warmup_state['seconds']:.1f}s")
+        return True
+
+
+async def warmup_until_ready(retry_seconds=WARMUP_RETRY_SECONDS, max_retry_seconds=WARMUP_RETRY_MAX_SECONDS):
+    """Run warmup off the event loop until it succeeds, so a transient failure does not leave /ready at 503."""
+    delay = retry_seconds
+    while not await asyncio.to_thread(warmup):
+        print(f"🔁 Retrying warmup in {delay:.0f}s")
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, max_retry_seconds)
+
+
+def is_ready():
+    return _ready.is_set()
+
+
+def readiness():
+    return {
+        "ready": _ready.is_set(),
+        "components": {
+            "embed_model": embed_model_loaded(),
+            "vector_store": loaded_vector_store() is not None,
+            "llm_client": _async_client is not None,
+            **({"reranker": reranker.loaded()} if RERANK_ENABLED else {}),
+        },
+        **warmup_state,
+    }
+
+
+async def shutdown_pipeline():
+    store = loaded_vector_store()
+    if store is not None:
+        await store.aclose()
+    embed_batcher.shutdown()
+    ingestion_scheduler.shutdown()
+    embedding_cache.save()
+
+
 # qa_model = pipeline(
 #     "text-generation",
 #     model="mistralai/Mistral-7B-Instruct-v0.2",
@@ -85,44 +434,39 @@ def background_ingestion(query, top_n_per_tag=2):
 
 # ===== RAG function =====
 def rag_query(query, top_k=5, max_new_tokens=300,threshold=0.2,stream=True):
+    if index_refresh_due():
+        refresh_active_index()
+
     # Step 1: Embed the query
-    query_embedding = embed_model.encode([query]).tolist()
-
-    # Step 2: Search Pinecone
-    results = index.query(
-        vector=query_embedding[0],
-        top_k=top_k,
-        include_metadata=True
-    )
-    matches = results.get("matches", [])
-    print(matches[0]["score"] if matches else "No matches found")
-    if not matches or matches[0]["score"] < threshold:
-        print("⚠️ Low relevance in Pinecone. Triggering ingestion...")
-
-        executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
-        executor.submit(background_ingestion, query)
-
-        # Provide a fallback answer immediately
-        print("The information in the database is limited. Here's a general overview based on my knowledge:")
-        results = index.query(vector=query_embedding[0], top_k=top_k, include_metadata=True)
-        matches = results.get("matches", [])
-    # Step 3: Collect retrieved chunks
-    contexts = [clean_chunk(match["metadata"]["snippet"]) for match in results["matches"]]
-    # for context in contexts:
-    #     print(f"Context:",context)
-
-    # Step 4: Build prompt
-    context_text = "\n\n".join([context for context in contexts if context.strip()])
-    prompt = f"""You are a helpful assistant. Use the context below to answer the question.
-    - Ignore URLs or incomplete references.
-    -If the context does not fully answer the question or is fully academic or not explanatory,then provide a basic overview from your own knowledge to fill gaps
-    
+    with stage_timings.time("embed"):
+        query_embedding = [embed_query(query)]
 
-Context:
-{context_text}
+    # Step 2: Search the vector store and the BM25 index, fuse the rankings
+    depth = retrieval_depth(top_k)
+    with stage_timings.time("retrieve"):
+        with stage_timings.time("vector_query"):
+            results = get_vector_store().query(
+                vector=query_embedding[0],
+                top_k=depth,
+                include_metadata=True
+            )
+        dense_matches = results.get("matches", [])
+        observe_top_score(dense_matches)
+        sparse_hits = sparse_search(query, depth)
+        matches = fuse_matches(dense_matches, sparse_hits, depth)
+    if RERANK_ENABLED:
+        with stage_timings.time("rerank"):
+            matches = rerank_matches(query, matches, top_k)
+    if is_low_relevance(query, dense_matches, sparse_hits, threshold):
+        trigger_background_ingestion(query)
 
-Question: {query}
-Answer:"""
+        # Provide a fallback answer immediately; ingestion runs in the background, so
+        # querying again right away would only return the same matches
+        print("The information in the database is limited. Here's a general overview based on my knowledge:")
+
+    # Step 3 + 4: Collect retrieved chunks and build prompt
+    with stage_timings.time("prompt"):
+        prompt = build_prompt(query, matches)
     # -Also,please dont forget to answer if the provided context is helpful or not.
     # print(prompt)
     
@@ -142,14 +486,9 @@ Answer:"""
     # return completion.choices[0].message.content
 
 
-    completion = client.chat.completions.create(
-    model="openai/gpt-oss-20b",
-    messages=[
-      
-          {"role": "system", "content": "You are a knowledgeable assistant for answering questions using provided context.Important:Identify yourself as Athena AI ,an AI Assistant made by Sandarva Podder & Ankit Barik"},
-        {"role": "user",
-        "content": prompt}
-    ],
+    completion = get_llm_client().chat.completions.create(
+    model=LLM_MODEL,
+    messages=build_messages(prompt),
     temperature=1,
     max_completion_tokens=max_new_tokens,
     top_p=1,
@@ -160,8 +499,8 @@ Answer:"""
     
     if stream:
         for chunk in completion:
-            token = chunk.choices[0].delta.content or ""
-            if token.strip():
+            token = chunk.choices[0].delta.content
+            if token:
                 yield token
         return
 
@@ -172,8 +511,112 @@ Answer:"""
             complete_answer += chunk.choices[0].delta.content or "" + "\n"
 
         return complete_answer
+
+
+# ===== Async generation =====
+async def stream_completion(prompt, max_new_tokens, tokens):
+    """Stream the Groq answer to `prompt`, appending each token to `tokens` as it is yielded."""
+    generate_start = time.perf_counter()
+    completion = None
+    try:
+        completion = await get_async_llm_client().chat.completions.create(
+            model=LLM_MODEL,
+            messages=build_messages(prompt),
+            temperature=1,
+            max_completion_tokens=max_new_tokens,
+            top_p=1,
+            reasoning_effort="medium",
+            stream=True,
+            stop=None
+        )
+        async for chunk in completion:
+            token = chunk.choices[0].delta.content
+            if token:   # whitespace-only deltas carry spaces and line breaks, pass them through
+                if not tokens:
+                    stage_timings.record("first_token", time.perf_counter() - generate_start)
+                tokens.append(token)
+                yield token
+    except (asyncio.CancelledError, GeneratorExit):
+        QUERIES.inc(outcome="abandoned")
+        raise
+    except Exception:
+        ERRORS.inc(stage="llm")
+        raise
+    finally:
+        # closes the upstream HTTP stream right away instead of when the response is garbage collected
+        if completion is not None and hasattr(completion, "close"):
+            await completion.close()
+    stage_timings.record("generate", time.perf_counter() - generate_start)
+
+
+# ===== Async RAG function (used by the FastAPI /search endpoint) =====
+async def rag_query_async(query, top_k=5, max_new_tokens=300, threshold=0.2):
+    """
+    Non-blocking version of rag_query.
+    Embedding is coalesced with concurrent queries by the embed batcher, the vector store and Groq are awaited,
+    so one slow request never stalls the other streams on the event loop.
+    A paraphrase of a recently answered question replays the stored answer instead.
+    """
+    if index_refresh_due():
+        # opening a newly swapped-in version reads its files, so it stays off the event loop
+        await asyncio.to_thread(refresh_active_index)
+
+    with stage_timings.time("embed"):
+        query_embedding = await embed_query_async(query)
+
+    scope = f"{top_k}:{max_new_tokens}"
+    cached = answer_cache.lookup(query_embedding, scope)
+    if cached is not None and cached.generation == answer_cache.generation:
+        # Index unchanged since the answer was generated, so retrieval would return the same chunks
+        answer_cache.record_hit(cached)
+        QUERIES.inc(outcome="answer_cache")
+        async for token in replay_answer(cached.tokens):
+            yield token
+        return
+
+    depth = retrieval_depth(top_k)
+    with stage_timings.time("retrieve"):
+        results, sparse_hits = await asyncio.gather(
+            vector_query_async(query_embedding, depth),
+            asyncio.to_thread(sparse_search, query, depth),
+        )
+    dense_matches = results.get("matches", [])
+    observe_top_score(dense_matches)
+    matches = fuse_matches(dense_matches, sparse_hits, depth)
+    if RERANK_ENABLED:
+        # CPU-bound scoring runs off the event loop; bounded by RERANK_BUDGET_MS
+        with stage_timings.time("rerank"):
+            matches = await asyncio.to_thread(rerank_matches, query, matches, top_k)
+
+    generation = answer_cache.generation
+    chunk_ids = match_ids(matches)
+    if cached is not None:
+        if cached.chunk_ids == chunk_ids:
+            answer_cache.record_hit(cached, revalidated=True)
+            QUERIES.inc(outcome="revalidated")
+            async for token in replay_answer(cached.tokens):
+                yield token
+            return
+        answer_cache.record_stale(cached)
+
+    if is_low_relevance(query, dense_matches, sparse_hits, threshold):
+        trigger_background_ingestion(query)
+
+    with stage_timings.time("prompt"):
+        prompt = build_prompt(query, matches)
+
+    tokens = []
+    async for token in stream_completion(prompt, max_new_tokens, tokens):
+        yield token
+    QUERIES.inc(outcome="answered")
+
+    # Only reached when the stream completed (a disconnect closes the generator at the yield)
+    answer_cache.store(query_embedding, tokens, chunk_ids, scope=scope, generation=generation)
+
+
 # ===== Main =====
 if __name__ == "__main__":
+    warmup()
     while True:
         user_query = input("\n🔎 Ask a question (or type 'exit'): ")
         if user_query.lower() in ["exit", "quit", "q"]:
@@ -0,0 +1,458 @@
+# reindex.py
+# Incremental, blue/green re-indexing of the paper corpus (layout in index_versions.py).
+# A build plans the least work per paper against the active version's manifest:
+#   copy     same PDF, same chunker and embedder: vectors, text and BM25 postings are copied over
+#   embed    same PDF and chunker, new embedder / metadata layout: stored chunk text is re-encoded
+#   rechunk  new PDF (file id), new chunker config, or not in the source version: full pipeline
+# The new version is built beside the live one, every landed paper is appended to its manifest so
+# an interrupted build resumes where it stopped, and queries only move once it is swapped in.
+#
+#   python reindex.py plan | run | status | swap <version>
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from itertools import chain
+
+from dotenv import load_dotenv
+
+from chunk_store import ChunkStore, set_chunk_store, get_chunk_store
+from file_lock import file_lock
+from index_versions import (BUILDING, FAILED, INDEX_ROOT, READY, IndexManifest, active_version, config_hash, index_stamp,
+                            list_versions, next_version_name, paper_record, set_active_version, version_dimension,
+                            version_path)
+from multimodal import (CLIP_MODEL_NAME, CLIP_TEXT_MAX_CHARS, IMAGE_RETRIEVAL, get_clip_store, open_clip_store,
+                        set_clip_store)
+from pinecone_ingestion import (EMBED_MODEL_NAME, METADATA_VERSION, SPAN_FIELDS, embed_and_upsert, get_embed_model,
+                                get_papers_collection)
+from sparse_index import SparseIndex, get_sparse_index, set_sparse_index
+from vector_store import DIMENSION, get_vector_store, open_vector_store, set_vector_store
+
+load_dotenv()
+REINDEX_COPY_WORKERS = int(os.getenv("REINDEX_COPY_WORKERS", "4"))
+# Make a finished build the active version right away (otherwise: POST /index/swap/<version>)
+REINDEX_AUTO_SWAP = os.getenv("REINDEX_AUTO_SWAP", "1") == "1"
+# How often a serving process checks active.json for a version swapped in by another process
+INDEX_CHECK_SECONDS = float(os.getenv("INDEX_CHECK_SECONDS", "5"))
+# Held for a whole build, so builds started from different web workers or the CLI never share a version
+REINDEX_LOCK_PATH = os.path.join(INDEX_ROOT, "reindex.lock")
+
+COPY, EMBED, RECHUNK, NEW = "copy", "embed", "rechunk", "new"
+
+
+class ReindexBusy(RuntimeError):
+    pass
+
+
+# ---------------------- Configuration ----------------------
+def current_config():
+    """What an index built now would be made with; versions whose hashes differ need work."""
+    # the PDF/langchain/tiktoken stack is only needed once a plan is made
+    from preprocess_pipeline import (CHUNKER, CHUNK_OVERLAP, CHUNK_SIZE, ENCODING_NAME, EXTRACTOR_VERSION,
+                                     SEPARATORS)
+
+    chunking = {"chunker": CHUNKER, "chunk_size": CHUNK_SIZE, "chunk_overlap": CHUNK_OVERLAP,
+                "encoding": ENCODING_NAME, "separators": SEPARATORS, "extractor": EXTRACTOR_VERSION}
+    embedding = {"model": EMBED_MODEL_NAME, "metadata_version": METADATA_VERSION}
+    if IMAGE_RETRIEVAL == "clip":
+        embedding["clip"] = {"model": CLIP_MODEL_NAME, "text_max_chars": CLIP_TEXT_MAX_CHARS}
+    return {"chunking": chunking, "embedding": embedding,
+            "chunking_hash": config_hash(chunking), "embedding_hash": config_hash(embedding)}
+
+
+def version_embed_model(version):
+    """Name of the embedder a version was built with (the configured one for the un-versioned index)."""
+    if not version:
+        return EMBED_MODEL_NAME
+    return IndexManifest(version).config["embedding"]["model"]
+
+
+def version_stores(version, dimension=None):
+    """Open every store of a version: vectors, chunks, sparse and, if it was built with CLIP, clip."""
+    stores = {
+        "vectors": open_vector_store(version, dimension or version_dimension(version) or DIMENSION),
+        "chunks": ChunkStore(version_path(version, "chunks")),
+        "sparse": SparseIndex(version_path(version, "sparse")),
+    }
+    if "clip" in IndexManifest(version).config["embedding"]:
+        stores["clip"] = open_clip_store(version)
+    return stores
+
+
+# ---------------------- Planning ----------------------
+def corpus_papers():
+    """arxiv_id -> file id of every paper with a stored PDF."""
+    cursor = get_papers_collection().find({"file_id": {"$exists": True}}, {"_id": 0, "arxiv_id": 1, "file_id": 1})
+    return {paper["arxiv_id"]: str(paper["file_id"]) for paper in cursor if paper.get("file_id")}
+
+
+def plan_reindex(papers, source, config, done=None):
+    """
+    {action: [arxiv_id]} for building `config` from the `source` manifest (None: nothing to reuse).
+    Papers already in `done` (the target's own records) with the same file id are left out.
+    """
+    plan = {COPY: [], EMBED: [], RECHUNK: [], NEW: []}
+    source_papers = source.papers() if source is not None else {}
+    same_chunking = source is not None and source.config["chunking_hash"] == config["chunking_hash"]
+    same_embedding = source is not None and source.config["embedding_hash"] == config["embedding_hash"]
+    done = done or {}
+    for arxiv_id, file_id in papers.items():
+        record = done.get(arxiv_id)
+        if record is not None and record["file_id"] == file_id:
+            continue
+        record = source_papers.get(arxiv_id)
+        if record is None:
+            plan[NEW].append(arxiv_id)
+        elif record["file_id"] != file_id or not same_chunking or not record["chunks"]:
+            plan[RECHUNK].append(arxiv_id)
+        elif not same_embedding:
+            plan[EMBED].append(arxiv_id)
+        else:
+            plan[COPY].append(arxiv_id)
+    return plan
+
+
+def plan_summary(plan):
+    return {action: len(ids) for action, ids in plan.items()}
+
+
+# ---------------------- Active version (query side) ----------------------
+class ActiveIndex:
+    """
+    The version this process queries. refresh() follows active.json, at most every `check_seconds`,
+    so a swap made by another process (another web worker, the CLI) is picked up; install() swaps
+    the process-wide stores in place. `generation` counts swaps and ingestion runs by any process
+    (the index update stamp).
+    """
+
+    def __init__(self, check_seconds=INDEX_CHECK_SECONDS):
+        self.check_seconds = check_seconds
+        self.version = active_version()
+        self.embed_model = version_embed_model(self.version)
+        self.generation = 0
+        self._stamp = index_stamp()
+        self._checked = time.monotonic()
+        self._lock = threading.Lock()
+
+    def stale(self):
+        return time.monotonic() - self._checked >= self.check_seconds
+
+    def refresh(self):
+        """Install the version active.json points at if it changed. Returns True if anything changed."""
+        with self._lock:
+            if not self.stale():
+                return False
+            self._checked = time.monotonic()
+            stamp = index_stamp()
+            version = active_version()
+            if version == self.version or version is None:
+                if stamp == self._stamp:
+                    return False
+                self._stamp = stamp
+                self.generation += 1   # papers were added, possibly by another process
+                return True
+            self._stamp = stamp
+            self._install(version, version_stores(version))
+        print(f"🔁 Now serving index version {version}")
+        return True
+
+    def install(self, version, stores):
+        with self._lock:
+            self._install(version, stores)
+
+    def _install(self, version, stores):
+        # in-flight queries keep the store objects they already hold; new ones get the new version
+        set_vector_store(stores["vectors"])
+        set_chunk_store(stores["chunks"])
+        set_sparse_index(stores["sparse"])
+        if "clip" in stores:
+            set_clip_store(stores["clip"])
+        self.version = version
+        self.embed_model = version_embed_model(version)
+        self.generation += 1
+        self._checked = time.monotonic()
+
+    def status(self):
+        return {"version": self.version, "embed_model": self.embed_model, "generation": self.generation}
+
+
+active_index = ActiveIndex()
+
+
+def sync_indexed_flags(manifest):
+    """Mongo `pinecone_indexed` means "in the active version": papers it lacks are left to regular ingestion."""
+    landed = list(manifest.papers())
+    papers = get_papers_collection()
+    papers.update_many({"arxiv_id": {"$in": landed}}, {"$set": {"pinecone_indexed": True}})
+    papers.update_many({"arxiv_id": {"$nin": landed}}, {"$set": {"pinecone_indexed": False}})
+
+
+def activate(version, stores=None):
+    """Point queries at a ready version; `stores` are the already-open stores of an in-process build."""
+    manifest = IndexManifest(version)
+    if manifest.status != READY:
+        raise ValueError(f"Index version {version} is {manifest.status}, not {READY}")
+    set_active_version(version)
+    active_index.install(version, stores or version_stores(version))
+    sync_indexed_flags(manifest)
+    manifest.update(activated_at=time.time())
+    print(f"✅ Index version {version} is now active")
+
+
+# ---------------------- Build ----------------------
+class ReindexJob:
+    """
+    Builds a new version in a background thread (or inline via run()). A build left BUILDING with
+    the same configuration is resumed instead of starting over.
+    """
+
+    def __init__(self, copy_workers=REINDEX_COPY_WORKERS, auto_swap=REINDEX_AUTO_SWAP):
+        self.copy_workers = copy_workers
+        self.auto_swap = auto_swap
+        self._thread = None
+        self._lock = threading.Lock()
+        self.state = {"status": "idle"}
+
+    # ---------------------- Control ----------------------
+    def start(self):
+        """Start a build in the background; False if one is already running here or in another process."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            build_lock = ExitStack()
+            if not build_lock.enter_context(file_lock(REINDEX_LOCK_PATH, blocking=False)):
+                build_lock.close()
+                return False
+            self._thread = threading.Thread(target=self._run_holding, args=(build_lock,), name="reindex", daemon=True)
+            self._thread.start()
+            return True
+
+    def _run_holding(self, build_lock):
+        with build_lock:
+            self._execute()
+
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def status(self):
+        return dict(self.state, counts=dict(self.state.get("counts", {})))
+
+    def _set(self, **fields):
+        self.state.update(fields)
+
+    # ---------------------- Build ----------------------
+    @staticmethod
+    def _resumable(config, source_version):
+        """The latest interrupted or failed build of the same configuration from the same source, if any."""
+        for version in reversed(list_versions()):
+            manifest = IndexManifest(version)
+            if (manifest.status in (BUILDING, FAILED) and manifest.data.get("source") == source_version
+                    and manifest.config["chunking_hash"] == config["chunking_hash"]
+                    and manifest.config["embedding_hash"] == config["embedding_hash"]):
+                return manifest
+        return None
+
+    def _source_stores(self, version):
+        if version == active_index.version:
+            # reuse what this process already serves (the only copy with VECTOR_STORE=memory)
+            stores = {"vectors": get_vector_store(), "chunks": get_chunk_store(), "sparse": get_sparse_index()}
+            if "clip" in IndexManifest(version).config["embedding"]:
+                stores["clip"] = get_clip_store()
+            return stores
+        return version_stores(version)
+
+    def run(self):
+        """Build inline (the CLI); raises ReindexBusy if another build holds the lock."""
+        with file_lock(REINDEX_LOCK_PATH, blocking=False) as acquired:
+            if not acquired:
+                raise ReindexBusy(f"Another re-index holds {REINDEX_LOCK_PATH}")
+            return self._execute()
+
+    def _execute(self):
+        self.state = {"status": "planning", "started_at": time.time(), "counts": Counter()}
+        try:
+            self._run()
+        except Exception as e:
+            print(f"❌ Re-index failed: {type(e).__name__}: {e}")
+            if "version" in self.state:
+                IndexManifest(self.state["version"]).update(status=FAILED, error=str(e))
+            self._set(status="failed", error=f"{type(e).__name__}: {e}")
+        finally:
+            self._set(finished_at=time.time())
+        return self.status()
+
+    def _run(self):
+        config = current_config()
+        source_version = active_version()
+        source = IndexManifest(source_version) if source_version else None
+        plan = plan_reindex(corpus_papers(), source, config)
+        self._set(source=source_version, plan=plan_summary(plan))
+        target = self._resumable(config, source_version)
+        resumed = target is not None
+        if source is not None and not plan[EMBED] and not plan[RECHUNK] and not resumed:
+            print(f"✅ Index version {source_version} is up to date; new papers go through regular ingestion")
+            self._set(status="up_to_date")
+            return
+
+        model = get_embed_model(config["embedding"]["model"])
+        if resumed:
+            target.update(status=BUILDING, error=None)
+        else:
+            target = IndexManifest.create(next_version_name(), config, source=source_version)
+            target.update(dimension=embedding_dimension(model))
+        print(f"{'🔁 Resuming' if resumed else '🏗️ Building'} index version {target.version} from "
+              f"{source_version or 'scratch'}")
+        self._set(version=target.version, resumed=resumed)
+        target_stores = version_stores(target.version, target.data["dimension"])
+        source_stores = self._source_stores(source_version) if source is not None else None
+
+        # second pass picks up papers ingested into the live version while the first one ran
+        for _ in range(2):
+            plan = plan_reindex(corpus_papers(), source, config, done=target.papers())
+            if not any(plan.values()):
+                break
+            self._set(status="building", pending=plan_summary(plan))
+            self._build(plan, source, source_stores, target, target_stores, model)
+
+        counts = self.state["counts"]
+        target.update(status=READY, built_at=time.time(), counts=dict(counts))
+        self._set(status="ready")
+        print(f"✅ Index version {target.version} ready: " + ", ".join(f"{n} {a}" for a, n in counts.items()))
+        if self.auto_swap:
+            activate(target.version, target_stores)
+            self._set(status="active")
+
+    def _build(self, plan, source, source_stores, target, target_stores, model):
+        counts = self.state["counts"]
+        source_papers = source.papers() if source is not None else {}
+        rechunk = plan[RECHUNK] + plan[NEW]
+        embed = list(plan[EMBED])
+
+        if plan[COPY]:
+            with ThreadPoolExecutor(max_workers=self.copy_workers, thread_name_prefix="reindex-copy") as pool:
+                copied = pool.map(lambda aid: copy_paper(aid, source_papers[aid], source_stores, target_stores),
+                                  plan[COPY])
+                records = []
+                for arxiv_id, ok in zip(plan[COPY], copied):
+                    if ok:
+                        record = source_papers[arxiv_id]
+                        records.append(paper_record(arxiv_id, record["file_id"], record["content_hash"],
+                                                    record["chunks"], COPY))
+                        counts[COPY] += 1
+                    else:
+                        rechunk.append(arxiv_id)   # source is missing vectors or text for it
+                target.record_papers(records)
+
+        stored = {}
+        for arxiv_id in embed:
+            read = read_paper(arxiv_id, source_papers[arxiv_id], source_stores)
+            if read is None:
+                rechunk.append(arxiv_id)
+            else:
+                stored[arxiv_id] = read[0]
+        if not stored and not rechunk:
+            return
+
+        paper_info = {aid: source_papers[aid] for aid in stored}
+        actions = {aid: EMBED for aid in stored} | {aid: RECHUNK for aid in rechunk}
+
+        def on_paper_done(arxiv_id):
+            info = paper_info[arxiv_id]
+            target.record_papers([paper_record(arxiv_id, info["file_id"], info["content_hash"], info["chunks"],
+                                               actions[arxiv_id])])
+            counts[actions[arxiv_id]] += 1
+
+        paper_chunks = stored.items()
+        if rechunk:
+            from preprocess_pipeline import iter_paper_chunks
+            paper_chunks = chain(paper_chunks, iter_paper_chunks(arxiv_ids=rechunk, paper_info=paper_info))
+        # a failed paper is simply missing from the manifest; the next run (or a resume) retries it
+        _, failed = embed_and_upsert(paper_chunks, store=target_stores["vectors"], model=model,
+                                     on_paper_done=on_paper_done, chunk_store=target_stores["chunks"],
+                                     sparse_index=target_stores["sparse"], clip_store=target_stores.get("clip"))
+        if failed:
+            counts["failed"] += len(failed)
+
+
+def embedding_dimension(model):
+    if hasattr(model, "get_sentence_embedding_dimension"):
+        return int(model.get_sentence_embedding_dimension())
+    return int(len(model.encode(["dimension"])[0]))
+
+
+def read_paper(arxiv_id, record, stores):
+    """
+    (chunk dicts, {id: (vector, metadata)}) of a paper in a version, rebuilt from its chunk store
+    and vector metadata (spans included); None if any chunk is missing.
+    """
+    ids = [f"{arxiv_id}_chunk{i}" for i in range(record["chunks"])]
+    found = stores["vectors"].fetch(ids)
+    chunks = []
+    for i, vid in enumerate(ids):
+        text = stores["chunks"].get(arxiv_id, i)
+        if text is None or vid not in found:
+            return None
+        metadata = found[vid][1]
+        chunk = {"arxiv_id": arxiv_id, "title": metadata.get("title", ""), "chunk_index": i, "chunk": text}
+        chunk.update({field: metadata[field] for field in SPAN_FIELDS if field in metadata})
+        chunks.append(chunk)
+    return chunks, found
+
+
+def copy_paper(arxiv_id, record, source, target):
+    """Copy one paper's vectors, text and BM25 postings between versions; False if the source lacks any."""
+    read = read_paper(arxiv_id, record, source)
+    if read is None:
+        return False
+    chunks, found = read
+    ids = [f"{arxiv_id}_chunk{i}" for i in range(record["chunks"])]
+    copies = [("vectors", found)]
+    if "clip" in target:
+        clip_found = source["clip"].fetch(ids) if "clip" in source else {}
+        if len(clip_found) < len(ids):
+            return False
+        copies.append(("clip", clip_found))
+    target["chunks"].put_many(chunks)
+    target["sparse"].add_paper(arxiv_id, chunks)
+    for part, vectors in copies:
+        target[part].upsert(ids, [vectors[vid][0] for vid in ids], [vectors[vid][1] for vid in ids])
+    return True
+
+
+reindex_job = ReindexJob()
+
+
+def versions_status():
+    return {
+        "active": active_index.status(),
+        "versions": [IndexManifest(version).summary() for version in list_versions()],
+        "reindex": reindex_job.status(),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Versioned, incremental re-indexing")
+    parser.add_argument("command", choices=["plan", "run", "status", "swap"])
+    parser.add_argument("version", nargs="?")
+    args = parser.parse_args()
+
+    if args.command == "plan":
+        config = current_config()
+        source_version = active_version()
+        source = IndexManifest(source_version) if source_version else None
+        print(f"📋 Against {source_version or 'the un-versioned index'}: "
+              f"{plan_summary(plan_reindex(corpus_papers(), source, config))}")
+    elif args.command == "run":
+        try:
+            print(json.dumps(reindex_job.run(), indent=2, default=str))
+        except ReindexBusy as e:
+            print(f"⚠️ {e}")
+    elif args.command == "swap":
+        activate(args.version)
+    else:
+        print(json.dumps(versions_status(), indent=2, default=str))
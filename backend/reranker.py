@@ -0,0 +1,134 @@
+# reranker.py
+# Optional cross-encoder re-ranking of retrieved chunks. Retrieval over-fetches candidates, the
+# cross-encoder scores (query, passage) pairs in batches and the best top_n are kept. Scoring is
+# bounded by a per-request latency budget; when it would run over, the retrieval order is kept.
+import os
+import threading
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+RERANK_ENABLED = os.getenv("RERANK", "0") == "1"
+RERANK_MODEL_NAME = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+# Matches fetched from retrieval for the cross-encoder to choose from
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "30"))
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "16"))
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "250"))
+# Passages are cut to this many characters; the model truncates at 512 tokens anyway
+RERANK_MAX_CHARS = int(os.getenv("RERANK_MAX_CHARS", "2000"))
+
+
+def load_cross_encoder(model_name=RERANK_MODEL_NAME):
+    # imported here so the service does not pull in torch unless re-ranking is enabled
+    from sentence_transformers import CrossEncoder
+    return CrossEncoder(model_name, max_length=512)
+
+
+class CrossEncoderReranker:
+    """
+    rerank(query, passages, top_n) returns indices into `passages`, best first.
+    Before each batch the slowest batch seen so far is used to project whether the next one fits in
+    the budget; if not (or the model raises) the first top_n passages are returned in their original order.
+    The estimate for a request's first batch only moves when a batch runs, so each request refused on
+    it alone halves it: one slow outlier costs a few fallbacks instead of disabling re-ranking for good.
+    """
+
+    def __init__(self, model_fn=load_cross_encoder, batch_size=RERANK_BATCH_SIZE,
+                 budget_ms=RERANK_BUDGET_MS, max_chars=RERANK_MAX_CHARS):
+        self.model_fn = model_fn
+        self.batch_size = batch_size
+        self.budget = budget_ms / 1000
+        self.max_chars = max_chars
+        self._model = None
+        self._load_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._batch_seconds = None      # moving average of one batch, for the first projection
+        self.requests = 0
+        self.reranked = 0
+        self.fallbacks = {"budget": 0, "error": 0}
+        self.candidates = 0
+        self.seconds = 0.0
+
+    # ---------------------- Model ----------------------
+    def get_model(self):
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    self._model = self.model_fn()
+        return self._model
+
+    def loaded(self):
+        return self._model is not None
+
+    def warmup(self):
+        self.get_model().predict([("warmup", "warmup")], show_progress_bar=False)
+
+    # ---------------------- Scoring ----------------------
+    def _score(self, query, passages, deadline):
+        """Scores for every passage, or None as soon as the next batch would miss the deadline."""
+        model = self.get_model()
+        scores = []
+        slowest = self._batch_seconds or 0.0
+        for i in range(0, len(passages), self.batch_size):
+            if time.perf_counter() + slowest > deadline:
+                if i == 0:
+                    with self._lock:
+                        self._batch_seconds = slowest / 2
+                return None
+            start = time.perf_counter()
+            pairs = [(query, passage[:self.max_chars]) for passage in passages[i:i + self.batch_size]]
+            scores.extend(np.asarray(
+                model.predict(pairs, batch_size=self.batch_size, show_progress_bar=False), dtype=np.float32
+            ).ravel())
+            elapsed = time.perf_counter() - start
+            slowest = max(slowest, elapsed)
+            with self._lock:
+                self._batch_seconds = elapsed if self._batch_seconds is None else 0.8 * self._batch_seconds + 0.2 * elapsed
+        if time.perf_counter() > deadline:
+            return None
+        return np.asarray(scores, dtype=np.float32)
+
+    def rerank(self, query, passages, top_n, budget_ms=None):
+        top_n = min(top_n, len(passages))
+        budget = self.budget if budget_ms is None else budget_ms / 1000
+        start = time.perf_counter()
+        reason = None
+        try:
+            self.get_model()
+            start = time.perf_counter()   # a cold load is not charged to the request's budget
+            scores = self._score(query, passages, start + budget)
+            if scores is None:
+                reason = "budget"
+        except Exception as e:
+            print(f"⚠️ Re-ranking failed, keeping retrieval order: {e}")
+            scores, reason = None, "error"
+        if scores is None:
+            order = list(range(top_n))
+        else:
+            # stable, so ties keep their retrieval order
+            order = np.argsort(-scores, kind="stable")[:top_n].tolist()
+        with self._lock:
+            self.requests += 1
+            self.candidates += len(passages)
+            self.seconds += time.perf_counter() - start
+            if reason is None:
+                self.reranked += 1
+            else:
+                self.fallbacks[reason] += 1
+        return order
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": RERANK_ENABLED,
+                "model_loaded": self._model is not None,
+                "budget_ms": self.budget * 1000,
+                "requests": self.requests,
+                "reranked": self.reranked,
+                "fallbacks": dict(self.fallbacks),
+                "mean_candidates": self.candidates / self.requests if self.requests else 0.0,
+                "mean_ms": 1000 * self.seconds / self.requests if self.requests else 0.0,
+                "mean_batch_ms": 1000 * (self._batch_seconds or 0.0),
+            }
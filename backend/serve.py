@@ -0,0 +1,65 @@
+# serve.py
+# Container entry point. WEB_WORKERS=1 runs a single uvicorn process as before. With more workers
+# the embedding model is loaded once in a model server process (model_server.py) and every worker
+# encodes through it over a Unix socket, instead of each worker holding its own copy.
+import os
+import secrets
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+
+import uvicorn
+from dotenv import load_dotenv
+
+load_dotenv()
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "7860"))
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", "1"))
+
+_stopping = threading.Event()
+
+
+def start_model_server():
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    return subprocess.Popen([sys.executable, os.path.join(backend_dir, "model_server.py")], cwd=backend_dir)
+
+
+def watch_model_server(server):
+    """Without the model server no worker can embed; stop uvicorn so the container restarts."""
+    code = server.wait()
+    if not _stopping.is_set():
+        print(f"❌ Model server exited with code {code}, shutting down")
+        os.kill(os.getpid(), signal.SIGTERM)
+
+
+def main():
+    server = socket_dir = None
+    if WEB_WORKERS > 1:
+        # inherited by the model server and by the uvicorn workers spawned below: the socket goes in a
+        # directory only this user can enter (mkdtemp makes it 0700) and the key is new on every start
+        if "EMBED_SERVER" not in os.environ:
+            socket_dir = tempfile.mkdtemp(prefix="athena-embed-")
+            os.environ["EMBED_SERVER"] = os.path.join(socket_dir, "embed.sock")
+        os.environ.setdefault("EMBED_SERVER_AUTHKEY", secrets.token_hex(32))
+        server = start_model_server()
+        threading.Thread(target=watch_model_server, args=(server,), name="model-server-watch", daemon=True).start()
+        print(f"🚀 Starting {WEB_WORKERS} web workers sharing the model server at {os.environ['EMBED_SERVER']}")
+    try:
+        uvicorn.run("app:app", host=HOST, port=PORT, workers=WEB_WORKERS)
+    finally:
+        _stopping.set()
+        if server is not None and server.poll() is None:
+            server.terminate()
+            try:
+                server.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                server.kill()
+        if socket_dir is not None:
+            shutil.rmtree(socket_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
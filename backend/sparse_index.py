@@ -0,0 +1,247 @@
+# sparse_index.py
+# Incremental BM25 inverted index over chunks, run next to the dense search and merged with
+# reciprocal-rank fusion. Exact terms (arXiv ids, acronyms, method names) that the dense model
+# blurs are found here.
+#
+# Persistence is an append-only log with one line per paper; re-adding a paper supersedes its
+# previous line, so per-paper updates never rebuild the whole index.
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+
+from dotenv import load_dotenv
+
+from file_lock import file_lock
+from index_versions import active_path
+
+load_dotenv()
+SPARSE_INDEX_DIR = os.getenv("SPARSE_INDEX_DIR", "sparse_index")
+BM25_K1 = 1.5
+BM25_B = 0.75
+RRF_K = 60
+
+# keeps "2409.12345", "gpt-4", "bert_base" as single terms
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[.\-_][a-z0-9]+)*")
+STOPWORDS = {
+    "a", "an", "the", "of", "in", "on", "for", "to", "and", "or", "is", "are", "was", "were",
+    "be", "by", "with", "as", "at", "it", "its", "this", "that", "these", "those", "from",
+    "what", "how", "why", "when", "which", "who", "does", "do", "can", "explain", "about",
+    "me", "tell", "we", "our", "i", "you", "not", "but", "if", "so", "than", "then",
+}
+
+
+def tokenize(text):
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """rankings: lists of ids, best first. Returns [(id, fused_score)] best first."""
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class SparseIndex:
+    def __init__(self, path=SPARSE_INDEX_DIR):
+        self.path = path
+        self._log_path = os.path.join(path, "papers.jsonl") if path else None
+        self._lock_path = os.path.join(path, ".lock") if path else None
+        self._lock = threading.Lock()
+        self._postings = {}       # term -> {doc_id: tf}
+        self._doc_terms = {}      # doc_id -> Counter of terms
+        self._doc_len = {}        # doc_id -> length in terms
+        self._paper_docs = {}     # arxiv_id -> [doc_id]
+        self._titles = {}         # arxiv_id -> title
+        self._total_len = 0
+        self._log_offset = 0
+        self._log_inode = None
+        self._log_file = None     # the log version being read; kept open so its inode is not reused
+        if path:
+            os.makedirs(path, exist_ok=True)
+            self.refresh()
+
+    def __len__(self):
+        return len(self._doc_len)
+
+    # ---------------------- Updates ----------------------
+    def _remove_paper(self, arxiv_id):
+        for doc_id in self._paper_docs.pop(arxiv_id, []):
+            for term in self._doc_terms.pop(doc_id):
+                postings = self._postings[term]
+                del postings[doc_id]
+                if not postings:
+                    del self._postings[term]
+            self._total_len -= self._doc_len.pop(doc_id)
+        self._titles.pop(arxiv_id, None)
+
+    def _add_docs(self, arxiv_id, title, docs):
+        self._remove_paper(arxiv_id)
+        self._titles[arxiv_id] = title
+        self._paper_docs[arxiv_id] = list(docs)
+        for doc_id, terms in docs.items():
+            counts = Counter(terms)
+            self._doc_terms[doc_id] = counts
+            length = sum(counts.values())
+            self._doc_len[doc_id] = length
+            self._total_len += length
+            for term, tf in counts.items():
+                self._postings.setdefault(term, {})[doc_id] = tf
+
+    def add_paper(self, arxiv_id, chunks):
+        """(Re)index one paper's chunk dicts; replaces whatever was indexed for it before."""
+        title = chunks[0]["title"] if chunks else ""
+        # every chunk also carries the paper's id and title terms
+        paper_terms = [arxiv_id.lower()] + tokenize(title)
+        docs = {
+            f"{arxiv_id}_chunk{c['chunk_index']}": dict(Counter(paper_terms + tokenize(c["chunk"])))
+            for c in chunks
+        }
+        self._append({"arxiv_id": arxiv_id, "title": title, "docs": docs})
+
+    def remove_paper(self, arxiv_id):
+        self._append({"arxiv_id": arxiv_id, "title": "", "docs": {}})
+
+    def _append(self, record):
+        if not self._log_path:
+            with self._lock:
+                self._apply(record)
+            return
+        # the lock keeps lines of concurrent writers (other workers, ingestion) from interleaving
+        with file_lock(self._lock_path):
+            with open(self._log_path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+        # replaying from the log keeps lines written by other processes in order with ours
+        self.refresh()
+
+    def _apply(self, record):
+        if record["docs"]:
+            self._add_docs(record["arxiv_id"], record["title"], record["docs"])
+        else:
+            self._remove_paper(record["arxiv_id"])
+
+    def _reset(self):
+        self._postings, self._doc_terms, self._doc_len = {}, {}, {}
+        self._paper_docs, self._titles = {}, {}
+        self._total_len = 0
+        self._log_offset = 0
+
+    def refresh(self):
+        """
+        Replay log lines written since the last read (e.g. by a separate ingestion process), or
+        the whole log after another process compacted it.
+        """
+        try:
+            stat = os.stat(self._log_path) if self._log_path else None
+        except FileNotFoundError:
+            return
+        if stat is None or (stat.st_ino == self._log_inode and stat.st_size <= self._log_offset):
+            return
+        with self._lock:
+            if stat.st_ino != self._log_inode:
+                if self._log_file is not None:
+                    self._log_file.close()
+                self._log_file = open(self._log_path, "rb")
+                self._log_inode = os.fstat(self._log_file.fileno()).st_ino
+                self._reset()
+            f = self._log_file
+            f.seek(self._log_offset)
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break   # partially written tail, pick it up next time
+                self._log_offset += len(raw)
+                self._apply(json.loads(raw))
+
+    def compact(self):
+        """Rewrite the log with only the current version of each paper."""
+        if not self._log_path:
+            return
+        # holding the writers' lock, catch up first so lines other processes appended are kept
+        with file_lock(self._lock_path):
+            self.refresh()
+            with self._lock:
+                tmp_path = self._log_path + ".tmp"
+                with open(tmp_path, "w") as f:
+                    for arxiv_id, doc_ids in self._paper_docs.items():
+                        docs = {doc_id: dict(self._doc_terms[doc_id]) for doc_id in doc_ids}
+                        f.write(json.dumps({"arxiv_id": arxiv_id, "title": self._titles.get(arxiv_id, ""),
+                                            "docs": docs}) + "\n")
+                os.replace(tmp_path, self._log_path)
+                if self._log_file is not None:
+                    self._log_file.close()
+                self._log_file = open(self._log_path, "rb")
+                stat = os.fstat(self._log_file.fileno())
+                self._log_offset, self._log_inode = stat.st_size, stat.st_ino
+
+    # ---------------------- Search ----------------------
+    def search(self, query, top_k=10):
+        """BM25 top-k as [(doc_id, score)]."""
+        self.refresh()
+        terms = set(tokenize(query))
+        with self._lock:
+            n_docs = len(self._doc_len)
+            if not n_docs or not terms:
+                return []
+            avgdl = self._total_len / n_docs
+            scores = {}
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * self._doc_len[doc_id] / avgdl)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (BM25_K1 + 1) / norm
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+
+    def term_coverage(self, query, doc_id):
+        """Fraction of the query's terms that occur in `doc_id`."""
+        terms = set(tokenize(query))
+        if not terms:
+            return 0.0
+        with self._lock:
+            doc = self._doc_terms.get(doc_id)
+            if doc is None:
+                return 0.0
+            return sum(1 for t in terms if t in doc) / len(terms)
+
+    def title(self, arxiv_id):
+        return self._titles.get(arxiv_id, "")
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_sparse_index():
+    """BM25 index of the active index version."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = SparseIndex(active_path("sparse", SPARSE_INDEX_DIR))
+    return _index
+
+
+def set_sparse_index(index):
+    global _index
+    _index = index
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Maintain the BM25 index")
+    parser.add_argument("command", choices=["stats", "compact"])
+    parser.add_argument("--path", default=SPARSE_INDEX_DIR)
+    args = parser.parse_args()
+
+    index = SparseIndex(args.path)
+    if args.command == "compact":
+        index.compact()
+    size = os.path.getsize(index._log_path) if os.path.exists(index._log_path) else 0
+    print(f"📦 {args.path}: {len(index._paper_docs)} papers, {len(index)} chunks, log {size / 1e6:.1f} MB")
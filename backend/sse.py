@@ -0,0 +1,126 @@
+# sse.py
+# Server-sent event framing for the streaming endpoints. LLM deltas are coalesced into fewer,
+# larger frames (flushed by time, size or at a sentence end) and serialized with orjson. A client
+# that goes away is noticed while waiting on the model, and the token source is closed with it.
+import asyncio
+import os
+import re
+
+import orjson
+from dotenv import load_dotenv
+
+from metrics import Counter
+
+load_dotenv()
+# A frame is flushed this long after its first delta arrived (0 = one frame per delta)
+SSE_COALESCE_MS = float(os.getenv("SSE_COALESCE_MS", "30"))
+SSE_COALESCE_MAX_CHARS = int(os.getenv("SSE_COALESCE_MAX_CHARS", "256"))
+SSE_FLUSH_ON_SENTENCE = os.getenv("SSE_FLUSH_ON_SENTENCE", "1") == "1"
+# How often a stream waiting on the model checks whether its client is still connected
+SSE_DISCONNECT_POLL_MS = float(os.getenv("SSE_DISCONNECT_POLL_MS", "200"))
+
+DONE_FRAME = b"data: [DONE]\n\n"
+# sentence punctuation or a newline, optionally followed by closing quotes/brackets and spaces
+_SENTENCE_END_RE = re.compile(r"(?:[.!?:;]['\")\]]*|\n)\s*$")
+
+SSE_DELTAS = Counter("athena_sse_deltas_total", "LLM deltas received by streaming endpoints")
+SSE_FRAMES = Counter("athena_sse_frames_total", "SSE data frames sent after coalescing")
+SSE_DISCONNECTS = Counter("athena_sse_disconnects_total", "Streams stopped because the client disconnected")
+
+
+def sse_frame(payload):
+    return b"data: " + orjson.dumps(payload) + b"\n\n"
+
+
+async def coalesce(deltas, window_ms=SSE_COALESCE_MS, max_chars=SSE_COALESCE_MAX_CHARS,
+                   sentence_flush=SSE_FLUSH_ON_SENTENCE, is_disconnected=None, poll_ms=SSE_DISCONNECT_POLL_MS):
+    """
+    Regroup an async iterator of text deltas into larger pieces, whitespace kept as is.
+    The first delta goes out immediately so time to first token is unchanged; later ones are held
+    until `window_ms` after the piece started, `max_chars`, or a delta ending a sentence.
+    `is_disconnected` (async, e.g. Request.is_disconnected) is polled every `poll_ms`, whether the
+    stream is idle or busy sending; once it is true the source is cancelled and iteration stops.
+    """
+    loop = asyncio.get_running_loop()
+    window = window_ms / 1000
+    buffer, size = [], 0
+    ready = done = False
+    error = None
+    waiter = timer = None
+
+    def wake():
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+    def window_elapsed():
+        nonlocal ready, timer
+        timer = None
+        ready = True
+        wake()
+
+    async def produce():
+        # one task reads the source for the whole stream; the consumer is woken once per frame
+        nonlocal size, ready, done, error, timer
+        first = True
+        try:
+            async for delta in deltas:
+                if not delta:
+                    continue
+                SSE_DELTAS.inc()
+                buffer.append(delta)
+                size += len(delta)
+                if first or window <= 0 or size >= max_chars or (sentence_flush and _SENTENCE_END_RE.search(delta)):
+                    first = False
+                    ready = True
+                    wake()
+                elif timer is None and not ready:
+                    timer = loop.call_later(window, window_elapsed)
+        except Exception as e:
+            error = e
+        finally:
+            done = True
+            wake()
+
+    poll_every = poll_ms / 1000
+    last_poll = loop.time()
+    producer = asyncio.ensure_future(produce())
+    try:
+        while True:
+            if not ready and not done:
+                waiter = loop.create_future()
+                poll = None
+                if is_disconnected is not None:
+                    poll = loop.call_later(max(0.0, last_poll + poll_every - loop.time()), wake)
+                try:
+                    await waiter
+                finally:
+                    waiter = None
+                    if poll is not None:
+                        poll.cancel()
+            # on a clock, not only when idle: a model streaming steadily always has a frame ready
+            if is_disconnected is not None and loop.time() - last_poll >= poll_every:
+                last_poll = loop.time()
+                if await is_disconnected():
+                    SSE_DISCONNECTS.inc()
+                    return
+            if buffer and (ready or done):
+                piece = "".join(buffer)
+                buffer.clear()
+                size, ready = 0, False
+                if timer is not None:
+                    timer.cancel()
+                    timer = None
+                SSE_FRAMES.inc()
+                yield piece
+                continue
+            if done:
+                if error is not None:
+                    raise error
+                return
+    finally:
+        if timer is not None:
+            timer.cancel()
+        # cancelling the reader unwinds the source generator, which closes the LLM stream
+        if not producer.done():
+            producer.cancel()
+            await asyncio.gather(producer, return_exceptions=True)
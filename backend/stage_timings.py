@@ -0,0 +1,66 @@
+# stage_timings.py
+# Rolling per-stage latency of the query path (embed, retrieve, rerank, prompt, first token, ...).
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+
+class StageTimings:
+    """
+    Keeps the last `window` durations of each stage plus lifetime counts and totals.
+    Use `with timings.time("retrieve"):` or `timings.record("retrieve", seconds)`.
+    Durations are also observed into `histogram` (labelled by stage), and an exception leaving a
+    `time()` block is counted in `errors`, when given.
+    """
+
+    def __init__(self, window=2000, histogram=None, errors=None):
+        self.window = window
+        self.histogram = histogram
+        self.errors = errors
+        self._recent = {}       # stage -> deque of seconds
+        self._count = {}
+        self._total = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            recent = self._recent.get(stage)
+            if recent is None:
+                recent = self._recent[stage] = deque(maxlen=self.window)
+            recent.append(seconds)
+            self._count[stage] = self._count.get(stage, 0) + 1
+            self._total[stage] = self._total.get(stage, 0.0) + seconds
+        if self.histogram is not None:
+            self.histogram.observe(seconds, stage=stage)
+
+    @contextmanager
+    def time(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            if self.errors is not None:
+                self.errors.inc(stage=stage)
+            raise
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def stats(self):
+        """Per stage: lifetime count and mean, p50/p95/p99 over the recent window (milliseconds)."""
+        with self._lock:
+            snapshot = {stage: (np.fromiter(recent, dtype=np.float64), self._count[stage], self._total[stage])
+                        for stage, recent in self._recent.items()}
+        result = {}
+        for stage, (recent, count, total) in snapshot.items():
+            p50, p95, p99 = np.percentile(recent, [50, 95, 99]) * 1000
+            result[stage] = {
+                "count": count,
+                "mean_ms": round(1000 * total / count, 3),
+                "p50_ms": round(float(p50), 3),
+                "p95_ms": round(float(p95), 3),
+                "p99_ms": round(float(p99), 3),
+            }
+        return result
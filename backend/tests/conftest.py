@@ -0,0 +1,8 @@
+# tests/conftest.py
+# Tests import the backend modules by name, as the app and the benchmarks do.
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "benchmarks"))
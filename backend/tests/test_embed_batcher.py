@@ -0,0 +1,58 @@
+# tests/test_embed_batcher.py
+import threading
+
+import numpy as np
+
+from embed_batcher import EmbeddingBatcher
+
+
+class GatedModel:
+    """Blocks in encode until released, so a batch can be filled and a future cancelled mid-batch."""
+
+    def __init__(self, fail=False):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.fail = fail
+
+    def encode(self, texts, **kwargs):
+        self.started.set()
+        self.release.wait(5)
+        if self.fail:
+            raise RuntimeError("encode failed")
+        return np.ones((len(texts), 4), dtype=np.float32)
+
+
+def test_cancelled_future_in_batch_does_not_stop_the_worker():
+    model = GatedModel()
+    batcher = EmbeddingBatcher(lambda: model, max_batch_size=8, max_wait_ms=50, workers=1)
+    try:
+        blocker = batcher.submit("first")
+        model.started.wait(5)
+        # queued behind the running batch; one of them is abandoned before it is collected
+        futures = [batcher.submit(f"text {i}") for i in range(3)]
+        futures[1].cancel()
+        model.release.set()
+        assert blocker.result(5).shape == (4,)
+        assert futures[0].result(5).shape == (4,)
+        assert futures[2].result(5).shape == (4,)
+        assert futures[1].cancelled()
+        # the worker is still alive for later callers
+        assert batcher.submit("later").result(5).shape == (4,)
+    finally:
+        batcher.shutdown()
+
+
+def test_future_resolved_while_encoding_does_not_stop_the_worker():
+    for fail in (False, True):
+        model = GatedModel(fail=fail)
+        batcher = EmbeddingBatcher(lambda: model, max_batch_size=8, max_wait_ms=1, workers=1)
+        try:
+            future = batcher.submit("abandoned")
+            model.started.wait(5)
+            # resolved by someone else while its batch runs; delivering the batch result must not raise
+            future.set_exception(RuntimeError("caller gave up"))
+            model.release.set()
+            model.fail = False
+            assert batcher.submit("later").result(5).shape == (4,)
+        finally:
+            batcher.shutdown()
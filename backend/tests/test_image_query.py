@@ -0,0 +1,14 @@
+# tests/test_image_query.py
+import io
+
+import pytest
+from PIL import Image
+
+from image_query import InvalidImage, decode_image
+
+
+def test_decompression_bomb_is_an_invalid_image():
+    data = io.BytesIO()
+    Image.new("L", (20000, 20000)).save(data, "PNG")
+    with pytest.raises(InvalidImage):
+        decode_image(data.getvalue())
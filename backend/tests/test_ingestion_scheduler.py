@@ -0,0 +1,21 @@
+# tests/test_ingestion_scheduler.py
+import threading
+import time
+
+from ingestion_scheduler import CANCELLED, DONE, RUNNING, IngestionScheduler
+
+
+def test_shutdown_cancels_queued_jobs():
+    release = threading.Event()
+    scheduler = IngestionScheduler(fetch_fn=lambda topic: release.wait(5), index_fn=lambda: None, max_workers=1)
+    running = scheduler.submit("diffusion models")
+    while scheduler.get(running.id)["status"] != RUNNING:
+        time.sleep(0.01)
+    queued = [scheduler.submit(topic) for topic in ("graph neural networks", "protein folding")]
+    scheduler.shutdown(wait=False)
+    release.set()
+    scheduler._executor.shutdown(wait=True)
+    assert scheduler.get(running.id)["status"] == DONE
+    assert all(scheduler.get(job.id)["status"] == CANCELLED for job in queued)
+    assert scheduler.snapshot()["counts"][CANCELLED] == 2
+    assert scheduler.submit("quantum error correction") is None
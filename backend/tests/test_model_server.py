@@ -0,0 +1,33 @@
+# tests/test_model_server.py
+import multiprocessing
+import threading
+
+import numpy as np
+import pytest
+
+from model_server import ModelServer, RemoteEmbedModel
+
+
+class FakeModel:
+    def get_sentence_embedding_dimension(self):
+        return 4
+
+    def encode(self, texts, **kwargs):
+        return np.ones((len(texts), 4), dtype=np.float32)
+
+
+def test_model_server_needs_the_shared_key(tmp_path):
+    with pytest.raises(RuntimeError):
+        RemoteEmbedModel(str(tmp_path / "embed.sock"), authkey=b"")
+
+    address = str(tmp_path / "embed.sock")
+    server = ModelServer(address, FakeModel, authkey=b"secret")
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        assert RemoteEmbedModel(address, authkey=b"secret").encode(["a", "b"]).shape == (2, 4)
+        with pytest.raises(multiprocessing.AuthenticationError):
+            RemoteEmbedModel(address, authkey=b"guess").encode(["a"])
+        # a refused client does not take the listener down
+        assert RemoteEmbedModel(address, authkey=b"secret").encode(["c"]).shape == (1, 4)
+    finally:
+        server.close()
@@ -0,0 +1,64 @@
+# tests/test_mongodb.py
+import pytest
+
+import mongodb
+
+mongomock = pytest.importorskip("mongomock")   # benchmark/test dependency, not a runtime one
+import mongomock.gridfs  # noqa: E402
+
+
+@pytest.fixture
+def arxiv(monkeypatch):
+    mongomock.gridfs.enable_gridfs_integration()
+    mongodb.set_mongo_client(mongomock.MongoClient())
+    mongodb.arxiv_results_cache.clear()
+    monkeypatch.setattr(mongodb.arxiv_results_cache, "path", None)
+    calls = []
+
+    def fake_fetch_arxiv(query, max_results):
+        calls.append(query)
+        return [{"arxiv_id": "2409.00001", "title": "A paper", "abstract": "text", "pdf_url": "http://pdf/1"}]
+
+    monkeypatch.setattr(mongodb, "fetch_arxiv", fake_fetch_arxiv)
+    return calls
+
+
+def test_tags_stay_stale_until_their_papers_are_stored(arxiv, monkeypatch):
+    def failing_download(fs, paper):
+        raise ConnectionError("download failed")
+
+    monkeypatch.setattr(mongodb, "stream_pdf_to_gridfs", failing_download)
+    assert mongodb.upload_tags(["diffusion"]) == []
+    monkeypatch.setattr(mongodb, "stream_pdf_to_gridfs", lambda fs, paper: fs.put(b"%PDF", filename="x.pdf"))
+    assert mongodb.upload_tags(["diffusion"]) == ["2409.00001"]
+    assert len(arxiv) == 2
+    # now fresh: not fetched again
+    assert mongodb.upload_tags(["diffusion"]) == []
+    assert len(arxiv) == 2
+
+
+def test_fresh_count_ignores_duplicate_tags(arxiv, capsys):
+    mongodb.arxiv_results_cache.put("diffusion", [])
+    mongodb.fetch_arxiv_for_tags(["Diffusion", "diffusion", "gans"], fetched={})
+    assert "1 tags fetched recently" in capsys.readouterr().out
+
+
+def test_insert_failures_other_than_duplicates_keep_the_tag_stale(arxiv, monkeypatch):
+    from pymongo.errors import BulkWriteError
+
+    monkeypatch.setattr(mongodb, "stream_pdf_to_gridfs", lambda fs, paper: fs.put(b"%PDF", filename="x.pdf"))
+    collection = type(mongodb.get_db()[mongodb.COLLECTION_NAME])
+    insert_many = collection.insert_many
+    attempts = []
+
+    def insert_failing_once(self, docs, *args, **kwargs):
+        if self.name == mongodb.COLLECTION_NAME:   # GridFS inserts its chunks through this too
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise BulkWriteError({"writeErrors": [{"index": 0, "code": 121, "errmsg": "Document failed validation"}]})
+        return insert_many(self, docs, *args, **kwargs)
+
+    monkeypatch.setattr(collection, "insert_many", insert_failing_once)
+    assert mongodb.upload_tags(["diffusion"]) == []
+    assert mongodb.upload_tags(["diffusion"]) == ["2409.00001"]
+    assert len(arxiv) == 2
@@ -0,0 +1,55 @@
+# tests/test_pinecone_upsert.py
+import json
+
+import numpy as np
+
+import vector_store
+from vector_store import PineconeVectorStore
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.headers = {"Retry-After": "0"} if status_code == 429 else {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(self.status_code)
+
+
+class FakeSession:
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+        self.bodies = []
+
+    def post(self, url, data, timeout):
+        self.bodies.append(json.loads(data))
+        return FakeResponse(self.statuses.pop(0) if self.statuses else 200)
+
+
+def make_store(session):
+    store = PineconeVectorStore.__new__(PineconeVectorStore)
+    store.namespace = "v1"
+    store._session = session
+    store._upsert_url = "https://example/vectors/upsert"
+    return store
+
+
+def test_upsert_is_split_into_requests_within_the_limits(monkeypatch):
+    session = FakeSession([])
+    store = make_store(session)
+    monkeypatch.setattr(store, "UPSERT_BATCH", 10)
+    monkeypatch.setattr(store, "UPSERT_MAX_BYTES", 20_000)
+    n = 35
+    store.upsert([f"id{i}" for i in range(n)], np.random.rand(n, 64), [{"chunk": "x" * 200}] * n)
+    assert [v["id"] for body in session.bodies for v in body["vectors"]] == [f"id{i}" for i in range(n)]
+    assert all(len(body["vectors"]) <= 10 and body["namespace"] == "v1" for body in session.bodies)
+    assert all(len(json.dumps(body)) <= 20_000 for body in session.bodies)
+
+
+def test_rate_limited_upsert_is_retried(monkeypatch):
+    monkeypatch.setattr(vector_store.time, "sleep", lambda seconds: None)
+    session = FakeSession([429, 503])
+    store = make_store(session)
+    store.upsert(["a"], np.ones((1, 4)), [{}])
+    assert len(session.bodies) == 3
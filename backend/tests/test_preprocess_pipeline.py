@@ -0,0 +1,64 @@
+# tests/test_preprocess_pipeline.py
+from concurrent.futures import ThreadPoolExecutor
+
+import preprocess_pipeline
+from preprocess_pipeline import ExtractionCache, _process_in_pool, process_paper
+
+
+def test_a_crashed_task_fails_only_its_paper(monkeypatch):
+    def flaky_process_paper(paper, fs, splitter, split_pages):
+        if paper["arxiv_id"] == "bad":
+            raise RuntimeError("worker died")
+        return paper, [{"chunk": "text"}], None, {"arxiv_id": paper["arxiv_id"], "cached": False}
+
+    monkeypatch.setattr(preprocess_pipeline, "process_paper", flaky_process_paper)
+    papers = [{"arxiv_id": arxiv_id} for arxiv_id in ("a", "bad", "b", "c")]
+    with ThreadPoolExecutor(2) as pool:
+        results = {paper["arxiv_id"]: error for paper, _, error, _ in _process_in_pool(pool, papers, 2)}
+    assert results["a"] is None and results["b"] is None and results["c"] is None
+    assert "worker died" in results["bad"]
+
+
+class FakeGridOut:
+    def __init__(self, data, sha256=None):
+        self.data = data
+        self.reads = 0
+        if sha256:
+            self.sha256 = sha256
+
+    def read(self):
+        self.reads += 1
+        return self.data
+
+
+class FakeFS:
+    def __init__(self, grid_out):
+        self.grid_out = grid_out
+
+    def get(self, file_id):
+        return self.grid_out
+
+
+class FakeSplitter:
+    def split_text(self, text):
+        return [text]
+
+
+def test_cache_hit_on_the_stored_hash_skips_reading_the_pdf(monkeypatch, tmp_path):
+    cache = ExtractionCache(str(tmp_path))
+    monkeypatch.setattr(preprocess_pipeline, "extraction_cache", cache)
+    pdf = b"%PDF-1.4 not really"
+    content_hash = ExtractionCache.content_hash(pdf)
+    cache.put(content_hash, "extracted text")
+    paper = {"arxiv_id": "x", "title": "t", "file_id": 1}
+
+    grid_out = FakeGridOut(pdf, sha256=content_hash)
+    _, chunks, error, timing = process_paper(paper, FakeFS(grid_out), FakeSplitter())
+    assert error is None and timing["cached"] and grid_out.reads == 0
+    assert chunks[0]["chunk"] == "extracted text"
+
+    # files uploaded without a stored hash are still read and hashed
+    legacy = FakeGridOut(pdf)
+    _, chunks, error, timing = process_paper(paper, FakeFS(legacy), FakeSplitter())
+    assert error is None and timing["cached"] and legacy.reads == 1
+    assert timing["content_hash"] == content_hash
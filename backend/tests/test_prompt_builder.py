@@ -0,0 +1,30 @@
+# tests/test_prompt_builder.py
+from prompt_builder import context_passages
+
+
+class PartialChunkStore:
+    """Holds some chunks of one paper; the others fall back to the metadata snippet."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def get(self, arxiv_id, index):
+        return self.chunks.get(index)
+
+    def last_chunk_index(self, arxiv_id, index):
+        return 2
+
+
+def test_snippet_fallback_is_stitched_by_text_not_span():
+    text = "alpha beta gamma delta epsilon zeta eta theta iota kappa lambda mu"
+    bounds = [(0, 28), (17, 50), (39, len(text))]
+    chunks = [text[start:end] for start, end in bounds]
+    matches = [{"metadata": {"arxiv_id": "p", "title": "T", "chunk_index": i, "char_start": start,
+                             "char_end": end, "snippet": chunks[i][:20]}}
+               for i, (start, end) in enumerate(bounds)]
+    store = PartialChunkStore({0: chunks[0], 2: chunks[2]})
+    [(_, _, passage)] = context_passages(matches, store)
+    # chunk 1 is only its 20-char snippet; cutting chunk 2 at chunk 1's span end would drop
+    # " theta iota", which the snippet never contained
+    assert passage.startswith(chunks[0])
+    assert passage.endswith(chunks[2])
@@ -0,0 +1,44 @@
+# tests/test_query_cache.py
+import time
+
+import numpy as np
+
+from query_cache import SemanticAnswerCache
+
+
+def unit(seed, dim=8):
+    vec = np.random.default_rng(seed).normal(size=dim).astype(np.float32)
+    return vec / np.linalg.norm(vec)
+
+
+def test_stale_answer_is_replaced_not_duplicated():
+    cache = SemanticAnswerCache(max_entries=10, max_distance=0.05)
+    query = unit(0)
+    cache.store(query, ["old"], ["a_chunk0"])
+    entry = cache.lookup(query)
+    # revalidation found other chunks: the entry goes and the fresh answer takes its place
+    cache.record_stale(entry)
+    cache.store(query, ["new"], ["b_chunk0"])
+    assert cache.stats()["entries"] == 1
+    assert cache.lookup(query).tokens == ["new"]
+
+
+def test_store_replaces_near_duplicates_in_the_same_scope_only():
+    cache = SemanticAnswerCache(max_entries=10, max_distance=0.05)
+    query = unit(0)
+    cache.store(query, ["a"], [], scope="10:1000")
+    cache.store(query, ["b"], [], scope="5:300")
+    cache.store(query, ["c"], [], scope="10:1000")
+    cache.store(unit(1), ["other"], [], scope="10:1000")
+    assert cache.stats()["entries"] == 3
+    assert cache.lookup(query, scope="10:1000").tokens == ["c"]
+    assert cache.lookup(query, scope="5:300").tokens == ["b"]
+
+
+def test_store_prunes_expired_entries():
+    cache = SemanticAnswerCache(max_entries=10, ttl_seconds=0.01)
+    cache.store(unit(0), ["a"], [])
+    cache.store(unit(1), ["b"], [])
+    time.sleep(0.02)
+    cache.store(unit(2), ["c"], [])
+    assert cache.stats()["entries"] == 1
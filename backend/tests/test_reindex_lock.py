@@ -0,0 +1,22 @@
+# tests/test_reindex_lock.py
+import threading
+
+import pytest
+
+import reindex
+
+
+def test_second_build_is_refused_while_one_holds_the_lock(monkeypatch, tmp_path):
+    monkeypatch.setattr(reindex, "REINDEX_LOCK_PATH", str(tmp_path / "reindex.lock"))
+    release = threading.Event()
+    monkeypatch.setattr(reindex.ReindexJob, "_execute", lambda self: release.wait(5))
+    # separate jobs stand in for separate web workers: each has its own lock descriptor
+    first, second = reindex.ReindexJob(), reindex.ReindexJob()
+    assert first.start()
+    assert not second.start()
+    with pytest.raises(reindex.ReindexBusy):
+        second.run()
+    release.set()
+    first._thread.join(5)
+    assert second.start()
+    second._thread.join(5)
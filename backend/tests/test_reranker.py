@@ -0,0 +1,38 @@
+# tests/test_reranker.py
+import time
+
+import numpy as np
+
+from reranker import CrossEncoderReranker
+
+
+class SlowOnceModel:
+    """Cross-encoder stub: the first `slow_calls` predicts take `slow_s`, later ones are instant."""
+
+    def __init__(self, slow_calls=1, slow_s=0.3):
+        self.slow_calls = slow_calls
+        self.slow_s = slow_s
+        self.calls = 0
+
+    def predict(self, pairs, **kwargs):
+        self.calls += 1
+        if self.calls <= self.slow_calls:
+            time.sleep(self.slow_s)
+        # prefer later passages, so a re-ranked order differs from the retrieval order
+        return np.asarray([len(passage) for _, passage in pairs], dtype=np.float32)
+
+
+def test_reranking_recovers_after_one_slow_batch():
+    model = SlowOnceModel(slow_calls=1, slow_s=0.3)
+    reranker = CrossEncoderReranker(lambda: model, batch_size=4, budget_ms=50)
+    passages = ["p" * (i + 1) for i in range(4)]
+
+    # the slow batch blows the budget and pushes the batch estimate far above it
+    assert reranker.rerank("q", passages, 2) == [0, 1]
+    assert reranker.stats()["mean_batch_ms"] > 50
+
+    orders = [reranker.rerank("q", passages, 2) for _ in range(10)]
+    assert orders[-1] == [3, 2]
+    stats = reranker.stats()
+    assert stats["reranked"] >= 5
+    assert stats["mean_batch_ms"] < 50
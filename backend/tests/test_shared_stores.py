@@ -0,0 +1,156 @@
+# tests/test_shared_stores.py
+# Several processes writing one store (web workers, ingestion) must neither corrupt it nor hide
+# each other's writes from readers.
+import multiprocessing
+import os
+
+import numpy as np
+import pytest
+
+from chunk_store import ChunkStore
+from sparse_index import SparseIndex
+from vector_store import LocalVectorStore
+
+DIM = 16
+PAPERS = 60
+
+
+def write_papers(root, writer, dtype):
+    vectors = LocalVectorStore(os.path.join(root, "vectors"), DIM, dtype=dtype)
+    chunks = ChunkStore(os.path.join(root, "chunks"))
+    sparse = SparseIndex(os.path.join(root, "sparse"))
+    rng = np.random.default_rng(writer)
+    for i in range(PAPERS):
+        arxiv_id = f"w{writer}.{i}"
+        ids = [f"{arxiv_id}_chunk{j}" for j in range(3)]
+        vectors.upsert(ids, rng.normal(size=(3, DIM)).astype(np.float32), [{"writer": writer}] * 3)
+        chunks.put_many([{"arxiv_id": arxiv_id, "chunk_index": j, "chunk": f"{arxiv_id} text {j} " * 4} for j in range(3)])
+        sparse.add_paper(arxiv_id, [{"title": "t", "chunk": f"writer{writer} paper{i}", "chunk_index": 0}])
+
+
+@pytest.mark.parametrize("dtype", ["float32", "int8"])
+def test_concurrent_writers_and_a_live_reader(tmp_path, dtype):
+    root = str(tmp_path)
+    reader = LocalVectorStore(os.path.join(root, "vectors"), DIM, dtype=dtype)
+    ctx = multiprocessing.get_context("spawn")
+    writers = [ctx.Process(target=write_papers, args=(root, w, dtype)) for w in range(3)]
+    for p in writers:
+        p.start()
+    for p in writers:
+        p.join()
+        assert p.exitcode == 0
+
+    reopened = LocalVectorStore(os.path.join(root, "vectors"))
+    assert len(reopened) == 3 * PAPERS * 3
+    # the reader opened before any write sees every row on its next query
+    assert len(reader.query(np.ones(DIM), top_k=5)["matches"]) == 5
+    assert len(reader) == len(reopened)
+    ids = [f"w{w}.{i}_chunk{j}" for w in range(3) for i in range(0, PAPERS, 7) for j in range(3)]
+    live, fresh = reader.fetch(ids), reopened.fetch(ids)
+    for vid in ids:
+        assert np.allclose(live[vid][0], fresh[vid][0])
+        assert fresh[vid][1]["writer"] == int(vid[1])
+
+    chunks = ChunkStore(os.path.join(root, "chunks"))
+    assert len(chunks) == 3 * PAPERS * 3
+    assert chunks.get("w2.17", 1) == "w2.17 text 1 " * 4
+    sparse = SparseIndex(os.path.join(root, "sparse"))
+    assert len(sparse) == 3 * PAPERS
+    assert sparse.search("writer1 paper42")[0][0] == "w1.42_chunk0"
+
+
+@pytest.mark.parametrize("dtype", ["float32", "int8"])
+def test_search_during_upserts_in_the_same_process(tmp_path, dtype):
+    import threading
+
+    store = LocalVectorStore(str(tmp_path), DIM, dtype=dtype)
+    rng = np.random.default_rng(0)
+    store.upsert([f"seed{i}" for i in range(200)], rng.normal(size=(200, DIM)).astype(np.float32), [{}] * 200)
+    store.build_ivf(n_lists=8)
+    done, errors = threading.Event(), []
+
+    def search_loop():
+        query = rng.normal(size=DIM).astype(np.float32)
+        while not done.is_set():
+            try:
+                store.search(query, top_k=5, nprobe=0)
+                store.search(query, top_k=5, nprobe=8)
+            except Exception as e:
+                errors.append(e)
+                return
+
+    readers = [threading.Thread(target=search_loop) for _ in range(2)]
+    for t in readers:
+        t.start()
+    for i in range(300):
+        store.upsert([f"new{i}", f"seed{i % 200}"], rng.normal(size=(2, DIM)).astype(np.float32), [{}] * 2)
+    done.set()
+    for t in readers:
+        t.join()
+    assert not errors
+    assert len(store) == 500
+
+
+def test_sparse_compaction_keeps_other_writers_lines(tmp_path):
+    first, second = SparseIndex(str(tmp_path)), SparseIndex(str(tmp_path))
+    for i in range(20):
+        first.add_paper(f"p{i}", [{"title": "t", "chunk": f"revision one of paper{i}", "chunk_index": 0}])
+        first.add_paper(f"p{i}", [{"title": "t", "chunk": f"revision two of paper{i}", "chunk_index": 0}])
+    second.refresh()
+    second.add_paper("late", [{"title": "t", "chunk": "written by another worker", "chunk_index": 0}])
+    first.compact()   # first has not read "late" yet
+    assert first.search("another worker")[0][0] == "late_chunk0"
+    # the compacted log is shorter than second's offset; it must reload rather than seek into it
+    first.add_paper("after", [{"title": "t", "chunk": "appended after compaction", "chunk_index": 0}])
+    second.refresh()
+    assert len(second) == len(first) == 22
+    assert second.search("revision paper3")[0][0] == "p3_chunk0"
+
+
+def test_query_resolves_rows_from_the_scanned_snapshot(tmp_path):
+    store = LocalVectorStore(str(tmp_path), DIM)
+    rng = np.random.default_rng(1)
+    for _ in range(2):   # the second pass supersedes every row, so compaction renumbers them all
+        ids = [f"v{i}" for i in range(50)]
+        store.upsert(ids, rng.normal(size=(50, DIM)).astype(np.float32), [{"id": vid} for vid in ids])
+    snapshot = store._snapshot
+
+    def snapshot_then_compact():
+        # a reload (compaction here or in another process) lands between the scan and the lookup
+        view = snapshot()
+        store.compact()
+        return view
+
+    store._snapshot = snapshot_then_compact
+    matches = store.query(rng.normal(size=DIM).astype(np.float32), top_k=10)["matches"]
+    assert len(matches) == 10
+    assert all(match["metadata"]["id"] == match["id"] for match in matches)
+
+
+@pytest.mark.parametrize("crash_in", ["_write_manifest", "_remove_stale_generations"])
+def test_compaction_that_dies_leaves_a_consistent_index(tmp_path, monkeypatch, crash_in):
+    store = LocalVectorStore(str(tmp_path), DIM, dtype="int8")
+    rng = np.random.default_rng(3)
+    for _ in range(2):
+        ids = [f"v{i}" for i in range(40)]
+        store.upsert(ids, rng.normal(size=(40, DIM)).astype(np.float32), [{"id": vid} for vid in ids])
+    expected = {vid: vector for vid, (vector, _) in store.fetch(ids).items()}
+
+    def crash(*args):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(LocalVectorStore, crash_in, crash)
+    with pytest.raises(KeyboardInterrupt):
+        store.compact()
+    monkeypatch.undo()
+
+    reopened = LocalVectorStore(str(tmp_path), DIM)
+    assert len(reopened) == 40
+    for vid, (vector, metadata) in reopened.fetch(ids).items():
+        assert metadata["id"] == vid
+        np.testing.assert_allclose(vector, expected[vid])
+    reopened.compact()
+    assert len(reopened._ids) == 40
+    # only the current generation's files are left
+    g = reopened._generation
+    assert sorted(os.listdir(tmp_path)) == [".lock", "manifest.json", f"rows.{g}.jsonl", f"scales.{g}.bin", f"vectors.{g}.bin"]
@@ -0,0 +1,30 @@
+# tests/test_sse.py
+import asyncio
+
+from sse import coalesce
+
+
+def test_busy_stream_stops_when_the_client_disconnects():
+    produced = []
+
+    async def endless_deltas():
+        while True:
+            await asyncio.sleep(0.001)
+            produced.append(1)
+            yield "token. "   # every delta ends a sentence, so a frame is always ready
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        gone_at = loop.time() + 0.1
+
+        async def is_disconnected():
+            return loop.time() >= gone_at
+
+        frames = 0
+        async for _ in coalesce(endless_deltas(), is_disconnected=is_disconnected, poll_ms=20):
+            frames += 1
+        return frames
+
+    frames = asyncio.run(asyncio.wait_for(run(), 5))
+    assert frames > 0
+    assert len(produced) < 1000   # stopped within a poll or two of the disconnect, not at the timeout
@@ -0,0 +1,16 @@
+# tests/test_warmup.py
+import asyncio
+
+import rag_pipeline
+
+
+def test_failed_warmup_is_retried_until_ready(monkeypatch):
+    attempts = []
+
+    def flaky_warmup():
+        attempts.append(1)
+        return len(attempts) >= 3
+
+    monkeypatch.setattr(rag_pipeline, "warmup", flaky_warmup)
+    asyncio.run(asyncio.wait_for(rag_pipeline.warmup_until_ready(retry_seconds=0.01, max_retry_seconds=0.02), 5))
+    assert len(attempts) == 3
@@ -0,0 +1,688 @@
+# vector_store.py
+# Vector store backends shared by ingestion and querying.
+# Every backend exposes the same calls:
+#   upsert(ids, embeddings, metadatas)              embeddings: contiguous (n, dim) float32 array
+#   query(vector, top_k, include_metadata=True)  -> {"matches": [{"id", "score", "metadata"}]}
+#   await aquery(...)                              non-blocking query for the async /search path
+#   fetch(ids)                                   -> {id: (vector, metadata)}, used to copy between index versions
+#   await aclose()
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+
+import numpy as np
+import orjson
+from dotenv import load_dotenv
+
+from file_lock import file_lock
+from index_versions import active_version, version_dimension, version_path
+
+load_dotenv()
+PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
+INDEX_NAME = "arxiv-papers"
+DIMENSION = 768
+VECTOR_STORE = os.getenv("VECTOR_STORE", "pinecone")
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", "local_index")
+LOCAL_INDEX_DTYPE = os.getenv("LOCAL_INDEX_DTYPE", "float32")   # float32 | float16 | int8
+LOCAL_INDEX_NPROBE = int(os.getenv("LOCAL_INDEX_NPROBE", "0"))   # 0 = exact search
+# Data-plane API version of the pinned SDK (pinecone==7.3.0); sent with every hand-built request
+PINECONE_API_VERSION = os.getenv("PINECONE_API_VERSION", "2025-04")
+PINECONE_UPSERT_RETRIES = int(os.getenv("PINECONE_UPSERT_RETRIES", "5"))
+
+
+def normalize_rows(embeddings):
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings / np.where(norms == 0, 1, norms)
+
+
+def quantize_rows(unit_rows, dtype):
+    """
+    Unit float32 rows -> (rows stored as `dtype`, per-row float32 scales or None).
+    int8 is symmetric per row: row ~= int8_row * scale, with the largest component mapped to 127.
+    """
+    dtype = np.dtype(dtype)
+    if dtype != np.int8:
+        return unit_rows.astype(dtype, copy=False), None
+    scales = np.abs(unit_rows).max(axis=1) / 127
+    scales[scales == 0] = 1
+    quantized = np.rint(unit_rows / scales[:, None]).astype(np.int8)
+    return quantized, scales.astype(np.float32)
+
+
+def dequantize_rows(rows, scales=None):
+    out = np.asarray(rows, dtype=np.float32)
+    if scales is not None:
+        out = out * scales[:, None]
+    return out
+
+
+def top_k_indices(scores, k):
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+# ---------------------- Pinecone ----------------------
+class PineconeVectorStore:
+    FETCH_BATCH = 1000   # ids per fetch call, the API limit
+    UPSERT_BATCH = 1000             # vectors per upsert request, the API limit
+    UPSERT_MAX_BYTES = 2_000_000    # request body limit is 2 MB
+    RETRY_STATUS = {429, 500, 502, 503, 504}
+
+    def __init__(self, index_name=INDEX_NAME, dimension=DIMENSION, api_key=PINECONE_API_KEY, namespace=""):
+        from pinecone import Pinecone, ServerlessSpec   # client import is slow; only pay for it when used
+
+        self.index_name = index_name
+        self.namespace = namespace   # one namespace per index version (see index_versions.py)
+        self.pc = Pinecone(api_key=api_key)
+        if index_name not in self.pc.list_indexes().names():
+            self.pc.create_index(
+                name=index_name,
+                dimension=dimension,
+                metric="cosine",
+                spec=ServerlessSpec(cloud="aws", region="us-east-1"),
+            )
+        self.api_key = api_key
+        self.index = self.pc.Index(index_name)
+        self._upsert_url = None
+        self._session = None
+        # asyncio index handle owns an aiohttp session, so it is opened inside the event loop
+        self._async_index = None
+        self._async_lock = asyncio.Lock()
+
+    def upsert(self, ids, embeddings, metadatas):
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        # orjson writes each row from the array buffer straight into the REST request body,
+        # with no per-float Python objects (the SDK path needs values as Python lists)
+        rows = [
+            orjson.dumps({"id": vid, "values": embeddings[i], "metadata": meta}, option=orjson.OPT_SERIALIZE_NUMPY)
+            for i, (vid, meta) in enumerate(zip(ids, metadatas))
+        ]
+        for batch in self._upsert_batches(rows):
+            self._post_upsert(b'{"vectors":[' + b",".join(batch) + b'],"namespace":'
+                              + orjson.dumps(self.namespace) + b"}")
+
+    def _upsert_batches(self, rows):
+        """Split serialized rows into requests within the vector-count and body-size limits."""
+        batch, size = [], 0
+        for row in rows:
+            if len(row) + 64 > self.UPSERT_MAX_BYTES:
+                raise ValueError(f"Vector record of {len(row)} bytes exceeds the Pinecone request limit")
+            if batch and (len(batch) >= self.UPSERT_BATCH or size + len(row) + 64 > self.UPSERT_MAX_BYTES):
+                yield batch
+                batch, size = [], 0
+            batch.append(row)
+            size += len(row) + 1
+        if batch:
+            yield batch
+
+    def _post_upsert(self, body):
+        """POST one upsert, retrying rate limits and server errors with exponential backoff."""
+        session = self._rest_session()
+        delay = 1.0
+        for attempt in range(PINECONE_UPSERT_RETRIES + 1):
+            try:
+                response = session.post(self._upsert_url, data=body, timeout=60)
+            except (ConnectionError, TimeoutError, OSError) as e:
+                if attempt == PINECONE_UPSERT_RETRIES:
+                    raise
+                print(f"⚠️ Pinecone upsert failed ({e}), retrying in {delay:.0f}s")
+            else:
+                if response.status_code not in self.RETRY_STATUS or attempt == PINECONE_UPSERT_RETRIES:
+                    response.raise_for_status()
+                    return
+                retry_after = response.headers.get("Retry-After", "")
+                delay = float(retry_after) if retry_after.isdigit() else delay
+                print(f"⚠️ Pinecone upsert returned {response.status_code}, retrying in {delay:.0f}s")
+            time.sleep(delay)
+            delay = min(delay * 2, 30.0)
+
+    def _rest_session(self):
+        if self._session is None:
+            import requests
+
+            host = self.pc.describe_index(self.index_name).host
+            self._upsert_url = f"https://{host}/vectors/upsert"
+            session = requests.Session()
+            session.headers.update({"Api-Key": self.api_key, "Content-Type": "application/json",
+                                    "X-Pinecone-API-Version": PINECONE_API_VERSION})
+            self._session = session
+        return self._session
+
+    def query(self, vector, top_k=10, include_metadata=True):
+        return self.index.query(vector=vector, top_k=top_k, include_metadata=include_metadata,
+                                namespace=self.namespace)
+
+    def fetch(self, ids):
+        """{id: (float32 vector, metadata)} for the ids that exist."""
+        found = {}
+        for start in range(0, len(ids), self.FETCH_BATCH):
+            response = self.index.fetch(ids=list(ids[start:start + self.FETCH_BATCH]), namespace=self.namespace)
+            for vid, vector in response.vectors.items():
+                found[vid] = (np.asarray(vector.values, dtype=np.float32), dict(vector.metadata or {}))
+        return found
+
+    async def _get_async_index(self):
+        if self._async_index is None:
+            async with self._async_lock:
+                if self._async_index is None:
+                    # describe_index is a blocking HTTP call, only done once
+                    description = await asyncio.to_thread(self.pc.describe_index, self.index_name)
+                    self._async_index = self.pc.IndexAsyncio(host=description.host)
+        return self._async_index
+
+    async def aquery(self, vector, top_k=10, include_metadata=True):
+        async_index = await self._get_async_index()
+        return await async_index.query(vector=vector, top_k=top_k, include_metadata=include_metadata,
+                                       namespace=self.namespace)
+
+    async def aclose(self):
+        if self._async_index is not None:
+            await self._async_index.close()
+            self._async_index = None
+
+
+class _ThreadedAsyncMixin:
+    """Local backends are CPU-bound NumPy; run them off the event loop (matmul releases the GIL)."""
+
+    async def aquery(self, vector, top_k=10, include_metadata=True):
+        return await asyncio.to_thread(self.query, vector, top_k, include_metadata)
+
+    async def aclose(self):
+        pass
+
+
+# ---------------------- In-memory (tests / benchmarks) ----------------------
+class InMemoryVectorStore(_ThreadedAsyncMixin):
+    """Exact cosine search over a growable NumPy matrix. Upserting an existing id overwrites it."""
+
+    def __init__(self, dimension=DIMENSION):
+        self.dimension = dimension
+        self._buffer = np.zeros((1024, dimension), dtype=np.float32)   # grows by doubling
+        self._vectors = self._buffer[:0]
+        self._ids = []
+        self._metadata = []
+        self._positions = {}
+        self._lock = threading.Lock()
+        self.upsert_calls = 0
+
+    def __len__(self):
+        return len(self._ids)
+
+    def upsert(self, ids, embeddings, metadatas):
+        embeddings = normalize_rows(embeddings)
+        with self._lock:
+            self.upsert_calls += 1
+            base = len(self._ids)
+            target = np.empty(len(ids), dtype=np.int64)   # row each embedding lands in
+            for i, (vid, meta) in enumerate(zip(ids, metadatas)):
+                pos = self._positions.get(vid)
+                if pos is None:
+                    pos = self._positions[vid] = len(self._ids)
+                    self._ids.append(vid)
+                    self._metadata.append(meta)
+                else:
+                    self._metadata[pos] = meta
+                target[i] = pos
+            n = len(self._ids)
+            if n > len(self._buffer):
+                grown = np.zeros((max(n, 2 * len(self._buffer)), self.dimension), dtype=np.float32)
+                grown[:base] = self._buffer[:base]
+                self._buffer = grown
+            # later duplicates in the batch win, as with sequential upserts
+            self._buffer[target] = embeddings
+            self._vectors = self._buffer[:n]
+
+    def query(self, vector, top_k=10, include_metadata=True):
+        query = np.asarray(vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1)
+        with self._lock:
+            if not self._ids:
+                return {"matches": []}
+            scores = self._vectors @ query
+            return {
+                "matches": [
+                    {
+                        "id": self._ids[i],
+                        "score": float(scores[i]),
+                        "metadata": self._metadata[i] if include_metadata else {},
+                    }
+                    for i in top_k_indices(scores, top_k)
+                ]
+            }
+
+    def fetch(self, ids):
+        """{id: (float32 vector, metadata)} for the ids that exist."""
+        with self._lock:
+            rows = [(vid, self._positions[vid]) for vid in ids if vid in self._positions]
+            return {vid: (self._vectors[pos].copy(), self._metadata[pos]) for vid, pos in rows}
+
+
+# ---------------------- Local memory-mapped index ----------------------
+class LocalVectorStore(_ThreadedAsyncMixin):
+    """
+    On-disk index in `path/`:
+      manifest.json   dimension + dtype (float32, float16 or int8) + current file generation
+      vectors.bin     append-only row-major matrix of unit vectors, memory-mapped for search
+      scales.bin      int8 only: float32 per-row scale, row ~= int8 row * scale (see quantize_rows)
+      rows.jsonl      one {"id", "metadata"} line per row, same order as vectors.bin
+      ivf.npz         optional IVF centroids + row assignments (see build_ivf)
+      .lock           held by writers, so several processes can upsert into one index
+    Re-upserting an id appends a new row and hides the old one; compact() rewrites without them
+    into the next generation of files (vectors.<n>.bin, ...), which replacing manifest.json
+    switches to in one step, so a crash mid-compaction leaves the previous generation intact.
+    Readers pick up rows appended by other processes on their next query.
+    Search is exact (blocked matmul over the mmap) unless nprobe > 0 and an IVF has been built.
+    """
+
+    BLOCK_ROWS = 65536
+    UPCAST_ROWS = 4096    # float16/int8 rows converted per step, small enough to stay in cache
+
+    def __init__(self, path=LOCAL_INDEX_DIR, dimension=DIMENSION, dtype=LOCAL_INDEX_DTYPE, nprobe=LOCAL_INDEX_NPROBE):
+        self.path = path
+        self.nprobe = nprobe
+        os.makedirs(path, exist_ok=True)
+        self._manifest_path = os.path.join(path, "manifest.json")
+        self._lock_path = os.path.join(path, ".lock")
+        if not os.path.exists(self._manifest_path):
+            with file_lock(self._lock_path):
+                if not os.path.exists(self._manifest_path):
+                    self._write_manifest({"dimension": dimension, "dtype": np.dtype(dtype).name, "generation": 0})
+        with open(self._manifest_path) as f:
+            manifest = json.load(f)
+        self.dimension = manifest["dimension"]
+        self.dtype = np.dtype(manifest["dtype"])
+        self.quantized = self.dtype == np.int8
+        self._use_generation(manifest.get("generation", 0))
+        self._row_bytes = self.dimension * self.dtype.itemsize
+        self._lock = threading.Lock()
+        self._manifest_file = None
+        self._load()
+
+    # ----- files -----
+    _GENERATION_FILE = re.compile(r"^(vectors|scales|rows|ivf)(?:\.(\d+))?\.(bin|jsonl|npz)$")
+
+    def _files(self, generation):
+        suffix = f".{generation}" if generation else ""
+        return {name: os.path.join(self.path, f"{name}{suffix}.{ext}")
+                for name, ext in (("vectors", "bin"), ("scales", "bin"), ("rows", "jsonl"), ("ivf", "npz"))}
+
+    def _use_generation(self, generation):
+        self._generation = generation
+        files = self._files(generation)
+        self._vectors_path, self._scales_path = files["vectors"], files["scales"]
+        self._rows_path, self._ivf_path = files["rows"], files["ivf"]
+
+    def _write_manifest(self, manifest):
+        """Replace manifest.json in one step (callers hold the file lock)."""
+        tmp_path = f"{self._manifest_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._manifest_path)
+
+    # ----- loading -----
+    def _stored_rows(self):
+        """Rows whose vector (and scale) is fully on disk."""
+        stored = os.path.getsize(self._vectors_path) // self._row_bytes if os.path.exists(self._vectors_path) else 0
+        if self.quantized:
+            scales = os.path.getsize(self._scales_path) // 4 if os.path.exists(self._scales_path) else 0
+            stored = min(stored, scales)
+        return stored
+
+    def _read_rows(self, offset, limit):
+        """Up to `limit` complete rows.jsonl lines from byte `offset`: (ids, metadatas, end offset)."""
+        ids, metadatas = [], []
+        if limit > 0 and os.path.exists(self._rows_path):
+            with open(self._rows_path, "rb") as f:
+                f.seek(offset)
+                for raw in f:
+                    if len(ids) >= limit or not raw.endswith(b"\n"):
+                        break   # torn write at the tail
+                    try:
+                        row = json.loads(raw)
+                    except ValueError:
+                        break
+                    ids.append(row["id"])
+                    metadatas.append(row["metadata"])
+                    offset += len(raw)
+        return ids, metadatas, offset
+
+    def _load(self):
+        """Load the generation manifest.json points at; again if a compaction swapped it meanwhile."""
+        while True:
+            # kept open while loaded: the inode cannot be reused by a later manifest, so an inode
+            # change reliably means another process compacted
+            f = open(self._manifest_path)
+            inode = os.fstat(f.fileno()).st_ino
+            self._use_generation(json.load(f).get("generation", 0))
+            try:
+                self._load_generation()
+            except FileNotFoundError:   # deleted by the compaction that replaced it
+                pass
+            if os.stat(self._manifest_path).st_ino == inode:
+                if self._manifest_file is not None:
+                    self._manifest_file.close()
+                self._manifest_file, self._manifest_inode = f, inode
+                return
+            f.close()
+
+    def _load_generation(self):
+        # vectors are written before their rows line, so rows are capped by what is on disk
+        self._ids, self._metadata, self._rows_offset = self._read_rows(0, self._stored_rows())
+        n = len(self._ids)
+        self._positions = {}
+        self._alive = np.zeros(n, dtype=bool)
+        for pos, vid in enumerate(self._ids):
+            old = self._positions.get(vid)
+            if old is not None:
+                self._alive[old] = False
+            self._positions[vid] = pos
+            self._alive[pos] = True
+        self._remap(n)
+        self._load_ivf()
+
+    def _remap(self, n):
+        if n:
+            self._vectors = np.memmap(self._vectors_path, dtype=self.dtype, mode="r", shape=(n, self.dimension))
+        else:
+            self._vectors = np.zeros((0, self.dimension), dtype=self.dtype)
+        self._scales = None
+        if self.quantized:
+            self._scales = (np.memmap(self._scales_path, dtype=np.float32, mode="r", shape=(n,))
+                            if n else np.zeros(0, dtype=np.float32))
+
+    def _snapshot(self):
+        """
+        Consistent view for a lock-free scan. Appends replace `_vectors`, `_scales` and `_alive`
+        and grow the IVF lists one after another, so they are read together under the lock
+        (the lists are copied: they are extended in place). `_ids` and `_metadata` only grow in
+        place or are replaced by a reload, so the captured lists resolve the scanned rows.
+        """
+        with self._lock:
+            lists = None if self._lists is None else list(self._lists)
+            return self._vectors, self._scales, self._alive, lists, self._centroids, self._ids, self._metadata
+
+    def _decode(self, rows):
+        """float32 copies of the given rows (index array or slice)."""
+        return dequantize_rows(self._vectors[rows], None if self._scales is None else self._scales[rows])
+
+    def _load_ivf(self):
+        self._centroids, self._lists = None, None
+        if not os.path.exists(self._ivf_path):
+            return
+        with np.load(self._ivf_path) as data:
+            centroids, assign = data["centroids"], data["assign"]
+        assign = assign[: len(self._ids)]
+        lists = [list(np.flatnonzero(assign == c)) for c in range(len(centroids))]
+        # rows appended after the IVF was built go to their nearest centroid
+        for pos in range(len(assign), len(self._ids)):
+            lists[int(np.argmax(centroids @ self._decode(slice(pos, pos + 1))[0]))].append(pos)
+        self._centroids = centroids
+        self._lists = [np.asarray(rows, dtype=np.int64) for rows in lists]
+
+    def __len__(self):
+        return len(self._positions)
+
+    def refresh(self):
+        """Pick up rows other processes appended, or reload after another process compacted."""
+        manifest_inode = os.stat(self._manifest_path).st_ino
+        try:
+            rows_size = os.path.getsize(self._rows_path)
+        except FileNotFoundError:
+            rows_size = 0
+        if manifest_inode == self._manifest_inode and rows_size <= self._rows_offset:
+            return
+        with self._lock:
+            if manifest_inode != self._manifest_inode:
+                self._load()
+            else:
+                self._catch_up()
+
+    def _catch_up(self):
+        ids, metadatas, self._rows_offset = self._read_rows(self._rows_offset, self._stored_rows() - len(self._ids))
+        if ids:
+            self._add_rows(ids, metadatas)
+
+    # ----- writes -----
+    def upsert(self, ids, embeddings, metadatas):
+        unit = normalize_rows(embeddings)
+        stored, scales = quantize_rows(unit, self.dtype)
+        rows = "".join(json.dumps({"id": vid, "metadata": meta}) + "\n" for vid, meta in zip(ids, metadatas)).encode()
+        with file_lock(self._lock_path), self._lock:
+            if os.stat(self._manifest_path).st_ino != self._manifest_inode:
+                self._load()   # compacted by another process
+            self._catch_up()
+            start = len(self._ids)
+            # drop the tail of a writer that died mid-upsert, so every file ends at row `start`
+            tails = [(self._vectors_path, start * self._row_bytes), (self._rows_path, self._rows_offset)]
+            if self.quantized:
+                tails.append((self._scales_path, start * 4))
+            for path, size in tails:
+                if os.path.exists(path) and os.path.getsize(path) > size:
+                    os.truncate(path, size)
+            if scales is not None:
+                with open(self._scales_path, "ab") as sf:
+                    sf.write(scales.tobytes())
+            with open(self._vectors_path, "ab") as vf:
+                vf.write(stored.tobytes())
+            with open(self._rows_path, "ab") as rf:
+                rf.write(rows)
+            self._rows_offset += len(rows)
+            self._add_rows(ids, metadatas, unit)
+
+    def _add_rows(self, ids, metadatas, unit=None):
+        """Index rows just appended to the files; `unit` are their float32 vectors if at hand."""
+        start = len(self._ids)
+        alive = np.ones(len(ids), dtype=bool)
+        for offset, vid in enumerate(ids):
+            old = self._positions.get(vid)
+            if old is not None:
+                if old >= start:
+                    alive[old - start] = False
+                else:
+                    self._alive[old] = False
+            self._positions[vid] = start + offset
+        self._ids.extend(ids)
+        self._metadata.extend(metadatas)
+        self._alive = np.concatenate([self._alive, alive])
+        self._remap(len(self._ids))
+        if self._centroids is not None:
+            if unit is None:
+                unit = self._decode(slice(start, len(self._ids)))
+            nearest = np.argmax(unit @ self._centroids.T, axis=1)
+            for c in np.unique(nearest):
+                new_rows = start + np.flatnonzero(nearest == c)
+                self._lists[c] = np.concatenate([self._lists[c], new_rows])
+
+    def compact(self):
+        """Rewrite the files keeping only the live row of each id."""
+        with file_lock(self._lock_path), self._lock:
+            if os.stat(self._manifest_path).st_ino != self._manifest_inode:
+                self._load()
+            self._catch_up()
+            keep = np.flatnonzero(self._alive)
+            generation = self._generation + 1
+            new = self._files(generation)
+            with open(new["vectors"], "wb") as vf:
+                for start in range(0, len(keep), self.BLOCK_ROWS):
+                    vf.write(np.ascontiguousarray(self._vectors[keep[start:start + self.BLOCK_ROWS]]).tobytes())
+                os.fsync(vf.fileno())
+            if self.quantized:
+                with open(new["scales"], "wb") as sf:
+                    sf.write(self._scales[keep].tobytes())
+                    os.fsync(sf.fileno())
+            with open(new["rows"], "w") as rf:
+                for pos in keep:
+                    rf.write(json.dumps({"id": self._ids[pos], "metadata": self._metadata[pos]}) + "\n")
+                rf.flush()
+                os.fsync(rf.fileno())
+            # the commit point: before it readers (and a restart) keep the old generation, after it the new one
+            with open(self._manifest_path) as f:
+                manifest = json.load(f)
+            manifest["generation"] = generation
+            self._write_manifest(manifest)
+            self._remove_stale_generations(generation)
+            self._load()
+
+    def _remove_stale_generations(self, generation):
+        """Files of older generations, and of compactions that died before their swap."""
+        for name in os.listdir(self.path):
+            match = self._GENERATION_FILE.match(name)
+            if match and int(match.group(2) or 0) != generation:
+                os.remove(os.path.join(self.path, name))
+
+    # ----- approximate index -----
+    def build_ivf(self, n_lists=None, iterations=10, sample_size=100000, seed=0):
+        """Spherical k-means over a sample of rows; each query then scans only `nprobe` lists."""
+        with self._lock:
+            n = len(self._ids)
+            if n == 0:
+                return
+            n_lists = n_lists or max(1, int(np.sqrt(n)))
+            rng = np.random.default_rng(seed)
+            sample_rows = np.sort(rng.choice(n, size=min(n, sample_size), replace=False))
+            sample = self._decode(sample_rows)
+            centroids = sample[rng.choice(len(sample), size=min(n_lists, len(sample)), replace=False)].copy()
+            for _ in range(iterations):
+                assign = np.argmax(sample @ centroids.T, axis=1)
+                for c in range(len(centroids)):
+                    members = sample[assign == c]
+                    if len(members):
+                        centroids[c] = members.sum(axis=0)
+                centroids = normalize_rows(centroids)
+            assign = np.concatenate([
+                np.argmax(self._decode(slice(s, s + self.BLOCK_ROWS)) @ centroids.T, axis=1)
+                for s in range(0, n, self.BLOCK_ROWS)
+            ])
+            np.savez(self._ivf_path, centroids=centroids, assign=assign)
+            self._load_ivf()
+
+    # ----- reads -----
+    def _exact_scores(self, vectors, query, scales=None):
+        if self.dtype == np.float32:
+            return np.asarray(vectors @ query)
+        # float16/int8 have no BLAS path; upcast block by block
+        scores = np.empty(len(vectors), dtype=np.float32)
+        for s in range(0, len(vectors), self.UPCAST_ROWS):
+            np.dot(vectors[s:s + self.UPCAST_ROWS].astype(np.float32), query, out=scores[s:s + self.UPCAST_ROWS])
+        if scales is not None:
+            scores *= scales
+        return scores
+
+    def search(self, vector, top_k=10, nprobe=None):
+        """Return (rows, scores) of the best `top_k` live rows."""
+        rows, scores, _, _ = self._search(vector, top_k, nprobe)
+        return rows, scores
+
+    def _search(self, vector, top_k, nprobe=None):
+        """(rows, scores, ids, metadata), the last two being the lists the rows index into."""
+        self.refresh()
+        nprobe = self.nprobe if nprobe is None else nprobe
+        query = np.asarray(vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1)
+        vectors, scales, alive, lists, centroids, ids, metadata = self._snapshot()
+        if len(vectors) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32), ids, metadata
+        if nprobe > 0 and centroids is not None:
+            probes = top_k_indices(centroids @ query, nprobe)
+            rows = np.concatenate([lists[c] for c in probes])
+            rows = rows[alive[rows]]
+            if len(rows):
+                scores = self._exact_scores(vectors[rows], query, None if scales is None else scales[rows])
+            else:
+                scores = np.zeros(0, np.float32)
+            best = top_k_indices(scores, top_k)
+            return rows[best], scores[best], ids, metadata
+        scores = self._exact_scores(vectors, query, scales)
+        scores[~alive[: len(scores)]] = -np.inf
+        best = top_k_indices(scores, min(top_k, int(alive.sum())))
+        return best, scores[best], ids, metadata
+
+    def query(self, vector, top_k=10, include_metadata=True):
+        rows, scores, ids, metadata = self._search(vector, top_k)
+        return {
+            "matches": [
+                {
+                    "id": ids[row],
+                    "score": float(score),
+                    "metadata": metadata[row] if include_metadata else {},
+                }
+                for row, score in zip(rows, scores)
+            ]
+        }
+
+    def fetch(self, ids):
+        """{id: (float32 vector, metadata)} for the live rows of the given ids."""
+        self.refresh()
+        with self._lock:
+            found = [(vid, self._positions[vid]) for vid in ids if vid in self._positions]
+            if not found:
+                return {}
+            rows = np.asarray([pos for _, pos in found], dtype=np.int64)
+            vectors = self._decode(rows)
+            return {vid: (vectors[i], self._metadata[pos]) for i, (vid, pos) in enumerate(found)}
+
+
+# ---------------------- Factory ----------------------
+_store = None
+_store_lock = threading.Lock()
+
+
+def open_vector_store(version=None, dimension=DIMENSION):
+    """
+    Store of one index version (VECTOR_STORE picks the backend), or the un-versioned index when
+    `version` is None. Pinecone keeps versions as namespaces of one index per dimension.
+    """
+    if VECTOR_STORE == "memory":
+        return InMemoryVectorStore(dimension)
+    if VECTOR_STORE == "local":
+        return LocalVectorStore(version_path(version, "vectors") if version else LOCAL_INDEX_DIR, dimension)
+    index_name = INDEX_NAME if dimension == DIMENSION else f"{INDEX_NAME}-{dimension}"
+    return PineconeVectorStore(index_name, dimension, namespace=version or "")
+
+
+def get_vector_store():
+    """Process-wide store of the active index version."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                version = active_version()
+                _store = open_vector_store(version, version_dimension(version) or DIMENSION)
+    return _store
+
+
+def set_vector_store(store):
+    global _store
+    _store = store
+
+
+def loaded_vector_store():
+    """The process-wide store if it has been created, without creating it."""
+    return _store
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Maintain the local vector index")
+    parser.add_argument("command", choices=["stats", "compact", "build-ivf"])
+    parser.add_argument("--path", default=LOCAL_INDEX_DIR)
+    parser.add_argument("--lists", type=int, default=None)
+    args = parser.parse_args()
+
+    store = LocalVectorStore(args.path)
+    if args.command == "compact":
+        store.compact()
+    elif args.command == "build-ivf":
+        store.build_ivf(n_lists=args.lists)
+    print(f"📦 {args.path}: {len(store)} vectors, {len(store._ids)} rows, dtype={store.dtype}, "
+          f"ivf_lists={0 if store._centroids is None else len(store._centroids)}")